@@ -0,0 +1,292 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from vrfrag_teams import _to_num, _fit_team_diff_model
+from event_dates import drop_duplicate_sessions, event_date_iso
+from schema import PLAYERS_SCHEMA, read_table
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILES_FOLDER = os.path.join(BASE_DIR, "files")
+PLAYERS_FILE = os.path.join(FILES_FOLDER, "vrfrag_players.csv")
+
+MODELS = ("simple", "advanced")
+
+# Spalten der inkrementellen Aggregate pro Spieler
+_N, _SCORE, _KILLS, _DEATHS = range(4)
+
+def _prepare_rows(players_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Typisierte Spielerzeilen mit chronologischer Event-Nummer (event_pos),
+    Match-Nummer (match_pos, global chronologisch) und Spieler-Code. Sessions, die unter
+    mehreren Event-Dateien liegen, werden nur einmal abgespielt.
+    """
+    required = {"Player", "matchNr", "team", "matchWinner", "score", "kills", "deaths", "EventDate", "EventTimeRange"}
+    missing = required - set(players_df.columns)
+    if missing:
+        raise ValueError(f"Players-CSV ohne Spalten: {sorted(missing)}")
+    players_df = drop_duplicate_sessions(players_df)
+
+    df = pd.DataFrame({
+        "Player": players_df["Player"].astype(str).str.strip(),
+        "matchNr": _to_num(players_df["matchNr"], 0).astype(int),
+        "team": players_df["team"].astype(str),
+        "matchWinner": players_df["matchWinner"].astype(str),
+        "score": _to_num(players_df["score"], 0.0),
+        "kills": _to_num(players_df["kills"], 0.0),
+        "deaths": _to_num(players_df["deaths"], 0.0),
+        "EventDate": players_df["EventDate"].astype(str),
+        "EventTimeRange": players_df["EventTimeRange"].astype(str),
+    })
+    if "EventId" in players_df.columns:
+        df["event"] = players_df["EventId"].astype(str)
+    else:
+        df["event"] = df["EventDate"] + "|" + df["EventTimeRange"]
+
+    df["event_date"] = pd.to_datetime(event_date_iso(players_df), errors="coerce")
+
+    events = (
+        df[["event", "event_date", "EventTimeRange"]]
+        .drop_duplicates("event")
+        .sort_values(["event_date", "EventTimeRange", "event"], na_position="first")
+    )
+    df["event_pos"] = df["event"].map({e: i for i, e in enumerate(events["event"].tolist())}).astype(int)
+
+    df = df.sort_values(["event_pos", "matchNr"], kind="stable").reset_index(drop=True)
+    df["match_pos"] = df.groupby(["event_pos", "matchNr"], sort=False).ngroup()
+    df["player_code"] = pd.factorize(df["Player"])[0]
+    return df
+
+
+def _add_event_rows(agg: np.ndarray, rows: pd.DataFrame, sign: float = 1.0):
+    """
+    Inkrementelles Update der Spieler-Aggregate (Anzahl Zeilen, Summe score/kills/deaths)
+    um die Zeilen eines Events (sign=-1 entfernt ein Event aus dem Fenster).
+    """
+    p = rows["player_code"].to_numpy()
+    np.add.at(agg[:, _N], p, sign)
+    np.add.at(agg[:, _SCORE], p, sign * rows["score"].to_numpy())
+    np.add.at(agg[:, _KILLS], p, sign * rows["kills"].to_numpy())
+    np.add.at(agg[:, _DEATHS], p, sign * rows["deaths"].to_numpy())
+
+
+def _team_features(test: pd.DataFrame, prior: np.ndarray, n_matches: int):
+    """
+    Vektorisiert: pro Test-Match und Team die Summen der Vorab-Aggregate der Spieler.
+    Gibt ein Array (n_matches, 2, 4) zurück (Team A = 0, Team B = 1).
+    """
+    out = np.zeros((n_matches, 2, 4))
+    local = test["local_match"].to_numpy()
+    team = (test["team"].to_numpy() == "B").astype(int)
+    np.add.at(out, (local, team), prior[test["player_code"].to_numpy()])
+    return out
+
+
+def _predict_simple(team_sums: np.ndarray, overall_mean: float) -> np.ndarray:
+    """
+    Wie calculate_team_win_probability_simple: Ø Score über alle bisherigen Zeilen der
+    Teamspieler, Anteil von Team A an der Summe beider Durchschnitte.
+    """
+    n = team_sums[:, :, _N]
+    avg = np.where(n > 0, team_sums[:, :, _SCORE] / np.maximum(n, 1), overall_mean)
+    total = avg[:, 0] + avg[:, 1]
+    return np.where(total > 0, avg[:, 0] / np.where(total > 0, total, 1.0), 0.5)
+
+
+def _predict_advanced(team_sums: np.ndarray, model, scaler, fallback: np.ndarray) -> np.ndarray:
+    """
+    Wie calculate_team_win_probability_advanced: Features (Ø Score A-B, KD A-B) aus der
+    Historie der Teamspieler; ohne Modell oder ohne Historie -> einfache Vorhersage.
+    """
+    if model is None or scaler is None:
+        return fallback
+    n = team_sums[:, :, _N]
+    has_data = (n > 0).all(axis=1)
+    avg_score = team_sums[:, :, _SCORE] / np.maximum(n, 1)
+    kills = team_sums[:, :, _KILLS]
+    deaths = team_sums[:, :, _DEATHS]
+    kd = np.where(deaths > 0, kills / np.where(deaths > 0, deaths, 1.0), kills)
+    x = np.column_stack([avg_score[:, 0] - avg_score[:, 1], kd[:, 0] - kd[:, 1]])
+    p = model.predict_proba(scaler.transform(x))[:, 1]
+    return np.where(has_data, p, fallback)
+
+
+def _match_training_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Match-Level-Features wie in _train_team_diff_model (Ø Score A-B, KD A-B aus den
+    Werten im Match selbst), einmal für alle Matches berechnet. Pro Fold wird dann nur
+    noch auf den Matches früherer Events gefittet.
+    """
+    decisive = df[df["matchWinner"].isin(["A", "B"])]
+    agg = (
+        decisive.groupby(["match_pos", "team"], sort=True)
+        .agg(score_mean=("score", "mean"), kills_sum=("kills", "sum"), deaths_sum=("deaths", "sum"))
+        .reset_index()
+    )
+    agg["kd"] = agg["kills_sum"] / agg["deaths_sum"].replace(0, np.nan)
+    agg["kd"] = agg["kd"].fillna(agg["kills_sum"])
+
+    a = agg[agg["team"] == "A"].set_index("match_pos")
+    b = agg[agg["team"] == "B"].set_index("match_pos")
+    common = a.join(b, how="inner", lsuffix="_A", rsuffix="_B")
+
+    meta = decisive.groupby("match_pos").agg(event_pos=("event_pos", "first"), winner=("matchWinner", "first"))
+    return pd.DataFrame({
+        "event_pos": meta["event_pos"].reindex(common.index).to_numpy(),
+        "x_score": (common["score_mean_A"] - common["score_mean_B"]).to_numpy(),
+        "x_kd": (common["kd_A"] - common["kd_B"]).to_numpy(),
+        "y": (meta["winner"].reindex(common.index) == "A").astype(int).to_numpy(),
+    }, index=common.index)
+
+
+def _fit_fold_model(train: pd.DataFrame):
+    # gleiche Mindestmenge wie _train_team_diff_model
+    if len(train) < 20 or train["y"].nunique() < 2:
+        return None, None
+    return _fit_team_diff_model(train[["x_score", "x_kd"]].to_numpy(), train["y"].to_numpy())
+
+
+def _metrics(p: np.ndarray, y: np.ndarray, n_bins: int = 10) -> dict:
+    if len(y) == 0:
+        return {"n": 0}
+    pc = np.clip(p, 1e-15, 1 - 1e-15)
+    bins = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    calibration = []
+    for b in range(n_bins):
+        mask = bins == b
+        if mask.any():
+            calibration.append({
+                "bin": f"{b / n_bins:.1f}-{(b + 1) / n_bins:.1f}",
+                "n": int(mask.sum()),
+                "mean_predicted": round(float(p[mask].mean()), 3),
+                "observed_rate": round(float(y[mask].mean()), 3),
+            })
+    return {
+        "n": int(len(y)),
+        "log_loss": round(float(-np.mean(y * np.log(pc) + (1 - y) * np.log(1 - pc))), 4),
+        "brier": round(float(np.mean((p - y) ** 2)), 4),
+        "accuracy": round(float(np.mean((p > 0.5) == (y == 1))), 4),
+        "calibration": calibration,
+    }
+
+
+def run_backtest(players_df: pd.DataFrame, train_window=None, min_train_events=1, retrain_every=1,
+                 models=MODELS, return_predictions=False):
+    """
+    Chronologischer Backtest der Gewinnwahrscheinlichkeits-Modelle.
+
+    Die Events werden nach Datum abgespielt; alle Matches eines Events werden nur mit
+    Daten aus früheren Events vorhergesagt (rolling Train/Test-Split). Die Spieler-Aggregate
+    des Trainingsfensters werden laufend fortgeschrieben: das vorige Event wird addiert,
+    Events, die aus dem Fenster fallen, werden wieder abgezogen.
+
+    Args:
+        players_df: Spielerzeilen (Format wie vrfrag_players.csv)
+        train_window: Anzahl vorheriger Events im Training (None = alle bisherigen)
+        min_train_events: Events, die nur als Training dienen, bevor bewertet wird
+        retrain_every: Das ML-Modell wird nur alle N Events neu trainiert
+        models: Auswahl aus "simple", "advanced"
+        return_predictions: Vorhersagen pro Match mit zurückgeben
+
+    Returns:
+        Dictionary mit Log-Loss, Brier-Score, Accuracy und Kalibrierung pro Modell
+    """
+    started = time.perf_counter()
+    df = _prepare_rows(players_df)
+    n_events = int(df["event_pos"].max()) + 1 if not df.empty else 0
+    n_players = int(df["player_code"].max()) + 1 if not df.empty else 0
+
+    matches = df.groupby("match_pos", sort=True).agg(event_pos=("event_pos", "first"), winner=("matchWinner", "first"))
+    rows_by_event = {e: g for e, g in df.groupby("event_pos", sort=True)}
+    train_features = _match_training_features(df) if "advanced" in models else None
+
+    preds = {m: [] for m in models}
+    labels = []
+    match_ids = []
+    n_draws = 0
+    model_time = {m: 0.0 for m in models}
+    model, scaler = None, None
+
+    # laufende Aggregate über das Trainingsfenster [start, e)
+    prior = np.zeros((n_players, 4))
+    start = 0
+    for e in range(n_events):
+        if e > 0:
+            _add_event_rows(prior, rows_by_event[e - 1])
+        if train_window is not None:
+            while start < e - int(train_window):
+                _add_event_rows(prior, rows_by_event[start], sign=-1.0)
+                start += 1
+        if e < min_train_events or prior[:, _N].sum() == 0:
+            continue
+
+        test = rows_by_event[e]
+        ev_matches = matches[matches["event_pos"] == e]
+        decisive = ev_matches["winner"].isin(["A", "B"]).to_numpy()
+        n_draws += int((~decisive).sum())
+        if not decisive.any():
+            continue
+
+        test = test.assign(local_match=test["match_pos"].map({m: i for i, m in enumerate(ev_matches.index)}))
+        team_sums = _team_features(test, prior, len(ev_matches))
+        overall_mean = prior[:, _SCORE].sum() / prior[:, _N].sum()
+
+        t0 = time.perf_counter()
+        p_simple = _predict_simple(team_sums, overall_mean)
+        if "simple" in models:
+            model_time["simple"] += time.perf_counter() - t0
+
+        if "advanced" in models:
+            t0 = time.perf_counter()
+            if model is None or (e - min_train_events) % max(int(retrain_every), 1) == 0:
+                ev = train_features["event_pos"]
+                model, scaler = _fit_fold_model(train_features[(ev >= start) & (ev < e)])
+            p_adv = _predict_advanced(team_sums, model, scaler, p_simple)
+            model_time["advanced"] += time.perf_counter() - t0
+            preds["advanced"].append(p_adv[decisive])
+        if "simple" in models:
+            preds["simple"].append(p_simple[decisive])
+
+        labels.append((ev_matches["winner"].to_numpy()[decisive] == "A").astype(float))
+        match_ids.extend(ev_matches.index[decisive].tolist())
+
+    y = np.concatenate(labels) if labels else np.array([])
+    report = {
+        "n_events": n_events,
+        "n_matches_scored": int(len(y)),
+        "n_draws_skipped": n_draws,
+        "train_window": train_window,
+        "baseline_log_loss": round(float(np.log(2)), 4),
+        "models": {},
+    }
+    for m in models:
+        p = np.concatenate(preds[m]) if preds[m] else np.array([])
+        report["models"][m] = {**_metrics(p, y), "seconds": round(model_time[m], 4)}
+        if return_predictions:
+            report["models"][m]["predictions"] = [
+                {"match": int(i), "p_team_a": round(float(pi), 4), "team_a_won": int(yi)}
+                for i, pi, yi in zip(match_ids, p, y)
+            ]
+    report["elapsed_s"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+if __name__ == '__main__':
+    if not os.path.exists(PLAYERS_FILE):
+        print("❌ Spieler-Daten nicht gefunden")
+    else:
+        players_df = read_table(PLAYERS_FILE, PLAYERS_SCHEMA)
+        report = run_backtest(players_df)
+        print(f"📊 Events: {report['n_events']} · bewertete Matches: {report['n_matches_scored']} "
+              f"· Unentschieden übersprungen: {report['n_draws_skipped']}")
+        print(f"   Baseline (50/50) Log-Loss: {report['baseline_log_loss']}")
+        for name, m in report["models"].items():
+            if not m.get("n"):
+                print(f"   {name:9} keine bewertbaren Matches")
+                continue
+            print(f"   {name:9} Log-Loss {m['log_loss']:.4f} · Brier {m['brier']:.4f} "
+                  f"· Accuracy {m['accuracy']:.3f} · {m['seconds'] * 1000:.1f} ms")
+            for b in m["calibration"]:
+                print(f"      {b['bin']}: n={b['n']:4d} pred={b['mean_predicted']:.3f} obs={b['observed_rate']:.3f}")
+        print(f"⏱️  Gesamtzeit: {report['elapsed_s']:.3f} s")
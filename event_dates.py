@@ -0,0 +1,105 @@
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Spalte mit dem normalisierten Datum (YYYY-MM-DD), wird beim Ingest geschrieben
+ISO_COLUMN = "EventDateISO"
+
+GERMAN_MONTHS = {
+    "januar": "01", "februar": "02", "märz": "03", "maerz": "03",
+    "april": "04", "mai": "05", "juni": "06", "juli": "07",
+    "august": "08", "september": "09", "oktober": "10",
+    "november": "11", "dezember": "12",
+}
+
+# '18. Juli 2025' (optional mit Wochentag davor: 'Freitag, 18. Juli 2025')
+_DATE_RE = r"(?<!\d)(?P<day>\d{1,2})\.?\s*(?P<month>[^\s\d.,]+)\s+(?P<year>\d{4})"
+
+
+def parse_event_date(s):
+    """
+    Erwartet Strings wie: 'Freitag, 18. Juli 2025'
+    Gibt datetime.date oder None zurück.
+    """
+    if s is None or (isinstance(s, float) and np.isnan(s)):
+        return None
+    m = re.search(_DATE_RE, str(s))
+    if not m:
+        return None
+    month = GERMAN_MONTHS.get(m.group("month").strip().lower())
+    if not month:
+        return None
+    try:
+        return date(int(m.group("year")), int(month), int(m.group("day")))
+    except ValueError:
+        return None
+
+
+def parse_event_dates(event_dates: pd.Series) -> pd.Series:
+    """
+    Vektorisierte Variante: jeder eindeutige EventDate-String wird genau einmal
+    geparst (über die Kategorien), das Ergebnis per Kategorie-Codes zurückgemappt.
+    Gibt eine Series mit ISO-Strings (YYYY-MM-DD) bzw. None zurück.
+    """
+    cat = pd.Categorical(event_dates.astype("string"))
+    categories = pd.Series(cat.categories, dtype="string")
+    if categories.empty:
+        return pd.Series([None] * len(event_dates), index=event_dates.index, dtype=object)
+
+    parts = categories.str.extract(_DATE_RE)
+    months = parts["month"].str.strip().str.lower().map(GERMAN_MONTHS)
+    parsed = pd.to_datetime(
+        parts["year"] + "-" + months + "-" + parts["day"].str.zfill(2),
+        format="%Y-%m-%d",
+        errors="coerce",
+    )
+    iso = np.append(parsed.dt.strftime("%Y-%m-%d").astype(object).where(parsed.notna(), None).to_numpy(), None)
+
+    # Code -1 (fehlender Wert) zeigt auf das angehängte None
+    return pd.Series(iso[cat.codes], index=event_dates.index, dtype=object)
+
+
+def event_date_iso(df: pd.DataFrame) -> pd.Series:
+    """
+    ISO-Datum pro Zeile: vorhandene Ingest-Spalte verwenden, sonst aus EventDate parsen
+    (ältere CSVs ohne EventDateISO).
+    """
+    if ISO_COLUMN in df.columns:
+        return df[ISO_COLUMN].astype(object).where(df[ISO_COLUMN].notna(), None)
+    if "EventDate" not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    return parse_event_dates(df["EventDate"])
+
+
+def add_event_date_iso(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ingest-Schritt: hängt die Spalte EventDateISO an (bzw. aktualisiert sie).
+    """
+    if df is None or df.empty or "EventDate" not in df.columns:
+        return df
+    df = df.copy()
+    df[ISO_COLUMN] = parse_event_dates(df["EventDate"])
+    return df
+
+
+# Stabiler Match-Schlüssel über Event-Dateien hinweg (dieselbe Session kann unter
+# mehreren EventIds gespeichert sein, z.B. erneut gescrapt)
+SESSION_KEY = ["EventDate", "EventTimeRange", "matchNr"]
+
+
+def drop_duplicate_sessions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Entfernt Zeilen, deren Session schon unter einer anderen EventId vorkommt: pro
+    SESSION_KEY (+ Player bei Spielerzeilen) bleibt die Zeile der kleinsten EventId.
+    Zeilen ohne EventDate werden nicht zusammengelegt.
+    """
+    if df is None or df.empty or not set(SESSION_KEY).issubset(df.columns):
+        return df
+    keys = SESSION_KEY + (["Player"] if "Player" in df.columns else [])
+    ordered = df.sort_values("EventId", kind="stable") if "EventId" in df.columns else df
+    dup = ordered[keys].astype(str).duplicated().to_numpy() & ordered["EventDate"].notna().to_numpy()
+    if not dup.any():
+        return df
+    return ordered[~dup].sort_index()
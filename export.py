@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from partials import DIMENSIONS
+
+# Zeilen pro Chunk: der Speicher pro Export hängt nur davon ab, nicht von der Treffermenge
+CHUNK_ROWS = 5000
+
+# Format -> (Content-Type, Dateiendung)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _label_filter(s: pd.Series, keep):
+    """
+    Chunk-Prädikat (i, j) -> bool-Maske über eine Text-Spalte. Bei Categoricals wird keep
+    einmal pro Kategorie ausgewertet und die Maske über die (gemappten) Codes nachgeschlagen.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # letzter Slot = fehlender Wert (Code -1)
+        ok = np.array([keep(str(c)) for c in s.cat.categories] + [False], dtype=bool)
+        codes = s.cat.codes.to_numpy()
+        return lambda i, j: ok[codes[i:j]]
+
+    values = s.to_numpy()
+    return lambda i, j: np.array([v is not None and v == v and keep(str(v)) for v in values[i:j]], dtype=bool)
+
+
+def _row_filters(facts: pd.DataFrame, filters: dict) -> list:
+    preds = []
+    for dim, values in (filters or {}).items():
+        if dim in ("date_from", "date_to"):
+            continue
+        if dim not in DIMENSIONS:
+            raise ExportError(f"Unbekannter Filter: {dim}")
+        preds.append(_label_filter(facts[DIMENSIONS[dim]], set(values).__contains__))
+
+    date_from, date_to = (filters or {}).get("date_from"), (filters or {}).get("date_to")
+    if date_from or date_to:
+        preds.append(_label_filter(
+            facts[DIMENSIONS["date"]],
+            lambda d: (not date_from or d >= date_from) and (not date_to or d <= date_to),
+        ))
+    return preds
+
+
+def stream(facts: pd.DataFrame, filters=None, columns=None, fmt: str = "csv", chunk_rows: int = CHUNK_ROWS,
+           on_done=None):
+    """
+    Gefilterte Zeilen der Faktentabelle als Generator von Text-Chunks (CSV mit Kopfzeile
+    oder NDJSON). Filter wie bei /api/query (Listen pro Dimension, date_from/date_to),
+    columns = Auswahl/Reihenfolge der Spalten (Default: alle).
+
+    Ungültige Parameter lösen ExportError sofort aus (nicht erst beim Iterieren).
+    on_done(rows) wird nach dem letzten Chunk mit der Anzahl exportierter Zeilen aufgerufen.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unbekanntes Format: {fmt} (erlaubt: {', '.join(FORMATS)})")
+    columns = list(dict.fromkeys(columns or facts.columns))
+    unknown = [c for c in columns if c not in facts.columns]
+    if unknown:
+        raise ExportError(f"Unbekannte Spalte: {', '.join(unknown)}")
+
+    preds = _row_filters(facts, filters)
+    positions = [facts.columns.get_loc(c) for c in columns]
+    chunk_rows = max(int(chunk_rows), 1)
+
+    def _chunks():
+        rows = 0
+        if fmt == "csv":
+            yield pd.DataFrame(columns=columns).to_csv(index=False)
+        for i in range(0, len(facts), chunk_rows):
+            j = min(i + chunk_rows, len(facts))
+            mask = np.ones(j - i, dtype=bool)
+            for pred in preds:
+                mask &= pred(i, j)
+            if not mask.any():
+                continue
+            # nur der Chunk wird aus den gemappten Spalten kopiert
+            chunk = facts.iloc[i:j, positions][mask]
+            rows += len(chunk)
+            if fmt == "csv":
+                yield chunk.to_csv(header=False, index=False)
+            else:
+                yield chunk.to_json(orient="records", lines=True, force_ascii=False)
+        if on_done is not None:
+            on_done(rows)
+
+    return _chunks()
@@ -3,6 +3,8 @@ from bs4 import BeautifulSoup
 import json
 import re
 
+import metrics
+
 def get_players_from_url(game_link):
     """
     Extrahiert alle Spieler-Nicknames aus einem VRFrag Spiel-Link
@@ -11,7 +13,9 @@ def get_players_from_url(game_link):
     try:
         print(f"Versuche Spielerdaten von {game_link} abzurufen...")
         
-        response = requests.get(game_link, timeout=10)
+        with metrics.upstream("vrfrag", "match_page") as call:
+            response = requests.get(game_link, timeout=10)
+            call["status"] = response.status_code
         if response.status_code != 200:
             print(f"Fehler: HTTP Status {response.status_code}")
             return None
@@ -0,0 +1,275 @@
+import base64
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import metrics
+
+# Basis-URL der GitHub-API; für Tests auf einen lokalen Fake-Server umstellbar
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+# Parallele Blob-Uploads / -Downloads
+BLOB_UPLOAD_WORKERS = 4
+BLOB_DOWNLOAD_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+# Neuversuche, wenn der Branch zwischen Lesen und Ref-Update weitergezogen ist
+REF_UPDATE_RETRIES = 3
+REQUEST_TIMEOUT = 20
+
+
+def git_blob_sha(data: bytes) -> str:
+    """
+    SHA-1 eines Git-Blobs (wie `git hash-object`), lokal berechnet.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def local_blob_sha(path: str) -> str | None:
+    """
+    Git-Blob-SHA einer lokalen Datei (blockweise gelesen); None, wenn sie fehlt.
+    """
+    try:
+        size = os.path.getsize(path)
+        h = hashlib.sha1(b"blob %d\0" % size)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"GitHub API Fehler: {status_code} - {message}")
+        self.status_code = status_code
+
+
+class GitHubSync:
+    """
+    Schreibt mehrere Dateien mit genau EINEM Commit über die Git Data API:
+
+      1. Branch-Ref + Commit lesen (Basis-Tree)
+      2. Basis-Tree rekursiv listen, lokale Blob-SHAs vergleichen -> unveränderte Pfade fallen weg
+      3. fehlende Blobs parallel hochladen (Blobs, die es im Repo schon gibt, werden nur referenziert)
+      4. neuen Tree auf dem Basis-Tree anlegen, Commit erzeugen, Branch-Ref vorspulen
+
+    Ist der Branch inzwischen weitergezogen (Ref-Update abgelehnt), wird ab Schritt 1 wiederholt.
+    """
+
+    def __init__(self, owner: str, repo: str, branch: str, token: str,
+                 api_url: str = GITHUB_API_URL, session: requests.Session | None = None):
+        self.owner = owner
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github.v3+json",
+        }
+
+    # ---------- HTTP ----------
+    def _request(self, method: str, path: str, **kwargs):
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/{path}"
+        # Operation ohne SHAs/Pfade, damit die Label-Kardinalität klein bleibt
+        operation = f"{method} " + "/".join(path.split("/")[:2])
+        with metrics.upstream("github", operation) as call:
+            r = self.session.request(method, url, headers=self.headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            call["status"] = r.status_code
+        payload = r.json() if r.content else {}
+        if r.status_code not in (200, 201):
+            raise GitHubAPIError(r.status_code, payload.get("message", "Unbekannter Fehler"))
+        return payload
+
+    # ---------- Lesen ----------
+    def head(self):
+        """
+        (Commit-SHA, Tree-SHA) der Branch-Spitze.
+        """
+        ref = self._request("GET", f"git/ref/heads/{self.branch}")
+        commit_sha = ref["object"]["sha"]
+        commit = self._request("GET", f"git/commits/{commit_sha}")
+        return commit_sha, commit["tree"]["sha"]
+
+    def tree_blobs(self, tree_sha: str) -> dict:
+        """
+        {Pfad: Blob-SHA} für alle Dateien im Tree (rekursiv, ein Request). Kürzt GitHub die
+        rekursive Liste (truncated), wird der Tree stattdessen Ebene für Ebene gelistet.
+        """
+        tree = self._request("GET", f"git/trees/{tree_sha}", params={"recursive": "1"})
+        if tree.get("truncated"):
+            return self._walk_tree(tree_sha)
+        return {e["path"]: e["sha"] for e in tree.get("tree", []) if e.get("type") == "blob"}
+
+    def _walk_tree(self, tree_sha: str, prefix: str = "") -> dict:
+        """
+        Nicht-rekursives Listing pro Unterordner (ein Request je Tree).
+        """
+        tree = self._request("GET", f"git/trees/{tree_sha}")
+        if tree.get("truncated"):
+            raise GitHubAPIError(200, f"Tree {tree_sha} ist zu groß zum Listen")
+        blobs = {}
+        for e in tree.get("tree", []):
+            path = prefix + e["path"]
+            if e.get("type") == "blob":
+                blobs[path] = e["sha"]
+            elif e.get("type") == "tree":
+                blobs.update(self._walk_tree(e["sha"], path + "/"))
+        return blobs
+
+    def download_blob(self, sha: str, local_path: str):
+        """
+        Lädt einen Blob als Rohdaten (raw media type, kein base64/1-MB-Limit) und streamt ihn
+        über eine temporäre Datei nach local_path. Der Inhalt wird gegen die SHA geprüft.
+        """
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/git/blobs/{sha}"
+        headers = dict(self.headers, Accept="application/vnd.github.raw+json")
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        tmp = f"{local_path}.{sha[:8]}.part"
+        with metrics.upstream("github", "GET git/blobs (raw)") as call, \
+                self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as r:
+            call["status"] = r.status_code
+            if r.status_code != 200:
+                raise GitHubAPIError(r.status_code, r.text[:200])
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        if local_blob_sha(tmp) != sha:
+            os.remove(tmp)
+            raise GitHubAPIError(200, f"Inhalt passt nicht zur Blob-SHA {sha}")
+        os.replace(tmp, local_path)
+
+    def pull_files(self, targets: dict, missing_only=()) -> dict:
+        """
+        Delta-Sync GitHub -> lokal. targets: {Repo-Präfix: lokaler Ordner}, z.B. {"events/": ".../events"}.
+
+        Listet den Tree einmal, vergleicht die Blob-SHAs mit den lokalen Dateien und lädt nur
+        fehlende oder abweichende Dateien (parallel) herunter. Unter den Präfixen in
+        missing_only werden nur lokal fehlende Dateien geladen, vorhandene (z.B. lokal
+        geänderte, noch nicht gepushte) bleiben unangetastet und zählen als unverändert.
+        """
+        try:
+            head_sha, base_tree = self.head()
+            remote = self.tree_blobs(base_tree)
+        except GitHubAPIError as e:
+            return {"success": False, "error": str(e)}
+        except requests.RequestException as e:
+            return {"success": False, "error": f"Verbindungsfehler: {str(e)}"}
+
+        wanted = {}
+        for repo_path, sha in remote.items():
+            for prefix, folder in targets.items():
+                if not repo_path.startswith(prefix):
+                    continue
+                rel = repo_path[len(prefix):]
+                local_path = os.path.normpath(os.path.join(folder, rel))
+                # keine Pfade außerhalb des Zielordners
+                if rel and os.path.commonpath([local_path, os.path.normpath(folder)]) == os.path.normpath(folder):
+                    wanted[repo_path] = (sha, local_path)
+                break
+
+        def _needs_download(repo_path, sha, local_path):
+            if any(repo_path.startswith(prefix) for prefix in missing_only):
+                return not os.path.exists(local_path)
+            return local_blob_sha(local_path) != sha
+
+        changed = sorted(p for p, (sha, local_path) in wanted.items() if _needs_download(p, sha, local_path))
+        unchanged = sorted(p for p in wanted if p not in changed)
+
+        def _download(repo_path):
+            sha, local_path = wanted[repo_path]
+            try:
+                self.download_blob(sha, local_path)
+                return None
+            except (GitHubAPIError, requests.RequestException, OSError) as e:
+                return f"{repo_path}: {e}"
+
+        with ThreadPoolExecutor(max_workers=BLOB_DOWNLOAD_WORKERS) as pool:
+            errors = [e for e in pool.map(_download, changed) if e]
+
+        return {
+            "success": not errors,
+            "commit_sha": head_sha,
+            "downloaded": [p for p in changed if not any(e.startswith(p + ":") for e in errors)],
+            "unchanged": unchanged,
+            "errors": errors,
+        }
+
+    # ---------- Schreiben ----------
+    def _upload_blob(self, data: bytes) -> str:
+        blob = self._request("POST", "git/blobs", json={
+            "content": base64.b64encode(data).decode("ascii"),
+            "encoding": "base64",
+        })
+        return blob["sha"]
+
+    def commit_files(self, files: dict, message: str) -> dict:
+        """
+        files: {Repo-Pfad: Inhalt (str oder bytes)}
+        Gibt ein Dict mit success, commit_sha (None, wenn nichts zu tun war), changed, unchanged zurück.
+        """
+        blobs = {
+            path: content.encode("utf-8") if isinstance(content, str) else bytes(content)
+            for path, content in files.items()
+        }
+        local_shas = {path: git_blob_sha(data) for path, data in blobs.items()}
+
+        try:
+            for attempt in range(REF_UPDATE_RETRIES):
+                head_sha, base_tree = self.head()
+                remote = self.tree_blobs(base_tree)
+
+                changed = sorted(p for p, sha in local_shas.items() if remote.get(p) != sha)
+                unchanged = sorted(p for p in local_shas if p not in changed)
+                if not changed:
+                    return {"success": True, "commit_sha": None, "changed": [], "unchanged": unchanged}
+
+                # nur Blobs hochladen, die es im Repo noch nicht gibt
+                known = set(remote.values())
+                to_upload = sorted({local_shas[p] for p in changed} - known)
+                by_sha = {local_shas[p]: blobs[p] for p in changed}
+                with ThreadPoolExecutor(max_workers=BLOB_UPLOAD_WORKERS) as pool:
+                    uploaded = list(pool.map(lambda sha: self._upload_blob(by_sha[sha]), to_upload))
+                mismatched = [sha for sha, got in zip(to_upload, uploaded) if sha != got]
+                if mismatched:
+                    return {"success": False, "error": f"Blob-SHA stimmt nicht überein: {mismatched[0]}"}
+
+                tree = self._request("POST", "git/trees", json={
+                    "base_tree": base_tree,
+                    "tree": [
+                        {"path": p, "mode": "100644", "type": "blob", "sha": local_shas[p]}
+                        for p in changed
+                    ],
+                })
+                commit = self._request("POST", "git/commits", json={
+                    "message": message,
+                    "tree": tree["sha"],
+                    "parents": [head_sha],
+                })
+                try:
+                    self._request("PATCH", f"git/refs/heads/{self.branch}", json={
+                        "sha": commit["sha"],
+                        "force": False,
+                    })
+                except GitHubAPIError as e:
+                    # 422: kein Fast-Forward mehr -> mit neuer Branch-Spitze wiederholen
+                    if e.status_code == 422 and attempt + 1 < REF_UPDATE_RETRIES:
+                        continue
+                    raise
+
+                return {
+                    "success": True,
+                    "commit_sha": commit["sha"],
+                    "html_url": commit.get("html_url", ""),
+                    "changed": changed,
+                    "unchanged": unchanged,
+                    "uploaded_blobs": len(to_upload),
+                }
+        except GitHubAPIError as e:
+            return {"success": False, "error": str(e)}
+        except requests.RequestException as e:
+            return {"success": False, "error": f"Verbindungsfehler: {str(e)}"}
+
+        return {"success": False, "error": "Branch wurde während des Commits mehrfach geändert"}
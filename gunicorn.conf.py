@@ -0,0 +1,11 @@
+import os
+
+# gunicorn liest diese Datei automatisch aus dem Arbeitsverzeichnis: `gunicorn`
+wsgi_app = "server:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+
+def post_worker_init(worker):
+    # Warm-up beim Start jedes Workers, bevor er Verbindungen annimmt (/readyz bis dahin 503)
+    import server
+    server.start_warm_up(heartbeat=worker.notify)
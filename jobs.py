@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Anzahl paralleler Hintergrund-Jobs (GitHub-Push, Statistik-Neuaufbau)
+JOB_WORKERS = int(os.environ.get("VRFRAG_JOB_WORKERS", 2))
+# Maximal wartende Jobs; darüber hinaus wird abgelehnt
+MAX_PENDING_JOBS = 20
+# So viele abgeschlossene Jobs bleiben für die Status-Abfrage erhalten
+MAX_FINISHED_JOBS = 200
+
+
+class JobQueue:
+    """
+    In-Process Job-Runner mit begrenztem Thread-Pool.
+
+    submit() gibt sofort ein Job-Dict mit id zurück; der Status (queued/running/done/failed),
+    die aktuelle Stufe (progress) und am Ende result bzw. error sind über get() abrufbar.
+
+    Jobs mit gleichem coalesce_key laufen nie parallel: solange schon einer wartet, bekommt
+    jeder weitere Aufruf denselben Job zurück. Läuft gerade einer, wird genau ein
+    Folge-Job eingereiht (damit Änderungen nach dem Start nicht verloren gehen).
+
+    Hinweis: Der Zustand liegt im Prozess. Bei mehreren gunicorn-Workern kennt nur der
+    Worker, der den Job angenommen hat, dessen Status.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max(int(workers), 1), thread_name_prefix="vrfrag-job")
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._queued_by_key: dict[str, str] = {}
+        self._key_locks: dict[str, threading.Lock] = {}
+
+    def submit(self, kind: str, fn, *args, coalesce_key: str | None = None, **kwargs) -> dict | None:
+        """
+        Reiht fn(report, *args, **kwargs) ein. report(stage) setzt die Fortschrittsanzeige.
+        Gibt den (ggf. zusammengelegten) Job zurück, oder None wenn die Warteschlange voll ist.
+        """
+        with self._lock:
+            if coalesce_key is not None:
+                queued = self._queued_by_key.get(coalesce_key)
+                if queued is not None:
+                    job = self._jobs[queued]
+                    job["coalesced"] += 1
+                    return self._public(job)
+
+            pending = sum(1 for j in self._jobs.values() if j["status"] == "queued")
+            if pending >= MAX_PENDING_JOBS:
+                return None
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "kind": kind,
+                "status": "queued",
+                "progress": "wartet",
+                "coalesced": 0,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["id"]] = job
+            if coalesce_key is not None:
+                self._queued_by_key[coalesce_key] = job["id"]
+                self._key_locks.setdefault(coalesce_key, threading.Lock())
+            self._trim()
+
+        self._pool.submit(self._run, job["id"], coalesce_key, fn, args, kwargs)
+        return self._public(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def list(self, limit: int = 20) -> list[dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())[-limit:]
+            return [self._public(j) for j in reversed(jobs)]
+
+    # ---------- intern ----------
+    def _run(self, job_id, coalesce_key, fn, args, kwargs):
+        key_lock = self._key_locks.get(coalesce_key) if coalesce_key is not None else None
+        if key_lock is not None:
+            key_lock.acquire()
+        try:
+            with self._lock:
+                job = self._jobs[job_id]
+                # ab jetzt landen neue Aufrufe in einem Folge-Job
+                if coalesce_key is not None and self._queued_by_key.get(coalesce_key) == job_id:
+                    del self._queued_by_key[coalesce_key]
+                job["status"] = "running"
+                job["progress"] = "läuft"
+                job["started"] = time.time()
+
+            def report(stage: str):
+                with self._lock:
+                    job["progress"] = stage
+
+            try:
+                result = fn(report, *args, **kwargs)
+                failed = isinstance(result, dict) and result.get("success") is False
+                with self._lock:
+                    job["result"] = result
+                    job["status"] = "failed" if failed else "done"
+                    job["error"] = result.get("error") if failed else None
+            except Exception as e:
+                traceback.print_exc()
+                with self._lock:
+                    job["status"] = "failed"
+                    job["error"] = str(e)
+            finally:
+                with self._lock:
+                    job["finished"] = time.time()
+                    job["progress"] = "fertig" if job["status"] == "done" else "fehlgeschlagen"
+        finally:
+            if key_lock is not None:
+                key_lock.release()
+
+    def _trim(self):
+        finished = [k for k, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for k in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[k]
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        out = dict(job)
+        if out["started"] is not None:
+            end = out["finished"] if out["finished"] is not None else time.time()
+            out["elapsed_s"] = round(end - out["started"], 2)
+        return out
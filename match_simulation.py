@@ -0,0 +1,222 @@
+import time
+import numpy as np
+import pandas as pd
+
+import metrics
+import partials
+from snapshot import MAX_LOADED
+
+from vrfrag_teams import _filter_by_map, _to_num, _df_signature
+
+# Datenstand-Signatur -> {Map-Signatur: Momente}; wie die gemappten Faktentabellen
+# höchstens MAX_LOADED Datenstände (aktueller + gerade abgelöster)
+_MOMENTS_CACHE = {}
+
+# Anzahl simulierter Matches pro NumPy-Block (begrenzt den Speicher pro Schritt)
+SIM_CHUNK_SIZE = 10_000
+# Spieler mit wenigen Spielen bekommen eine Varianz, die zur Gesamtvarianz hin geschrumpft ist
+VARIANCE_PRIOR_GAMES = 3
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+_METRICS = ("score", "kills")
+
+
+def _compute_player_moments(df: pd.DataFrame):
+    """
+    Berechnet pro Spieler Mittelwert und Standardabweichung von score und kills
+    (pro Match) sowie die Gesamtwerte als Fallback für unbekannte Spieler.
+    """
+    if "Player" not in df.columns or "score" not in df.columns:
+        return None
+
+    tmp = pd.DataFrame({
+        "Player": df["Player"].astype(str),
+        "score": _to_num(df["score"], 0.0),
+        "kills": _to_num(df["kills"], 0.0) if "kills" in df.columns else 0.0,
+    })
+    if tmp.empty:
+        return None
+
+    g = tmp.groupby("Player", sort=True)[list(_METRICS)]
+    means = g.mean()
+    vars_ = g.var(ddof=1).fillna(0.0)
+    games = g.size().to_numpy(dtype=float)
+
+    overall_mean = tmp[list(_METRICS)].mean().to_numpy(dtype=float)
+    overall_var = np.nan_to_num(tmp[list(_METRICS)].var(ddof=1).to_numpy(dtype=float))
+
+    return _moments(means.index.tolist(), means.to_numpy(dtype=float), vars_.to_numpy(dtype=float), games,
+                    overall_mean, overall_var)
+
+
+def _moments(players, means, vars_, games, overall_mean, overall_var) -> dict:
+    # Varianz mit Prior aus der Gesamtvarianz: (n-1)*var_p + k*var_all / (n-1+k)
+    dof = np.maximum(games - 1.0, 0.0)[:, None]
+    shrunk_var = (dof * vars_ + VARIANCE_PRIOR_GAMES * overall_var) / (dof + VARIANCE_PRIOR_GAMES)
+
+    return {
+        "index": {p: i for i, p in enumerate(players)},
+        "mean": means,
+        "std": np.sqrt(shrunk_var),
+        "games": games.astype(int),
+        "overall_mean": overall_mean,
+        "overall_std": np.sqrt(overall_var),
+    }
+
+
+def moments_from_partials(part: pd.DataFrame, map_name=None):
+    """
+    Wie _compute_player_moments, aber aus den Event-Partials (partials.py): Mittelwert und
+    Varianz pro Spieler aus Summe und Quadratsumme statt aus den Spielerzeilen.
+    """
+    mask = partials.map_mask(part, map_name)
+    t = partials.totals(part, ["player"], mask)
+    total = partials.totals(part, None, mask)
+    if float(total["n"].iloc[0]) == 0:
+        return None
+
+    means = np.column_stack([partials.mean(t, m).to_numpy(dtype=float) for m in _METRICS])
+    vars_ = np.column_stack([partials.std(t, m).fillna(0.0).to_numpy(dtype=float) ** 2 for m in _METRICS])
+    overall_mean = np.array([float(partials.mean(total, m).iloc[0]) for m in _METRICS])
+    overall_var = np.nan_to_num(np.array([float(partials.std(total, m).iloc[0]) ** 2 for m in _METRICS]))
+    return _moments([str(p) for p in t.index.tolist()], means, vars_, t["n"].to_numpy(dtype=float),
+                    overall_mean, overall_var)
+
+
+def get_player_moments(player_stats_df: pd.DataFrame, map_name=None):
+    """
+    Liefert die (gecachten) Spieler-Momente für einen Datenstand + Map.
+    Wird nur neu aggregiert, wenn sich die Daten-Signatur ändert.
+    """
+    data_sig = _df_signature(player_stats_df)
+    per_data = _MOMENTS_CACHE.get(data_sig)
+    if per_data is None:
+        per_data = _MOMENTS_CACHE[data_sig] = {}
+        while len(_MOMENTS_CACHE) > MAX_LOADED:
+            _MOMENTS_CACHE.pop(next(iter(_MOMENTS_CACHE)))
+
+    df = _filter_by_map(player_stats_df, map_name)
+    sig = _df_signature(df, map_name)
+
+    hit = per_data.get(sig)
+    metrics.cache_access("sim_moments", hit is not None)
+    if hit is not None:
+        return hit
+
+    moments = _compute_player_moments(df)
+    per_data[sig] = moments
+    return moments
+
+
+def _quantile_dict(values: np.ndarray, quantiles) -> dict:
+    qs = np.quantile(values, quantiles)
+    return {f"p{int(round(q * 100)):02d}": round(float(v), 2) for q, v in zip(quantiles, qs)}
+
+
+@metrics.timed("simulate_match")
+def simulate_match(team_a_players, team_b_players, player_stats_df, map_name=None,
+                   n_simulations=20_000, time_budget_ms=250, draw_margin=0,
+                   quantiles=DEFAULT_QUANTILES, seed=None, moments=None):
+    """
+    Monte-Carlo-Simulation eines Matches zwischen zwei Teams.
+
+    Pro Spieler und simuliertem Match werden score und kills aus einer Normalverteilung
+    mit den historischen Momenten des Spielers gezogen (auf ganze Zahlen gerundet).
+    Die Team-Summen entscheiden über Sieg/Unentschieden. Alles läuft blockweise über
+    NumPy-Broadcasting; ist das Zeitbudget aufgebraucht, wird mit den bis dahin
+    simulierten Matches abgebrochen.
+
+    Args:
+        team_a_players / team_b_players: Listen von Spieler-Namen
+        player_stats_df: DataFrame mit Spieler-Statistiken
+        map_name: Optionaler Map-Name für map-spezifische Statistiken
+        n_simulations: Gewünschte Anzahl simulierter Matches
+        time_budget_ms: Zeitbudget für die Simulation (mind. ein Block wird immer gerechnet)
+        draw_margin: Score-Differenz, bis zu der ein Match als Unentschieden zählt
+        quantiles: Quantile für die Score-/Kill-Differenz (Team A - Team B)
+        seed: Optionaler Seed für reproduzierbare Ergebnisse
+        moments: Optional vorab berechnete Spieler-Momente (z.B. moments_from_partials);
+                 sonst get_player_moments über player_stats_df
+
+    Returns:
+        Dictionary mit Gewinn-/Unentschieden-Wahrscheinlichkeiten und Differenz-Quantilen
+    """
+    team_a_players = list(team_a_players or [])
+    team_b_players = list(team_b_players or [])
+    if not team_a_players or not team_b_players:
+        return {"error": "Beide Teams brauchen mindestens einen Spieler"}
+
+    if moments is None:
+        moments = get_player_moments(player_stats_df, map_name)
+    if moments is None:
+        return {"error": "Players-CSV hat nicht die erwarteten Spalten (mind. Player, score)."}
+
+    players = team_a_players + team_b_players
+    mu = np.empty((len(players), len(_METRICS)))
+    sd = np.empty((len(players), len(_METRICS)))
+    used_fallback_for = []
+    for i, player in enumerate(players):
+        idx = moments["index"].get(player)
+        if idx is None:
+            used_fallback_for.append(player)
+            mu[i] = moments["overall_mean"]
+            sd[i] = moments["overall_std"]
+        else:
+            mu[i] = moments["mean"][idx]
+            sd[i] = moments["std"][idx]
+
+    # +1 für Team A, -1 für Team B -> Differenz per Matrixprodukt
+    sign = np.concatenate([np.ones(len(team_a_players)), -np.ones(len(team_b_players))])
+
+    rng = np.random.default_rng(seed)
+    n_target = max(int(n_simulations), 1)
+    deadline = time.perf_counter() + max(float(time_budget_ms), 0.0) / 1000.0
+    started = time.perf_counter()
+
+    margins = []
+    n_done = 0
+    while n_done < n_target:
+        n = min(SIM_CHUNK_SIZE, n_target - n_done)
+        draws = np.rint(mu + sd * rng.standard_normal((n, len(players), len(_METRICS))))
+        margins.append(np.einsum("npm,p->nm", draws, sign))
+        n_done += n
+        if time.perf_counter() >= deadline:
+            break
+
+    margin = np.concatenate(margins, axis=0)
+    score_margin = margin[:, 0]
+    kills_margin = margin[:, 1]
+
+    p_draw = float(np.mean(np.abs(score_margin) <= draw_margin))
+    p_a = float(np.mean(score_margin > draw_margin))
+    p_b = float(np.mean(score_margin < -draw_margin))
+
+    return {
+        "team_a": {
+            "players": team_a_players,
+            "expected_score": round(float(mu[: len(team_a_players), 0].sum()), 2),
+        },
+        "team_b": {
+            "players": team_b_players,
+            "expected_score": round(float(mu[len(team_a_players):, 0].sum()), 2),
+        },
+        "win_probability": {
+            "team_a": round(p_a, 3),
+            "team_b": round(p_b, 3),
+            "draw": round(p_draw, 3),
+        },
+        "score_margin": {
+            "mean": round(float(score_margin.mean()), 2),
+            "std": round(float(score_margin.std()), 2),
+            "quantiles": _quantile_dict(score_margin, quantiles),
+        },
+        "kills_margin": {
+            "mean": round(float(kills_margin.mean()), 2),
+            "std": round(float(kills_margin.std()), 2),
+            "quantiles": _quantile_dict(kills_margin, quantiles),
+        },
+        "n_simulations": int(n_done),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+        "map_used": map_name if map_name else "Alle Maps",
+        "used_fallback_for": used_fallback_for,
+    }
@@ -0,0 +1,147 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Standard-Buckets (Sekunden) für Latenz-Histogramme
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_LOCK = threading.Lock()
+# name -> {"type", "help", "buckets", "series": {labels_tuple: value | histogram-dict}}
+_METRICS: dict[str, dict] = {}
+
+
+def _metric(name: str, kind: str, help_text: str, buckets=None) -> dict:
+    m = _METRICS.get(name)
+    if m is None:
+        m = {"type": kind, "help": help_text, "buckets": buckets, "series": {}}
+        _METRICS[name] = m
+    return m
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, help_text: str = "", value: float = 1.0, **labels):
+    """
+    Counter um value erhöhen.
+    """
+    with _LOCK:
+        series = _metric(name, "counter", help_text)["series"]
+        k = _key(labels)
+        series[k] = series.get(k, 0.0) + value
+
+
+def set_gauge(name: str, value: float, help_text: str = "", **labels):
+    with _LOCK:
+        _metric(name, "gauge", help_text)["series"][_key(labels)] = float(value)
+
+
+def observe(name: str, seconds: float, help_text: str = "", buckets=LATENCY_BUCKETS, **labels):
+    """
+    Wert in ein Histogramm eintragen (kumulative Buckets wie bei Prometheus).
+    """
+    with _LOCK:
+        m = _metric(name, "histogram", help_text, buckets)
+        k = _key(labels)
+        h = m["series"].get(k)
+        if h is None:
+            h = {"counts": [0] * len(m["buckets"]), "sum": 0.0, "count": 0}
+            m["series"][k] = h
+        for i, bound in enumerate(m["buckets"]):
+            if seconds <= bound:
+                h["counts"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+
+@contextmanager
+def timer(name: str, help_text: str = "", **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, help_text, **labels)
+
+
+def function_timer(function_name: str):
+    """
+    Laufzeit eines Code-Blocks als vrfrag_function_duration_seconds{function=...}.
+    """
+    return timer("vrfrag_function_duration_seconds", "Laufzeit ausgewählter Funktionen",
+                 function=function_name)
+
+
+def timed(function_name: str):
+    """
+    Decorator-Variante von function_timer.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with function_timer(function_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def cache_access(cache: str, hit: bool):
+    inc("vrfrag_cache_requests_total", "Cache-Zugriffe nach Ergebnis", cache=cache,
+        result="hit" if hit else "miss")
+
+
+@contextmanager
+def upstream(service: str, operation: str):
+    """
+    Zeitmessung eines ausgehenden HTTP-Calls (vrfrag, github). Der Status wird über
+    das zurückgegebene Dict gesetzt: with upstream(...) as call: ...; call["status"] = r.status_code
+    """
+    call = {"status": "error"}
+    started = time.perf_counter()
+    try:
+        yield call
+    finally:
+        observe("vrfrag_upstream_request_duration_seconds", time.perf_counter() - started,
+                "Dauer ausgehender HTTP-Requests", service=service, operation=operation,
+                status=call["status"])
+
+
+def ingest_stage(stage: str):
+    return timer("vrfrag_ingest_stage_duration_seconds", "Dauer der Ingest-Stufen", stage=stage)
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def render() -> str:
+    """
+    Alle Metriken im Prometheus-Textformat (Version 0.0.4).
+    """
+    lines = []
+    with _LOCK:
+        for name in sorted(_METRICS):
+            m = _METRICS[name]
+            if m["help"]:
+                lines.append(f"# HELP {name} {m['help']}")
+            lines.append(f"# TYPE {name} {m['type']}")
+            for key in sorted(m["series"]):
+                value = m["series"][key]
+                if m["type"] != "histogram":
+                    lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(value)}")
+                    continue
+                for bound, count in zip(m["buckets"], value["counts"]):
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', repr(float(bound))),))} {count}")
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {value['count']}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {repr(float(value['sum']))}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
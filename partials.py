@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from event_dates import ISO_COLUMN
+
+# Dimension der Partials -> Spalte der Faktentabelle
+DIMENSIONS = {
+    "player": "Player",
+    "map": "maptitle",
+    "event": "EventId",
+    "date": ISO_COLUMN,
+    "team": "team",
+}
+# Gruppenschlüssel innerhalb eines Events (event/date sind pro Event konstant)
+PARTIAL_DIMENSIONS = ("player", "map", "team")
+EVENT_DIMENSIONS = ("event", "date")
+
+# Summen-Spalten (n = Spielerzeilen = Einsätze, ein Spieler spielt ein Match einmal)
+VALUE_COLUMNS = {
+    "kills": "kills",
+    "deaths": "deaths",
+    "assists": "assists",
+    "score": "score",
+    "kd": "kd_match",
+    "mvp": "isMVP",
+    "wins": "playerWon",
+}
+# Davon zusätzlich als Quadratsumme (für Streuungen)
+SQUARED_COLUMNS = ("kills", "deaths", "assists", "score", "kd")
+
+SUM_COLUMNS = ["n"] + list(VALUE_COLUMNS) + [f"{c}_sq" for c in SQUARED_COLUMNS]
+COLUMNS = list(PARTIAL_DIMENSIONS) + list(EVENT_DIMENSIONS) + SUM_COLUMNS + ["fingerprint"]
+
+# Faktenspalten, die in den Fingerprint eines Events eingehen (matchId nicht: die ist
+# nur innerhalb eines Datenstands gültig und verschiebt sich bei neuen Events)
+_FINGERPRINT_COLUMNS = [DIMENSIONS[d] for d in PARTIAL_DIMENSIONS] + [ISO_COLUMN] + list(VALUE_COLUMNS.values())
+
+
+def _labels(s: pd.Series) -> np.ndarray:
+    return s.astype(object).where(s.notna(), None).to_numpy()
+
+
+def event_fingerprints(facts: pd.DataFrame) -> pd.Series:
+    """
+    Reihenfolgeunabhängige Prüfsumme pro Event (EventId -> uint64) in einem Durchlauf
+    über die Faktentabelle.
+    """
+    events = pd.Categorical(_labels(facts[DIMENSIONS["event"]]))
+    hashes = pd.util.hash_pandas_object(facts[_FINGERPRINT_COLUMNS], index=False).to_numpy()
+    sums = np.zeros(len(events.categories), dtype=np.uint64)
+    ok = events.codes >= 0
+    np.add.at(sums, events.codes[ok], hashes[ok])
+    return pd.Series(sums, index=[str(e) for e in events.categories], dtype=np.uint64)
+
+
+def _aggregate_events(facts: pd.DataFrame, fingerprints: pd.Series) -> pd.DataFrame:
+    """
+    Summen, Quadratsummen und Zeilenzahl pro (Event, Spieler, Map, Team).
+    """
+    frame = pd.DataFrame({dim: _labels(facts[DIMENSIONS[dim]]) for dim in PARTIAL_DIMENSIONS})
+    frame["event"] = facts[DIMENSIONS["event"]].astype(str).to_numpy()
+    frame["n"] = 1.0
+    for name, col in VALUE_COLUMNS.items():
+        frame[name] = facts[col].to_numpy(dtype=np.float64)
+    for name in SQUARED_COLUMNS:
+        frame[f"{name}_sq"] = frame[name] ** 2
+
+    keys = ["event"] + list(PARTIAL_DIMENSIONS)
+    part = frame.groupby(keys, dropna=False, sort=False)[SUM_COLUMNS].sum().reset_index()
+    for dim in PARTIAL_DIMENSIONS:
+        part[dim] = _labels(part[dim])
+
+    # ein Datum pro Event (erstes vorhandenes)
+    dates = pd.Series(_labels(facts[ISO_COLUMN]), index=frame["event"]).dropna()
+    dates = dates[~dates.index.duplicated()]
+    part["date"] = part["event"].map(dates).astype(object)
+    part["date"] = _labels(part["date"])
+    part["fingerprint"] = part["event"].map(fingerprints).to_numpy(dtype=np.uint64)
+    return part
+
+
+def build_partials(facts: pd.DataFrame, previous: pd.DataFrame | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Partials aller Events der Faktentabelle. Partials aus previous (z.B. aus dem vorigen
+    Datenstand) werden für Events mit unverändertem Fingerprint übernommen; aggregiert
+    werden nur neue oder geänderte Events.
+
+    Gibt (Partials, {"events", "reused", "rows"}) zurück; Spalten siehe COLUMNS.
+    """
+    fingerprints = event_fingerprints(facts)
+    current = set(zip(fingerprints.index, fingerprints.to_numpy().tolist()))
+
+    parts, reused = [], set()
+    if previous is not None and len(previous):
+        prev_keys = pd.Series(list(zip(
+            previous["event"].astype(str), previous["fingerprint"].to_numpy(dtype=np.uint64).tolist()
+        )))
+        keep = prev_keys.isin(current).to_numpy()
+        if keep.any():
+            old = previous.loc[keep, COLUMNS].reset_index(drop=True)
+            for dim in PARTIAL_DIMENSIONS + EVENT_DIMENSIONS:
+                old[dim] = _labels(old[dim])
+            parts.append(old)
+            reused = set(old["event"].astype(str))
+
+    fresh = [e for e in fingerprints.index if e not in reused]
+    if fresh:
+        rows = facts[facts[DIMENSIONS["event"]].astype(str).isin(fresh)]
+        parts.append(_aggregate_events(rows, fingerprints))
+
+    stats = {"events": len(fingerprints), "reused": len(reused)}
+    if not parts:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in COLUMNS}), dict(stats, rows=0)
+
+    out = pd.concat(parts, ignore_index=True)[COLUMNS]
+    out = out.sort_values(["event", "player", "map", "team"], na_position="last", kind="stable").reset_index(drop=True)
+    return out, dict(stats, rows=len(out))
+
+
+def totals(partials: pd.DataFrame, by, mask: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    Summen der Partials pro Gruppe (Index = by, fehlende Schlüssel fallen weg).
+    Ohne by: eine Zeile über alles.
+    """
+    df = partials if mask is None else partials[mask]
+    if not by:
+        return df[SUM_COLUMNS].sum().to_frame().T
+    return df.groupby(list(by), observed=True, sort=True)[SUM_COLUMNS].sum()
+
+
+def mean(t: pd.DataFrame, value: str) -> pd.Series:
+    return t[value] / t["n"].where(t["n"] > 0)
+
+
+def std(t: pd.DataFrame, value: str) -> pd.Series:
+    """
+    Stichproben-Standardabweichung (ddof=1 wie pandas) aus Summe und Quadratsumme.
+    """
+    n = t["n"].where(t["n"] > 1)
+    var = (t[f"{value}_sq"] - t[value] ** 2 / t["n"].where(t["n"] > 0)) / (n - 1)
+    return np.sqrt(var.clip(lower=0.0))
+
+
+def map_mask(partials: pd.DataFrame, map_name) -> np.ndarray | None:
+    """
+    Zeilenmaske für eine Map; None (= alle Zeilen), wenn keine Map angegeben ist oder es
+    für sie keine Daten gibt (wie vrfrag_teams._filter_by_map).
+    """
+    if not map_name:
+        return None
+    mask = (partials["map"].astype(str) == str(map_name)).to_numpy()
+    return mask if mask.any() else None
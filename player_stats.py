@@ -1,11 +1,18 @@
 import os
 import re
+import numpy as np
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 import json
 from datetime import datetime
 
+from event_dates import ISO_COLUMN, add_event_date_iso, drop_duplicate_sessions, event_date_iso
+import metrics
+import partials
+import snapshot
+from schema import FACTS_SCHEMA, MATCHES_SCHEMA, PLAYERS_SCHEMA, apply_schema, read_table, to_bool
+
 # Ordner definieren
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FILES_FOLDER = os.path.join(BASE_DIR, 'files')
@@ -19,6 +26,14 @@ os.makedirs(EVENTS_FOLDER, exist_ok=True)
 PLAYERS_FILE = os.path.join(FILES_FOLDER, 'vrfrag_players.csv')
 MATCHES_FILE = os.path.join(FILES_FOLDER, 'vrfrag_matches.csv')
 
+# Denormalisierte Spieler-Match-Faktentabelle (eine Zeile pro Spieler und Match)
+FACT_COLUMNS = [
+    'matchId', 'EventId', 'matchNr', 'maptitle', 'EventDate', 'EventTimeRange', ISO_COLUMN,
+    'Player', 'nickname', 'team', 'kills', 'assists', 'deaths', 'score', 'kd_match',
+    'isMVP', 'playerWon', 'matchWinner', 'mvpPlayer',
+]
+FACT_BOOL_COLUMNS = ['isMVP', 'playerWon']
+
 def parse_event_file(filepath):
     """
     Read an event .txt file.
@@ -46,7 +61,9 @@ def fetch_stats_dataframe(url):
     `globalAllMatchesResults`, plus extract bookingDate and bookingStartEnd.
     """
     try:
-        response = requests.get(url, timeout=30)
+        with metrics.upstream("vrfrag", "match_results") as call:
+            response = requests.get(url, timeout=30)
+            call["status"] = response.status_code
         if response.status_code != 200:
             print(f"Error fetching page: {response.status_code}")
             return None, None, None, None
@@ -227,30 +244,131 @@ def load_existing_data():
     matches_df = pd.DataFrame()
     
     if os.path.exists(PLAYERS_FILE):
-        players_df = pd.read_csv(PLAYERS_FILE)
+        players_df = read_table(PLAYERS_FILE, PLAYERS_SCHEMA)
         print(f"Loaded existing players data: {len(players_df)} entries")
     
     if os.path.exists(MATCHES_FILE):
-        matches_df = pd.read_csv(MATCHES_FILE)
+        matches_df = read_table(MATCHES_FILE, MATCHES_SCHEMA)
         print(f"Loaded existing matches data: {len(matches_df)} entries")
     
     return players_df, matches_df
 
+def build_fact_table(players_df, matches_df):
+    """
+    Baut die denormalisierte Faktentabelle: Spielerzeilen mit maptitle, ganzzahliger
+    matchId (chronologisch, gültig innerhalb eines Datenstands), ISO-Datum, kd_match,
+    typisiert nach schema.FACTS_SCHEMA (Categoricals, kleine Integer, Booleans). Danach braucht kein Konsument mehr Joins oder matchKey-Strings.
+    Sessions, die unter mehreren Event-Dateien liegen, zählen nur einmal (drop_duplicate_sessions).
+    """
+    p = drop_duplicate_sessions(players_df).copy()
+    for col in ['EventDate', 'EventTimeRange']:
+        if col not in p.columns:
+            p[col] = None
+
+    if matches_df is not None and not matches_df.empty and 'maptitle' in matches_df.columns:
+        m = matches_df.copy()
+        for col in ['EventDate', 'EventTimeRange']:
+            if col not in m.columns:
+                m[col] = None
+        # pro Event joinen; ältere CSVs ohne EventId über Datum + Zeitfenster
+        if 'EventId' in p.columns and 'EventId' in m.columns:
+            keys = ['EventId', 'matchNr']
+        else:
+            keys = ['matchNr', 'EventDate', 'EventTimeRange']
+        p = p.drop(columns=['maptitle'], errors='ignore').merge(
+            m[keys + ['maptitle']].drop_duplicates(subset=keys), how='left', on=keys
+        )
+    elif 'maptitle' not in p.columns:
+        p['maptitle'] = None
+
+    for c in ['kills', 'assists', 'deaths', 'score']:
+        p[c] = pd.to_numeric(p[c], errors='coerce').fillna(0) if c in p.columns else 0
+    p['matchNr'] = pd.to_numeric(p['matchNr'], errors='coerce').fillna(0).astype(int)
+
+    kills = p['kills'].to_numpy(dtype=float)
+    deaths = p['deaths'].to_numpy(dtype=float)
+    p['kd_match'] = np.where(deaths != 0, kills / np.where(deaths != 0, deaths, 1.0), kills)
+
+    for c in FACT_BOOL_COLUMNS:
+        p[c] = to_bool(p[c]) if c in p.columns else False
+
+    p[ISO_COLUMN] = event_date_iso(p)
+
+    # Event-Schlüssel: EventId, bei älteren Daten Datum + Zeitfenster
+    if 'EventId' not in p.columns:
+        p['EventId'] = p['EventDate'].astype(str) + '|' + p['EventTimeRange'].astype(str)
+
+    # chronologisch sortierte Gruppen -> fortlaufende ganzzahlige Match-Id
+    p['matchId'] = p.groupby(
+        [ISO_COLUMN, 'EventTimeRange', 'EventId', 'matchNr'], sort=True, dropna=False, observed=True
+    ).ngroup()
+
+    for c in FACT_COLUMNS:
+        if c not in p.columns:
+            p[c] = None
+    return apply_schema(p[FACT_COLUMNS].reset_index(drop=True), FACTS_SCHEMA)
+
+def build_event_partials(facts_df, previous=None):
+    """
+    Aggregat-Partials pro Event (partials.build_partials) für snapshot.publish_version;
+    Events, die sich gegenüber dem vorigen Datenstand nicht geändert haben, werden übernommen.
+    """
+    with metrics.ingest_stage("build_partials"):
+        part, stats = partials.build_partials(facts_df, previous)
+    print(f"✓ Partials: {stats['events']} events ({stats['reused']} reused), {stats['rows']} rows")
+    return part
+
+def _write_csv_atomic(df, path):
+    """
+    Über eine temporäre Datei + os.replace schreiben, damit Leser nie eine halbe Datei sehen.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp, index=False, encoding='utf-8')
+    os.replace(tmp, path)
+
+def _check_columns_kept(df, path):
+    """
+    Eine vorhandene CSV nie mit weniger Spalten überschreiben als sie hat.
+    """
+    if not os.path.exists(path):
+        return
+    missing = [c for c in pd.read_csv(path, nrows=0).columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} würde Spalten verlieren: {', '.join(missing)}")
+
 def save_combined_data(players_df, matches_df):
     """
-    Speichert die kombinierten Daten in die festen Dateien
+    Veröffentlicht die kombinierten Daten als neuen Datenstand (snapshot.publish_version)
+    und schreibt danach die festen Dateien in files/ (für den GitHub-Push und den nächsten
+    Merge). Der Server liest nur den veröffentlichten Stand, sieht also nie neue Players
+    mit alten Matches. Gibt die Version zurück, None bei Fehlern.
     """
     try:
-        players_df.to_csv(PLAYERS_FILE, index=False, encoding='utf-8')
-        matches_df.to_csv(MATCHES_FILE, index=False, encoding='utf-8')
-        
+        _check_columns_kept(players_df, PLAYERS_FILE)
+        _check_columns_kept(matches_df, MATCHES_FILE)
+
+        with metrics.ingest_stage("build_fact_table"):
+            facts_df = build_fact_table(players_df, matches_df)
+
+        # unveränderliche Versions-Directory (CSVs + spaltenweise Faktentabelle), dann
+        # Zeiger umschalten -> der Server wechselt Players, Matches und Fakten gemeinsam
+        with metrics.ingest_stage("publish_version"):
+            version = snapshot.publish_version(
+                {os.path.basename(PLAYERS_FILE): players_df, os.path.basename(MATCHES_FILE): matches_df},
+                lambda _folder: facts_df,
+                build_partials=build_event_partials,
+            )
+        print(f"✓ Published dataset version: {version}")
+
+        _write_csv_atomic(players_df, PLAYERS_FILE)
+        _write_csv_atomic(matches_df, MATCHES_FILE)
         print(f"✓ Saved players data to: {PLAYERS_FILE} ({len(players_df)} entries)")
         print(f"✓ Saved matches data to: {MATCHES_FILE} ({len(matches_df)} entries)")
-        
-        return True
+
+        return version
     except Exception as e:
         print(f"Error saving data: {e}")
-        return False
+        return None
 
 # Korrigiere die extract_event_date Funktion am Ende der Datei:
 
@@ -334,9 +452,9 @@ def merge_events(events_folder=EVENTS_FOLDER):
     if not player_dfs or (len(player_dfs) == 1 and player_dfs[0].empty):
         return existing_players, existing_matches, 0
 
-    # Concatenate
-    merged_players = pd.concat(player_dfs, ignore_index=True).drop_duplicates()
-    merged_matches = pd.concat(match_dfs, ignore_index=True).drop_duplicates()
+    # Concatenate (+ normalisiertes Event-Datum, damit der Server nicht pro Request parsen muss)
+    merged_players = add_event_date_iso(pd.concat(player_dfs, ignore_index=True)).drop_duplicates()
+    merged_matches = add_event_date_iso(pd.concat(match_dfs, ignore_index=True)).drop_duplicates()
 
     print(f"\n✓ Successfully merged data from {successful_files} new event files")
     print(f"  - Total players entries: {len(merged_players)}")
@@ -354,21 +472,34 @@ def generate_statistics():
         print(f"Files folder: {FILES_FOLDER}")
         
         # Events mergen (kombiniert mit vorhandenen Daten)
-        merged_players, merged_matches, new_files = merge_events()
+        with metrics.ingest_stage("merge_events"):
+            merged_players, merged_matches, new_files = merge_events()
         
         if new_files == 0 and not merged_players.empty:
             print("✓ No new events to process, using existing data")
         
         # Daten speichern (überschreibt vorhandene Dateien)
-        save_success = save_combined_data(merged_players, merged_matches)
+        with metrics.ingest_stage("save_combined_data"):
+            dataset_version = save_combined_data(merged_players, merged_matches)
         
-        if not save_success:
+        if not dataset_version:
             return {'success': False, 'error': 'Failed to save data files'}
+
+        # Synergie-Matrizen inkrementell um neue Events ergänzen
+        try:
+            from synergy import update_synergy_file
+            with metrics.ingest_stage("synergy_index"):
+                # gleiche Sessions/Event-Schlüssel wie die Faktentabelle, die der Server abgleicht
+                _idx, synergy_added = update_synergy_file(drop_duplicate_sessions(merged_players))
+            print(f"✓ Synergy index updated ({synergy_added} new events)")
+        except Exception as e:
+            print(f"Warning: synergy index update failed: {e}")
         
         return {
             'success': True,
             'players_file': os.path.basename(PLAYERS_FILE),
             'matches_file': os.path.basename(MATCHES_FILE),
+            'dataset_version': dataset_version,
             'player_count': len(merged_players),
             'match_count': len(merged_matches),
             'unique_players': merged_players['Player'].nunique(),
@@ -0,0 +1,137 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Ringverzeichnis für Request-Profile (die ältesten fliegen raus)
+PROFILE_DIR = os.environ.get("VRFRAG_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+MAX_PROFILES = int(os.environ.get("VRFRAG_PROFILE_MAX", 50))
+# Anteil zufällig profilierter Requests (0 = aus)
+SAMPLE_RATE = float(os.environ.get("VRFRAG_PROFILE_SAMPLE_RATE", 0) or 0)
+# Admin-Token: Header "X-Profile: <token>" erzwingt ein Profil, schützt die Profil-Endpoints
+ADMIN_TOKEN = os.environ.get("VRFRAG_PROFILE_TOKEN", "")
+PROFILE_HEADER = "X-Profile"
+
+# Es kann immer nur ein Profiler aktiv sein -> parallele Requests werden nicht profiliert
+_ACTIVE = threading.Lock()
+_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}\.[0-9]{6}-[0-9a-f]{6}$")
+
+
+def is_admin(headers) -> bool:
+    return bool(ADMIN_TOKEN) and headers.get(PROFILE_HEADER) == ADMIN_TOKEN
+
+
+def start(headers):
+    """
+    Startet einen Profiler, wenn der Request per Admin-Header oder Sampling ausgewählt wurde
+    und gerade kein anderer läuft. Gibt den Profiler oder None zurück.
+    """
+    if not (is_admin(headers) or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)):
+        return None
+    if not _ACTIVE.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # anderes Profiling-Tool aktiv
+        _ACTIVE.release()
+        return None
+    return profiler
+
+
+def finish(profiler, meta: dict) -> str | None:
+    """
+    Stoppt den Profiler und legt <id>.prof (pstats-Dump) + <id>.json (Metadaten) ab.
+    """
+    try:
+        profiler.disable()
+    finally:
+        _ACTIVE.release()
+
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        # zeitlich sortierbare Id (Mikrosekunden), damit der Ring die ältesten entfernt
+        now = time.time()
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}.{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:6]}"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+        meta = dict(meta, id=profile_id, created=time.time())
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        _trim()
+        return profile_id
+    except Exception as e:
+        print(f"Profil konnte nicht gespeichert werden: {e}")
+        return None
+
+
+def abort(profiler):
+    """
+    Profiler ohne Speichern stoppen (z.B. bei einer Exception im Request).
+    """
+    try:
+        profiler.disable()
+    finally:
+        _ACTIVE.release()
+
+
+def _trim():
+    ids = sorted(f[:-5] for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
+    for profile_id in ids[: max(len(ids) - MAX_PROFILES, 0)]:
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + ext))
+            except OSError:
+                pass
+
+
+def list_profiles() -> list[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def profile_path(profile_id: str) -> str | None:
+    if not _ID_RE.match(profile_id or ""):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
+
+
+def top_stats(profile_id: str, limit: int = 25, sort: str = "cumulative") -> list[dict] | None:
+    """
+    Top-N Funktionen eines Profils (Default: nach kumulierter Zeit).
+    """
+    path = profile_path(profile_id)
+    if path is None:
+        return None
+    sort = sort if sort in ("cumulative", "tottime", "ncalls") else "cumulative"
+    stats = pstats.Stats(path)
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        cc, nc, tt, ct, _callers = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            "function": f"{os.path.relpath(filename, BASE_DIR) if filename.startswith(BASE_DIR) else filename}:{line}({name})",
+            "ncalls": nc,
+            "primitive_calls": cc,
+            "tottime_ms": round(tt * 1000.0, 3),
+            "cumtime_ms": round(ct * 1000.0, 3),
+        })
+    return rows
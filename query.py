@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from partials import DIMENSIONS, SUM_COLUMNS
+
+# Kennzahl -> (Art, Summen-Spalte, Faktor)
+#   sum:  Summe über die Gruppe
+#   mean: Summe / n
+#   std:  Stichproben-Standardabweichung aus Summe + Quadratsumme
+METRICS = {
+    "games": ("sum", "n", 1.0),
+    "total_kills": ("sum", "kills", 1.0),
+    "total_deaths": ("sum", "deaths", 1.0),
+    "total_assists": ("sum", "assists", 1.0),
+    "total_score": ("sum", "score", 1.0),
+    "mvp_count": ("sum", "mvp", 1.0),
+    "wins": ("sum", "wins", 1.0),
+    "avg_kills": ("mean", "kills", 1.0),
+    "avg_deaths": ("mean", "deaths", 1.0),
+    "avg_assists": ("mean", "assists", 1.0),
+    "avg_score": ("mean", "score", 1.0),
+    "avg_kd": ("mean", "kd", 1.0),
+    "winrate": ("mean", "wins", 100.0),
+    "std_kills": ("std", "kills", 1.0),
+    "std_deaths": ("std", "deaths", 1.0),
+    "std_score": ("std", "score", 1.0),
+    "std_kd": ("std", "kd", 1.0),
+}
+
+MAX_LIMIT = 1000
+
+
+class QueryError(ValueError):
+    pass
+
+
+class AggregateEngine:
+    """
+    Spaltenweise Abfragen über die Event-Partials (partials.build_partials): jede Dimension als Integer-Codes
+    (+ Label-Liste), jede Summe als float64-Array. Filter sind Masken über die Codes,
+    Gruppierung ein kombinierter Integer-Schlüssel + np.bincount; keine pandas-Gruppierung
+    pro Abfrage.
+    """
+
+    def __init__(self, partials: pd.DataFrame):
+        self.rows = len(partials)
+        self.codes, self.labels, self.lookup = {}, {}, {}
+        for dim in DIMENSIONS:
+            cat = pd.Categorical(partials[dim].astype(object).where(partials[dim].notna(), None))
+            labels = [str(c) for c in cat.categories]
+            # fehlender Wert (Code -1) bekommt den letzten Slot
+            self.codes[dim] = np.where(cat.codes < 0, len(labels), cat.codes).astype(np.int64)
+            self.labels[dim] = labels + [None]
+            self.lookup[dim] = {label: i for i, label in enumerate(labels)}
+        self.values = {c: partials[c].to_numpy(dtype=np.float64) for c in SUM_COLUMNS}
+
+    def _mask(self, filters: dict) -> np.ndarray:
+        mask = np.ones(self.rows, dtype=bool)
+        for dim, values in (filters or {}).items():
+            if dim in ("date_from", "date_to"):
+                continue
+            if dim not in DIMENSIONS:
+                raise QueryError(f"Unbekannter Filter: {dim}")
+            wanted = [self.lookup[dim][v] for v in values if v in self.lookup[dim]]
+            mask &= np.isin(self.codes[dim], np.asarray(wanted, dtype=np.int64))
+
+        date_from, date_to = (filters or {}).get("date_from"), (filters or {}).get("date_to")
+        if date_from or date_to:
+            ok = np.array([
+                label is not None and (not date_from or label >= date_from) and (not date_to or label <= date_to)
+                for label in self.labels["date"]
+            ], dtype=bool)
+            mask &= ok[self.codes["date"]]
+        return mask
+
+    def query(self, group_by=(), metrics=("games",), filters=None, order_by=None,
+              descending=True, limit=100) -> dict:
+        group_by = list(dict.fromkeys(group_by or ()))
+        metrics = list(dict.fromkeys(metrics or ()))
+        unknown = [d for d in group_by if d not in DIMENSIONS] + [m for m in metrics if m not in METRICS]
+        if unknown:
+            raise QueryError(f"Unbekannte Dimension/Kennzahl: {', '.join(unknown)}")
+        if not metrics:
+            raise QueryError("Mindestens eine Kennzahl angeben")
+        order_by = order_by or metrics[0]
+        if order_by not in metrics and order_by not in group_by:
+            raise QueryError(f"order_by muss eine gewählte Kennzahl oder Dimension sein: {order_by}")
+
+        mask = self._mask(filters)
+
+        # gemischtes Stellenwertsystem über die Dimensions-Codes -> ein Schlüssel pro Gruppe
+        key = np.zeros(int(mask.sum()), dtype=np.int64)
+        for dim in group_by:
+            key = key * len(self.labels[dim]) + self.codes[dim][mask]
+        groups, inverse = np.unique(key, return_inverse=True)
+
+        needed = {"n"} | {METRICS[m][1] for m in metrics} | {f"{METRICS[m][1]}_sq" for m in metrics if METRICS[m][0] == "std"}
+        sums = {c: np.bincount(inverse, weights=self.values[c][mask], minlength=len(groups)) for c in needed}
+
+        columns = {}
+        rest = groups.copy()
+        for dim in reversed(group_by):
+            size = len(self.labels[dim])
+            columns[dim] = [self.labels[dim][c] for c in (rest % size)]
+            rest //= size
+        n = sums["n"]
+        for m in metrics:
+            kind, col, factor = METRICS[m]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if kind == "sum":
+                    columns[m] = sums[col] * factor
+                elif kind == "mean":
+                    columns[m] = np.where(n > 0, sums[col] / n * factor, np.nan)
+                else:
+                    var = (sums[f"{col}_sq"] - sums[col] ** 2 / n) / (n - 1)
+                    columns[m] = np.where(n > 1, np.sqrt(np.clip(var, 0.0, None)), np.nan)
+
+        order = np.arange(len(groups))
+        if order_by in metrics:
+            values = np.nan_to_num(columns[order_by], nan=-np.inf if descending else np.inf)
+            order = np.argsort(-values if descending else values, kind="stable")
+        else:
+            labels = columns[order_by]
+            order = np.array(sorted(order, key=lambda i: (labels[i] is None, labels[i] or "")), dtype=np.int64)
+            if descending:
+                order = order[::-1]
+        order = order[: max(1, min(int(limit), MAX_LIMIT))]
+
+        rows = []
+        for i in order:
+            row = {dim: columns[dim][i] for dim in group_by}
+            for m in metrics:
+                v = columns[m][i]
+                row[m] = None if np.isnan(v) else (int(v) if METRICS[m][0] == "sum" else float(v))
+            rows.append(row)
+        return {"group_by": group_by, "metrics": metrics, "total_groups": int(len(groups)), "rows": rows}
@@ -0,0 +1,116 @@
+import os
+
+import pandas as pd
+
+from event_dates import ISO_COLUMN
+
+# Spaltentypen der CSV-Dateien:
+#   "category"      wiederkehrende Strings (Spieler, Maps, Teams, Event-Felder)
+#   "bool"          True/False, auch aus "true"/"1"/"yes"-Strings
+#   int-/float-Dtype  numerische Spalten; bei fehlenden Werten bleibt es bei float64
+# Spalten, die hier nicht stehen, werden nicht eingelesen (usecols).
+PLAYERS_SCHEMA = {
+    "EventId": "category",
+    "matchNr": "int16",
+    "nickname": "category",
+    "Player": "category",
+    "team": "category",
+    "kills": "int32",
+    "assists": "int32",
+    "deaths": "int32",
+    "score": "int32",
+    "isMVP": "bool",
+    "playerWon": "bool",
+    "matchWinner": "category",
+    "mvpPlayer": "category",
+    "maptitle": "category",
+    "EventDate": "category",
+    "EventTimeRange": "category",
+    ISO_COLUMN: "category",
+}
+
+MATCHES_SCHEMA = {
+    "EventId": "category",
+    "matchNr": "int16",
+    "courtsMask": "int16",
+    "maptitle": "category",
+    "teamA": "category",
+    "teamB": "category",
+    "teamAPoints": "int16",
+    "teamBPoints": "int16",
+    "teamAPointsHalfTime": "int16",
+    "teamBPointsHalfTime": "int16",
+    "matchCompleted": "int16",
+    "mvp": "category",
+    "winner": "category",
+    "EventDate": "category",
+    "EventTimeRange": "category",
+    ISO_COLUMN: "category",
+}
+
+FACTS_SCHEMA = dict(PLAYERS_SCHEMA, matchId="int32", kd_match="float64")
+
+# Dateiname -> Schema (für Loader, die nur den Pfad kennen)
+SCHEMAS = {
+    "vrfrag_players.csv": PLAYERS_SCHEMA,
+    "vrfrag_matches.csv": MATCHES_SCHEMA,
+}
+
+_TRUE_STRINGS = ["true", "1", "yes"]
+
+
+def schema_for(path: str) -> dict | None:
+    return SCHEMAS.get(os.path.basename(path))
+
+
+def to_bool(s: pd.Series) -> pd.Series:
+    if s.dtype == bool:
+        return s
+    return s.astype(str).str.strip().str.lower().isin(_TRUE_STRINGS)
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Bringt vorhandene Spalten auf die Typen aus schema (in place, gibt df zurück).
+    Ganzzahl-Spalten mit fehlenden Werten bleiben float64, damit NaN erhalten bleibt.
+    """
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        s = df[col]
+        if dtype == "category":
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[col] = s.astype("category")
+        elif dtype == "bool":
+            df[col] = to_bool(s)
+        else:
+            num = pd.to_numeric(s, errors="coerce")
+            if pd.api.types.is_integer_dtype(dtype) and num.isna().any():
+                df[col] = num.astype("float64")
+            else:
+                df[col] = num.astype(dtype)
+    return df
+
+
+def read_table(path: str, schema: dict | None = None) -> pd.DataFrame:
+    """
+    CSV mit explizitem Schema lesen: Strings direkt als Categorical, kleine Integer-Typen
+    und echte Booleans. Spalten ohne Schema bleiben erhalten (Typ wie bei pd.read_csv),
+    damit ein späteres Zurückschreiben sie nicht verliert. Ohne bekanntes Schema wie pd.read_csv.
+    """
+    schema = schema if schema is not None else schema_for(path)
+    if schema is None:
+        return pd.read_csv(path)
+
+    df = pd.read_csv(path, dtype={c: "category" for c, t in schema.items() if t == "category"})
+    unknown = [c for c in df.columns if c not in schema]
+    if unknown:
+        print(f"Warnung: {os.path.basename(path)} hat Spalten ohne Schema: {', '.join(map(str, unknown))}")
+    return apply_schema(df, schema)
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Belegter Speicher in Bytes (inkl. Python-Strings in object-Spalten).
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -1,18 +1,35 @@
-from flask import Flask, request, send_from_directory, jsonify, render_template
+from flask import Flask, request, send_from_directory, jsonify, render_template, make_response, Response, g, has_request_context
 import subprocess
 import os
 import sys
+import bisect
+import gzip
+import hashlib
+import functools
 import requests
-import base64
 import difflib
+import threading
+import time
 import pandas as pd
 from datetime import datetime
 
 
 from get_players import get_players_from_url
-from player_stats import generate_statistics
+from player_stats import generate_statistics, build_fact_table, build_event_partials
+import export
+import metrics
+import partials
+import profiling
+import query
+import schema
+import snapshot
+from jobs import JobQueue
+from vrfrag_teams import BATCH_POOL_WORKERS, generate_fair_teams, generate_fair_teams_batch, rating_table_from_partials, _filter_by_map, _get_cached_model
+from match_simulation import simulate_match, moments_from_partials
+from synergy import get_synergy_index
+from github_sync import GitHubSync, GITHUB_API_URL
 from aliases import (
-    suggest_real_name, upsert_alias, load_aliases
+    suggest_real_name, upsert_alias, load_aliases, ALIASES_CSV
 )
 
 app = Flask(__name__)
@@ -29,12 +46,18 @@ REPO_OWNER = "Trent1337"
 REPO_NAME = "VRFrag"
 REPO_BRANCH = "main"
 
+# Hintergrund-Jobs (Event speichern, Statistiken neu bauen)
+JOBS = JobQueue()
+REBUILD_JOB_KEY = "rebuild-statistics"
+
 _CSV_CACHE: dict[str, dict] = {}
 
 def _read_csv_cached(path: str) -> pd.DataFrame:
     """
     Small in-process cache to avoid re-reading large CSVs for dashboard endpoints.
     Cache invalidates automatically when file mtime changes.
+    Bekannte Dateien werden typisiert gelesen (schema.py: Categoricals, kleine Integer, Booleans).
+    Dateien eines Datenstands ändern sich nie, dort ist der Pfad (= Version) der eigentliche Schlüssel.
     """
     try:
         mtime = os.path.getmtime(path)
@@ -43,10 +66,16 @@ def _read_csv_cached(path: str) -> pd.DataFrame:
 
     hit = _CSV_CACHE.get(path)
     if hit and hit.get("mtime") == mtime and isinstance(hit.get("df"), pd.DataFrame):
+        metrics.cache_access("csv", True)
         return hit["df"]
 
-    df = pd.read_csv(path)
+    metrics.cache_access("csv", False)
+    with metrics.function_timer("read_csv"):
+        df = schema.read_table(path)
     _CSV_CACHE[path] = {"mtime": mtime, "df": df}
+    # Einträge aufgeräumter Versionen verwerfen
+    for stale in [p for p in _CSV_CACHE if not os.path.exists(p)]:
+        _CSV_CACHE.pop(stale, None)
     return df
 
 
@@ -60,119 +89,153 @@ def _github_headers(token: str):
     }
 
 
-def save_file_to_github(repo_path: str, content: str, commit_message: str):
+_PULL_LOCK = threading.Lock()
+
+
+def sync_from_github():
     """
-    Speichert/aktualisiert eine Datei in GitHub (beliebiger Pfad),
-    z.B. 'events/x.txt' oder 'files/merged.csv_players.csv'
+    Delta-Sync von events/ und files/ aus GitHub nach ./events bzw. ./files:
+    ein Tree-Listing, Vergleich der Blob-SHAs, nur fehlende/geänderte Dateien werden
+    (parallel, gestreamt) geladen. Gleichzeitige Aufrufe warten auf den laufenden Sync.
+    Aus files/ kommen nur lokal fehlende Dateien (Bootstrap); vorhandene wie eine lokal
+    bearbeitete player_aliases.csv oder frisch generierte, noch nicht gepushte Statistiken
+    werden nie überschrieben.
     """
     token = os.environ.get("GITHUB_TOKEN")
     if not token:
         return {"success": False, "error": "GITHUB_TOKEN nicht konfiguriert"}
 
-    headers = _github_headers(token)
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{repo_path}"
+    with _PULL_LOCK:
+        sync = GitHubSync(REPO_OWNER, REPO_NAME, REPO_BRANCH, token)
+        result = sync.pull_files({"events/": EVENTS_FOLDER, "files/": FILES_FOLDER}, missing_only=("files/",))
+    if result.get("downloaded"):
+        print(f"GitHub-Sync: {len(result['downloaded'])} Dateien geladen, {len(result['unchanged'])} unverändert")
+    return result
 
-    content_base64 = base64.b64encode(content.encode("utf-8")).decode("utf-8")
 
-    # existierende SHA holen (für Update)
-    existing_sha = None
-    try:
-        r = requests.get(url, headers=headers, params={"ref": REPO_BRANCH}, timeout=20)
-        if r.status_code == 200:
-            existing_sha = r.json().get("sha")
-    except Exception:
-        pass
-
-    data = {
-        "message": commit_message,
-        "content": content_base64,
-        "branch": REPO_BRANCH,
+_LISTING_CACHE: dict[str, dict] = {}
+_LISTING_LOCK = threading.Lock()
+
+
+def _listing_item(entry: dict) -> dict:
+    return {
+        "name": entry.get("name"),
+        "size": entry.get("size", 0),
+        "sha": entry.get("sha"),
+        "download_url": entry.get("download_url"),
+        "html_url": entry.get("html_url"),
     }
-    if existing_sha:
-        data["sha"] = existing_sha
 
-    try:
-        r = requests.put(url, headers=headers, json=data, timeout=20)
-        resp = r.json() if r.content else {}
-        if r.status_code in (200, 201):
-            return {
-                "success": True,
-                "repo_path": repo_path,
-                "html_url": resp.get("content", {}).get("html_url", ""),
-            }
-        return {
-            "success": False,
-            "error": f"GitHub API Fehler: {r.status_code} - {resp.get('message', 'Unbekannter Fehler')}",
-        }
-    except Exception as e:
-        return {"success": False, "error": f"Verbindungsfehler: {str(e)}"}
+
+def _local_listing(folder: str) -> list[dict]:
+    if not os.path.isdir(folder):
+        return []
+    return [
+        {"name": name, "size": os.path.getsize(os.path.join(folder, name)), "sha": None,
+         "download_url": None, "html_url": None}
+        for name in sorted(os.listdir(folder))
+        if os.path.isfile(os.path.join(folder, name))
+    ]
 
 
-def download_file_from_github(repo_path: str, local_path: str):
+def list_github_dir(repo_dir: str, local_folder: str | None = None):
     """
-    Lädt eine Datei aus GitHub (contents API, base64 content) in ein lokales File.
+    Verzeichnis-Listing über die contents API mit Cache: das Listing wird samt ETag
+    gespeichert und per If-None-Match revalidiert (304 zählen nicht gegen das Rate-Limit).
+    Ist GitHub nicht erreichbar bzw. antwortet mit Fehler, wird local_folder gelistet.
+
+    Gibt (items, source, error) zurück; source ist "github", "cache" (304) oder "local".
     """
     token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        return False, "GITHUB_TOKEN nicht konfiguriert"
+    headers = _github_headers(token) if token else {"Accept": "application/vnd.github.v3+json"}
+    url = f"{GITHUB_API_URL}/repos/{REPO_OWNER}/{REPO_NAME}/contents/{repo_dir}"
 
-    headers = _github_headers(token)
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{repo_path}"
+    with _LISTING_LOCK:
+        hit = _LISTING_CACHE.get(repo_dir)
+    if hit and hit.get("etag"):
+        headers["If-None-Match"] = hit["etag"]
 
-    r = requests.get(url, headers=headers, params={"ref": REPO_BRANCH}, timeout=20)
-    if r.status_code != 200:
-        return False, f"GitHub download Fehler: {r.status_code} - {r.text}"
+    error = None
+    try:
+        with metrics.upstream("github", f"GET contents/{repo_dir}") as call:
+            r = requests.get(url, headers=headers, params={"ref": REPO_BRANCH}, timeout=20)
+            call["status"] = r.status_code
+        metrics.cache_access("github_listing", r.status_code == 304 and bool(hit))
+        if r.status_code == 304 and hit:
+            with _LISTING_LOCK:
+                return list(_LISTING_CACHE[repo_dir]["items"]), "cache", None
+        try:
+            payload = r.json() if r.status_code == 200 else None
+        except ValueError:
+            # 200 ohne gültiges JSON (z.B. Proxy-/Wartungsseite) -> wie ein Fehler behandeln
+            payload = None
+        if isinstance(payload, list):
+            items = [_listing_item(e) for e in payload if e.get("type", "file") == "file"]
+            with _LISTING_LOCK:
+                _LISTING_CACHE[repo_dir] = {"etag": r.headers.get("ETag"), "items": items}
+            return list(items), "github", None
+        error = f"GitHub Fehler: {r.status_code} - {r.text[:200]}"
+    except requests.RequestException as e:
+        error = f"Verbindungsfehler: {str(e)}"
+
+    if local_folder is not None:
+        return _local_listing(local_folder), "local", error
+    return None, None, error
+
+
+def note_github_dir_write(repo_dir: str, name: str, size: int):
+    """
+    Eigene Schreibzugriffe im gecachten Listing nachtragen, ohne GitHub erneut zu fragen.
+    """
+    with _LISTING_LOCK:
+        hit = _LISTING_CACHE.get(repo_dir)
+        if hit is None:
+            return
+        items = [i for i in hit["items"] if i["name"] != name]
+        items.append({"name": name, "size": size, "sha": None, "download_url": None, "html_url": None})
+        hit["items"] = sorted(items, key=lambda i: i["name"])
 
-    payload = r.json()
-    content_b64 = payload.get("content", "")
-    if not content_b64:
-        return False, "Keine content payload von GitHub erhalten"
 
-    content = base64.b64decode(content_b64).decode("utf-8", errors="replace")
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-    with open(local_path, "w", encoding="utf-8") as f:
-        f.write(content)
+def sync_files_to_github(files: dict, commit_message: str):
+    """
+    Schreibt mehrere lokale Dateien in EINEM Commit nach GitHub (Git Data API).
+    files: {Repo-Pfad: lokaler Pfad}; unveränderte Dateien werden per Blob-SHA übersprungen.
+    """
+    token = os.environ.get("GITHUB_TOKEN")
+    if not token:
+        return {"success": False, "error": "GITHUB_TOKEN nicht konfiguriert"}
+
+    contents = {}
+    for repo_path, local_path in files.items():
+        if local_path and os.path.exists(local_path):
+            with open(local_path, "rb") as f:
+                contents[repo_path] = f.read()
+    if not contents:
+        return {"success": True, "commit_sha": None, "changed": [], "unchanged": []}
 
-    return True, None
+    sync = GitHubSync(REPO_OWNER, REPO_NAME, REPO_BRANCH, token)
+    return sync.commit_files(contents, commit_message)
 
 
-def push_statistics_csvs_to_github(stats_result: dict):
+def push_statistics_csvs_to_github(stats_result: dict, extra_files: dict | None = None):
     """
-    Pusht die zuletzt generierten CSVs aus ./files nach GitHub unter files/.
+    Pusht die zuletzt generierten CSVs aus ./files nach GitHub unter files/ – zusammen mit
+    extra_files ({Repo-Pfad: lokaler Pfad}, z.B. neue Events) in einem einzigen Commit.
     Erwartet, dass generate_statistics() ein dict mit players_file und matches_file liefert.
     """
-    pushed = {}
-
-    players_file = stats_result.get("players_file")
-    matches_file = stats_result.get("matches_file")
-
-    # Falls generate_statistics nur Basenames liefert, auf absoluten Pfad mappen:
-    if players_file and not os.path.isabs(players_file):
-        players_file = os.path.join(FILES_FOLDER, os.path.basename(players_file))
-    if matches_file and not os.path.isabs(matches_file):
-        matches_file = os.path.join(FILES_FOLDER, os.path.basename(matches_file))
-
-    if players_file and os.path.exists(players_file):
-        with open(players_file, "r", encoding="utf-8") as f:
-            content = f.read()
-        repo_path = f"files/{os.path.basename(players_file)}"
-        pushed["players_csv"] = save_file_to_github(
-            repo_path=repo_path,
-            content=content,
-            commit_message=f"Update stats: {os.path.basename(players_file)}",
-        )
+    files = dict(extra_files or {})
 
-    if matches_file and os.path.exists(matches_file):
-        with open(matches_file, "r", encoding="utf-8") as f:
-            content = f.read()
-        repo_path = f"files/{os.path.basename(matches_file)}"
-        pushed["matches_csv"] = save_file_to_github(
-            repo_path=repo_path,
-            content=content,
-            commit_message=f"Update stats: {os.path.basename(matches_file)}",
-        )
+    for key in ("players_file", "matches_file"):
+        path = (stats_result or {}).get(key)
+        if not path:
+            continue
+        # Falls generate_statistics nur Basenames liefert, auf absoluten Pfad mappen:
+        if not os.path.isabs(path):
+            path = os.path.join(FILES_FOLDER, os.path.basename(path))
+        files[f"files/{os.path.basename(path)}"] = path
 
-    return pushed
+    names = ", ".join(sorted(os.path.basename(p) for p in files))
+    return sync_files_to_github(files, f"Update stats: {names}")
 
 
 # ----------------------------
@@ -185,6 +248,29 @@ def save_event_locally(filename: str, content: str):
     return local_path
 
 
+def _int_arg(name: str, default: int, maximum: int, minimum: int = 1) -> int:
+    """
+    Ganzzahliger Query-Parameter, begrenzt auf [minimum, maximum].
+    Nicht-numerische Eingaben lösen ValueError aus (-> 400 im Aufrufer).
+    """
+    return _int_value(request.args.get(name), default, maximum, minimum)
+
+
+def _int_value(raw, default: int, maximum: int, minimum: int = 1) -> int:
+    """
+    Wie _int_arg, für Werte aus dem JSON-Body (Zahl oder String, leer/None = default).
+    """
+    if isinstance(raw, bool):
+        raise ValueError("Wahrheitswert statt Zahl")
+    raw = str(raw).strip() if raw is not None else ""
+    value = int(raw) if raw else default
+    return max(minimum, min(value, maximum))
+
+
+def _csv_arg(name: str) -> list[str]:
+    return [x.strip() for x in (request.args.get(name) or "").split(",") if x.strip()]
+
+
 # ----------------------------
 # CSV Resolution (local first, fallback to GitHub)
 # ----------------------------
@@ -208,76 +294,227 @@ def get_matches_csv_path():
     return None
 
 
-def ensure_players_csv():
-    path = get_players_csv_path()
+def _ensure_csv(get_path, error_message: str):
+    path = get_path()
     if path and os.path.exists(path):
         return path, None, None
 
-    # Fallback: aus GitHub holen
-    candidates = ["merged.csv_players.csv", "vrfrag_players.csv"]
-    for name in candidates:
-        repo_path = f"files/{name}"
-        local_path = os.path.join(FILES_FOLDER, name)
-        ok, _err = download_file_from_github(repo_path, local_path)
-        if ok and os.path.exists(local_path):
-            return local_path, None, None
+    # Fallback: fehlende Dateien aus GitHub nachladen (Delta-Sync)
+    sync_from_github()
+    path = get_path()
+    if path and os.path.exists(path):
+        return path, None, None
 
-    return None, jsonify({
-        "success": False,
-        "error": "Spieler-Daten nicht gefunden (lokal & GitHub). Bitte zuerst Statistiken generieren."
-    }), 400
+    return None, jsonify({"success": False, "error": error_message}), 400
+
+
+def ensure_players_csv():
+    return _ensure_csv(
+        get_players_csv_path,
+        "Spieler-Daten nicht gefunden (lokal & GitHub). Bitte zuerst Statistiken generieren.",
+    )
 
 
 def ensure_matches_csv():
-    path = get_matches_csv_path()
-    if path and os.path.exists(path):
-        return path, None, None
+    return _ensure_csv(
+        get_matches_csv_path,
+        "Match-Datei nicht gefunden (lokal & GitHub). Bitte zuerst Statistiken generieren.",
+    )
 
-    # Fallback: aus GitHub holen
-    candidates = ["merged.csv_matches.csv", "vrfrag_matches.csv"]
-    for name in candidates:
-        repo_path = f"files/{name}"
-        local_path = os.path.join(FILES_FOLDER, name)
-        ok, _err = download_file_from_github(repo_path, local_path)
-        if ok and os.path.exists(local_path):
-            return local_path, None, None
 
-    return None, jsonify({
-        "success": False,
-        "error": "Match-Datei nicht gefunden (lokal & GitHub). Bitte zuerst Statistiken generieren."
-    }), 400
+# ----------------------------
+# Datenstand (unveränderliche Versionen, siehe snapshot.py)
+# ----------------------------
+PLAYERS_CSV_NAME = "vrfrag_players.csv"
+MATCHES_CSV_NAME = "vrfrag_matches.csv"
+
+_VERSION_LOCK = threading.Lock()
+
+
+def _import_flat_csvs(players_path: str, matches_path: str) -> str:
+    """
+    Flache CSVs aus files/ als ersten Datenstand veröffentlichen (Bootstrap, siehe
+    current_dataset_version).
+    """
+    def _facts(folder):
+        p = schema.read_table(os.path.join(folder, PLAYERS_CSV_NAME), schema.PLAYERS_SCHEMA)
+        if "Player" not in p.columns:
+            raise ValueError("Spalte 'Player' fehlt in Players-CSV.")
+        m = schema.read_table(os.path.join(folder, MATCHES_CSV_NAME), schema.MATCHES_SCHEMA)
+        return build_fact_table(p, m)
+
+    return snapshot.publish_version(
+        {PLAYERS_CSV_NAME: players_path, MATCHES_CSV_NAME: matches_path},
+        _facts,
+        build_partials=build_event_partials,
+    )
+
+
+def current_dataset_version():
+    """
+    Version des Datenstands für diesen Request -> (version, err_resp, code).
+
+    Die Version wird beim ersten Aufruf im Request in flask.g festgehalten; alle weiteren
+    Zugriffe im selben Request (Players, Matches, Fakten, Caches) sehen denselben Stand,
+    auch wenn parallel ein neuer veröffentlicht wird. Maßgeblich ist nur der Zeiger
+    (snapshot.current); neue Stände veröffentlicht ausschließlich save_combined_data.
+    Nur wenn es noch gar keinen Datenstand gibt, werden die flachen CSVs einmalig
+    übernommen (ggf. vorher aus GitHub geladen), prozessübergreifend nur von einem Worker.
+    """
+    if has_request_context() and g.get("dataset_version"):
+        return g.dataset_version, None, None
+
+    pointer = snapshot.current()
+    if pointer is None:
+        with _VERSION_LOCK, snapshot.exclusive(name=snapshot.BOOTSTRAP_LOCK_FILE):
+            pointer = snapshot.current()
+            if pointer is None:
+                players_path, err, code = ensure_players_csv()
+                if err:
+                    return None, err, code
+                matches_path, err, code = ensure_matches_csv()
+                if err:
+                    return None, err, code
+                try:
+                    pointer = {"version": _import_flat_csvs(players_path, matches_path)}
+                except (OSError, ValueError) as e:
+                    return None, jsonify({"success": False, "error": str(e)}), 500
+
+    if has_request_context():
+        g.dataset_version = pointer["version"]
+    return pointer["version"], None, None
+
+
+def dataset_csv_path(filename: str):
+    """
+    Pfad einer CSV im gepinnten Datenstand -> (path, err_resp, code).
+    """
+    version, err, code = current_dataset_version()
+    if err:
+        return None, err, code
+    return snapshot.version_file(version, filename), None, None
+
+
+# ----------------------------
+# Response-Cache für lesende Endpoints
+# ----------------------------
+# Antworten ab dieser Größe werden zusätzlich gzip-komprimiert abgelegt
+GZIP_MIN_BYTES = 1024
+
+_RESPONSE_CACHE: dict = {"version": None, "entries": {}}
+_RESPONSE_LOCK = threading.Lock()
+
+
+def _dataset_version():
+    """
+    Datenstand der lesenden Endpoints: gepinnte Version + mtime/Größe der Alias-CSV.
+    None, solange die CSVs noch nicht lokal liegen (dann wird nicht gecacht, der
+    Endpoint lädt sie erst aus GitHub).
+    """
+    if snapshot.current() is None and (not get_players_csv_path() or not get_matches_csv_path()):
+        return None
+    version, err, _code = current_dataset_version()
+    if err:
+        return None
+    try:
+        st = os.stat(ALIASES_CSV)
+        aliases = f"{os.path.basename(ALIASES_CSV)}:{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        aliases = f"{os.path.basename(ALIASES_CSV)}:-"
+    return f"{version}|{aliases}"
+
+
+def invalidate_response_cache():
+    """
+    Nach dem Neugenerieren der Statistiken bzw. Ändern der Aliase aufrufen.
+    """
+    with _RESPONSE_LOCK:
+        _RESPONSE_CACHE["version"] = None
+        _RESPONSE_CACHE["entries"] = {}
+
+
+def _payload_response(entry: dict):
+    """
+    Antwort aus einem Cache-Eintrag: 304 bei passendem If-None-Match,
+    sonst die abgelegten Bytes (gzip, wenn der Client es akzeptiert).
+    """
+    use_gzip = entry["gzip"] is not None and "gzip" in request.accept_encodings
+    etag = entry["etag"] + ("-gz" if use_gzip else "")
+
+    if request.if_none_match.contains(entry["etag"]) or request.if_none_match.contains(entry["etag"] + "-gz"):
+        resp = Response(status=304)
+    elif use_gzip:
+        resp = Response(entry["gzip"], mimetype="application/json")
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = Response(entry["body"], mimetype="application/json")
+
+    resp.set_etag(etag)
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def cached_response(view):
+    """
+    Decorator für lesende JSON-Endpoints: die serialisierte Antwort wird pro
+    (Route, Query, Datenstand) einmal erzeugt und als Bytes (plus gzip-Variante)
+    abgelegt. Starke ETags aus dem Inhalt, If-None-Match -> 304.
+    Nur 200-Antworten werden gecacht; ändert sich der Datenstand, verfällt der ganze Cache.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = _dataset_version()
+        if version is None:
+            return view(*args, **kwargs)
+
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        with _RESPONSE_LOCK:
+            if _RESPONSE_CACHE["version"] != version:
+                _RESPONSE_CACHE["version"] = version
+                _RESPONSE_CACHE["entries"] = {}
+            entry = _RESPONSE_CACHE["entries"].get(key)
+        metrics.cache_access("response", entry is not None)
+
+        if entry is None:
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code != 200 or resp.mimetype != "application/json":
+                return resp
+
+            body = resp.get_data()
+            packed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+            entry = {
+                "body": body,
+                "gzip": packed if packed is not None and len(packed) < len(body) else None,
+                "etag": hashlib.sha1(body).hexdigest(),
+            }
+            with _RESPONSE_LOCK:
+                # nur ablegen, wenn sich der Datenstand inzwischen nicht geändert hat
+                if _RESPONSE_CACHE["version"] == version:
+                    _RESPONSE_CACHE["entries"][key] = entry
+
+        return _payload_response(entry)
+
+    return wrapper
 
 
 # ----------------------------
 # Team-Generator: Fuzzy-Mapping
 # ----------------------------
 def get_player_universe():
-    players_file, err_resp, code = ensure_players_csv()
+    directory, err_resp, code = get_player_directory()
     if err_resp:
         return None, err_resp, code
+    return directory["names"], None, None
 
-    df = _read_csv_cached(players_file)
-    if "Player" not in df.columns:
-        return None, jsonify({"success": False, "error": "Spalte 'Player' fehlt in der CSV."}), 500
-
-    all_players = (
-        df["Player"]
-        .dropna()
-        .astype(str)
-        .str.strip()
-        .unique()
-        .tolist()
-    )
-    all_players = sorted([p for p in all_players if p])
-    return all_players, None, None
 
-
-def resolve_player_name(input_name: str, all_players: list[str], cutoff: float = 0.78):
+def resolve_player_name(input_name: str, all_players: list[str], cutoff: float = 0.78, lower_map: dict | None = None):
     raw = (input_name or "").strip()
     if not raw:
         return raw, 0.0
 
-    lower_map = {p.lower(): p for p in all_players}
+    if lower_map is None:
+        lower_map = {p.lower(): p for p in all_players}
     if raw.lower() in lower_map:
         return lower_map[raw.lower()], 1.0
 
@@ -290,34 +527,183 @@ def resolve_player_name(input_name: str, all_players: list[str], cutoff: float =
     return raw, 0.0
 
 
+def resolve_player_names(names, all_players: list[str], cutoff: float = 0.78):
+    """
+    Löst eine Liste eingegebener Namen gegen das Spieler-Universum auf.
+    Gibt (resolved, unresolved) zurück; unresolved enthält unsichere Treffer.
+    """
+    resolved = []
+    unresolved = []
+    lower_map = {p.lower(): p for p in all_players}
+    for name in names:
+        best, conf = resolve_player_name(name, all_players, cutoff=cutoff, lower_map=lower_map)
+        resolved.append(best)
+        if conf < cutoff:
+            unresolved.append({
+                "input": name,
+                "best_guess": best,
+                "confidence": round(conf, 3),
+            })
+    return resolved, unresolved
+
+
 # ----------------------------
 # Filename Generation
 # ----------------------------
-def generate_filename(custom_name=None):
+def save_new_event(content: str, custom_name=None):
     """
-    Generiert einen Dateinamen im Format YYYY_MM_DD_NN.txt
+    Speichert ein Event synchron in ./events und gibt (filename, local_path) zurück.
+
+    Ohne custom_name heißt die Datei YYYY_MM_DD_NN.txt; die Nummer wird per open(..., "x")
+    reserviert, damit parallele Speicherungen nie denselben Namen bekommen und sich
+    gegenseitig überschreiben.
     """
     if custom_name:
-        return custom_name if custom_name.endswith(".txt") else custom_name + ".txt"
+        filename = custom_name if custom_name.endswith(".txt") else custom_name + ".txt"
+        return filename, save_event_locally(filename, content)
 
     today = datetime.now().strftime("%Y_%m_%d")
-    next_num = 1
 
-    # Optional: schaut in GitHub wie viele Events es heute schon gibt
-    try:
-        token = os.environ.get("GITHUB_TOKEN")
-        if token:
-            headers = _github_headers(token)
-            url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/events"
-            response = requests.get(url, headers=headers, timeout=20)
-            if response.status_code == 200 and isinstance(response.json(), list):
-                files = response.json()
-                today_files = [f for f in files if f.get("name", "").startswith(today)]
-                next_num = len(today_files) + 1
-    except Exception:
-        next_num = 1
+    # Events von heute: GitHub-Listing (gecacht) + lokale, evtl. noch nicht gepushte Dateien
+    items = list_github_dir("events", EVENTS_FOLDER)[0] if os.environ.get("GITHUB_TOKEN") else []
+    names = {i["name"] for i in items or []} | {i["name"] for i in _local_listing(EVENTS_FOLDER)}
+    next_num = len([n for n in names if n.startswith(today)]) + 1
+
+    while True:
+        filename = f"{today}_{next_num:02d}.txt"
+        next_num += 1
+        if filename in names:
+            continue
+        local_path = os.path.join(EVENTS_FOLDER, filename)
+        try:
+            with open(local_path, "x", encoding="utf-8") as f:
+                f.write(content)
+        except FileExistsError:
+            continue
+        return filename, local_path
+
+
+# ----------------------------
+# Metrics
+# ----------------------------
+# WSGI-Environ-Schlüssel der Warm-up-Requests (von außen nicht setzbar); diese Requests
+# zählen nicht in die Routen-Metriken und werden nicht profiliert
+WARMUP_ENVIRON_KEY = "vrfrag.warmup"
+
+
+def _is_warm_up_request() -> bool:
+    return bool(request.environ.get(WARMUP_ENVIRON_KEY))
 
-    return f"{today}_{next_num:02d}.txt"
+
+@app.before_request
+def _metrics_start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _metrics_observe_request(response):
+    started = getattr(g, "request_started", None)
+    if started is not None and not _is_warm_up_request():
+        # Route-Template statt konkretem Pfad (z.B. /api/jobs/<job_id>)
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        metrics.observe(
+            "vrfrag_http_request_duration_seconds", time.perf_counter() - started,
+            "Dauer der HTTP-Requests pro Route",
+            route=route, method=request.method, status=response.status_code,
+        )
+    return response
+
+
+@app.get("/metrics")
+def api_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# ----------------------------
+# Profiling (opt-in: Header X-Profile: <VRFRAG_PROFILE_TOKEN> oder Sampling)
+# ----------------------------
+@app.before_request
+def _profiling_start():
+    g.profiler = None if _is_warm_up_request() else profiling.start(request.headers)
+
+
+@app.after_request
+def _profiling_finish(response):
+    profiler = getattr(g, "profiler", None)
+    if profiler is None:
+        return response
+    g.profiler = None
+    started = getattr(g, "request_started", None)
+    profile_id = profiling.finish(profiler, {
+        "route": request.url_rule.rule if request.url_rule is not None else "<unmatched>",
+        "method": request.method,
+        "path": request.path,
+        "params": request.args.to_dict(flat=False),
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - started) * 1000.0, 1) if started else None,
+        "dataset_version": _dataset_version(),
+    })
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+@app.teardown_request
+def _profiling_abort(_exc):
+    # after_request läuft bei unbehandelten Exceptions nicht -> Profiler hier freigeben
+    profiler = getattr(g, "profiler", None)
+    if profiler is not None:
+        g.profiler = None
+        profiling.abort(profiler)
+
+
+def _require_profile_admin():
+    if not profiling.ADMIN_TOKEN:
+        return jsonify({"success": False, "error": "Profiling-Admin nicht konfiguriert (VRFRAG_PROFILE_TOKEN)"}), 404
+    if not profiling.is_admin(request.headers):
+        return jsonify({"success": False, "error": "Nicht berechtigt"}), 403
+    return None
+
+
+@app.get("/api/admin/profiles")
+def api_profiles_list():
+    denied = _require_profile_admin()
+    if denied:
+        return denied
+    return jsonify({"success": True, "profiles": profiling.list_profiles()})
+
+
+MAX_PROFILE_TOP = 500
+
+
+@app.get("/api/admin/profiles/<profile_id>")
+def api_profile_top(profile_id):
+    """
+    Top-N Hotspots eines Profils. Query: top (Default 25), sort (cumulative|tottime|ncalls)
+    """
+    denied = _require_profile_admin()
+    if denied:
+        return denied
+    try:
+        top = _int_arg("top", 25, MAX_PROFILE_TOP)
+    except ValueError:
+        return jsonify({"success": False, "error": "top muss eine Zahl sein"}), 400
+    rows = profiling.top_stats(profile_id, top, request.args.get("sort") or "cumulative")
+    if rows is None:
+        return jsonify({"success": False, "error": "Profil nicht gefunden"}), 404
+    return jsonify({"success": True, "id": profile_id, "top": rows})
+
+
+@app.get("/api/admin/profiles/<profile_id>/raw")
+def api_profile_raw(profile_id):
+    # pstats-Dump, z.B. für snakeviz / flameprof / gprof2dot
+    denied = _require_profile_admin()
+    if denied:
+        return denied
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        return jsonify({"success": False, "error": "Profil nicht gefunden"}), 404
+    return send_from_directory(profiling.PROFILE_DIR, os.path.basename(path), as_attachment=True)
 
 
 # ----------------------------
@@ -394,6 +780,7 @@ def api_aliases_upsert():
     if not username or not real_name:
         return jsonify({"success": False, "error": "username und real_name erforderlich"}), 400
     upsert_alias(username, real_name, source="manual", confidence=0.95)
+    invalidate_response_cache()
     return jsonify({"success": True})
 
 
@@ -420,14 +807,110 @@ def api_get_players():
         return jsonify({"success": False, "error": f"Server Fehler: {str(e)}"}), 500
 
 
+# ----------------------------
+# Background jobs: save event / rebuild statistics
+# ----------------------------
+# Lokal gespeicherte Events, die mit dem nächsten Neuaufbau nach GitHub gehen
+_PENDING_EVENTS: set = set()
+_PENDING_EVENTS_LOCK = threading.Lock()
+
+
+def _rebuild_statistics_job(report):
+    """
+    Job: Statistiken neu generieren (arbeitet auf ./events) und zusammen mit den
+    neu gespeicherten Events in einem Commit nach GitHub pushen.
+    """
+    with _PENDING_EVENTS_LOCK:
+        events = sorted(_PENDING_EVENTS)
+        _PENDING_EVENTS.clear()
+    event_files = {f"events/{name}": os.path.join(EVENTS_FOLDER, name) for name in events}
+
+    report("Statistiken generieren")
+    print("Starting statistics update...")
+    result = generate_statistics()
+    invalidate_response_cache()
+
+    if not (isinstance(result, dict) and result.get("success")):
+        # Events trotzdem sichern
+        pushed = sync_files_to_github(event_files, f"Add event files: {', '.join(events)}") if events else {}
+        if events and not pushed.get("success"):
+            with _PENDING_EVENTS_LOCK:
+                _PENDING_EVENTS.update(events)
+        return {
+            "success": False,
+            "error": (result or {}).get("error", "Unbekannter Fehler"),
+            "pushed_csvs": pushed,
+        }
+
+    report("Nach GitHub pushen")
+    pushed = push_statistics_csvs_to_github(result, extra_files=event_files)
+    if not pushed.get("success"):
+        # beim nächsten Lauf erneut versuchen
+        with _PENDING_EVENTS_LOCK:
+            _PENDING_EVENTS.update(events)
+    return {
+        "success": True,
+        # Statistiken sind lokal aktualisiert; ob GitHub mitgezogen hat, steht separat hier
+        "pushed": bool(pushed.get("success")),
+        "push_error": None if pushed.get("success") else pushed.get("error", "Unbekannter Fehler"),
+        "message": result.get("message"),
+        "player_count": result.get("player_count"),
+        "match_count": result.get("match_count"),
+        "unique_players": result.get("unique_players"),
+        "players_file": os.path.basename(result.get("players_file", "")),
+        "matches_file": os.path.basename(result.get("matches_file", "")),
+        "pushed_csvs": pushed,
+    }
+
+
+def submit_rebuild_statistics():
+    """
+    Reiht einen Statistik-Neuaufbau ein; gleichzeitige Anfragen werden zu einem Job zusammengelegt.
+    """
+    return JOBS.submit("rebuild_statistics", _rebuild_statistics_job, coalesce_key=REBUILD_JOB_KEY)
+
+
+def _job_accepted(job, **extra):
+    if job is None:
+        return jsonify({"success": False, "error": "Zu viele laufende Jobs, bitte später erneut versuchen."}), 503
+    return jsonify({
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        **extra,
+    }), 202
+
+
+@app.get("/api/jobs/<job_id>")
+def api_job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job nicht gefunden"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+MAX_JOBS_LIST = 200
+
+
+@app.get("/api/jobs")
+def api_jobs_list():
+    try:
+        limit = _int_arg("limit", 20, MAX_JOBS_LIST)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit muss eine Zahl sein"}), 400
+    return jsonify({"success": True, "jobs": JOBS.list(limit)})
+
+
 # ----------------------------
 # Save event: GitHub + local + generate stats + push CSVs to GitHub
 # ----------------------------
 @app.route("/api/save-to-github", methods=["POST"])
 def api_save_to_github():
     """
-    Speichert Event-Datei in GitHub UND lokal in ./events,
-    führt generate_statistics lokal aus und pushed anschließend die CSVs nach GitHub (/files).
+    Speichert die Event-Datei sofort lokal in ./events; generate_statistics und der Push
+    von Event + CSVs in einem Commit nach GitHub laufen als Hintergrund-Job:
+    Antwort 202 mit job_id (Neuaufbau), Status über /api/jobs/<job_id>.
     """
     try:
         data = request.get_json()
@@ -447,42 +930,22 @@ def api_save_to_github():
                 content_lines.append(f"{nick}={real}")
         content = "\n".join(content_lines) + "\n"
 
-        filename = generate_filename(custom_filename)
-
-        # 1) Event nach GitHub pushen
-        event_repo_path = f"events/{filename}"
-        result = save_file_to_github(
-            repo_path=event_repo_path,
-            content=content,
-            commit_message=f"Add event file: {filename}",
-        )
-        if not result.get("success"):
-            return jsonify(result), 500
-
-        # 2) Lokal speichern (damit generate_statistics sofort was sieht)
-        try:
-            local_path = save_event_locally(filename, content)
-            result["local_saved"] = True
-            result["local_path"] = local_path
-        except Exception as e:
-            result["local_saved"] = False
-            result["local_error"] = str(e)
-
-        # 3) Statistiken neu generieren (arbeitet auf ./events) + CSVs nach GitHub pushen
-        try:
-            stats = generate_statistics()
-            result["statistics_result"] = stats
-            result["statistics_updated"] = bool(stats.get("success", True))
-
-            if isinstance(stats, dict) and stats.get("success"):
-                pushed = push_statistics_csvs_to_github(stats)
-                result["pushed_csvs"] = pushed
+        filename, local_path = save_new_event(content, custom_filename)
+        note_github_dir_write("events", filename, os.path.getsize(local_path))
+        with _PENDING_EVENTS_LOCK:
+            _PENDING_EVENTS.add(filename)
 
-        except Exception as e:
-            result["statistics_updated"] = False
-            result["statistics_error"] = str(e)
-
-        return jsonify(result)
+        # Event ist gespeichert; ist die Warteschlange voll, nimmt es der nächste Neuaufbau mit
+        job = submit_rebuild_statistics()
+        if job is None:
+            return jsonify({
+                "success": True,
+                "filename": filename,
+                "local_saved": True,
+                "job_id": None,
+                "message": "Event gespeichert; die Statistiken werden beim nächsten Neuaufbau aktualisiert.",
+            })
+        return _job_accepted(job, filename=filename, local_saved=True)
 
     except Exception as e:
         return jsonify({"success": False, "error": f"Fehler: {str(e)}"}), 500
@@ -494,35 +957,26 @@ def api_save_to_github():
 @app.route("/api/list-events", methods=["GET"])
 def api_list_events():
     try:
-        token = os.environ.get("GITHUB_TOKEN")
-        headers = {"Accept": "application/vnd.github.v3+json"}
-        if token:
-            headers = _github_headers(token)
-
-        url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/events"
-        response = requests.get(url, headers=headers, timeout=20)
-
-        if response.status_code == 200:
-            files = response.json()
-            event_files = []
-            for file in files:
-                if file.get("name", "").endswith(".txt"):
-                    event_files.append({
-                        "filename": file.get("name"),
-                        "download_url": file.get("download_url"),
-                        "html_url": file.get("html_url"),
-                        "size": file.get("size", 0),
-                    })
-
-            return jsonify({
-                "success": True,
-                "events": sorted(event_files, key=lambda x: x["filename"], reverse=True),
-            })
+        items, source, error = list_github_dir("events", EVENTS_FOLDER)
+        event_files = [
+            {
+                "filename": i["name"],
+                "download_url": i["download_url"],
+                "html_url": i["html_url"],
+                "size": i["size"],
+            }
+            for i in items
+            if (i["name"] or "").endswith(".txt")
+        ]
 
-        return jsonify({
-            "success": False,
-            "error": f"GitHub Fehler: {response.status_code} - {response.text}",
-        }), 500
+        out = {
+            "success": True,
+            "source": source,
+            "events": sorted(event_files, key=lambda x: x["filename"], reverse=True),
+        }
+        if error:
+            out["warning"] = error
+        return jsonify(out)
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -533,32 +987,12 @@ def api_list_events():
 # ----------------------------
 @app.route("/api/update-statistics", methods=["POST"])
 def api_update_statistics():
+    """
+    Stößt den Neuaufbau als Hintergrund-Job an (202 + job_id). Läuft bereits einer bzw.
+    wartet einer, wird kein zusätzlicher gestartet.
+    """
     try:
-        print("Starting statistics update...")
-        result = generate_statistics()
-
-        pushed = {}
-        if isinstance(result, dict) and result.get("success"):
-            pushed = push_statistics_csvs_to_github(result)
-
-        if result.get("success"):
-            return jsonify({
-                "success": True,
-                "message": result.get("message"),
-                "player_count": result.get("player_count"),
-                "match_count": result.get("match_count"),
-                "unique_players": result.get("unique_players"),
-                "players_file": os.path.basename(result.get("players_file", "")),
-                "matches_file": os.path.basename(result.get("matches_file", "")),
-                "pushed_csvs": pushed,
-            })
-
-        return jsonify({
-            "success": False,
-            "error": result.get("error", "Unbekannter Fehler"),
-            "pushed_csvs": pushed,
-        }), 500
-
+        return _job_accepted(submit_rebuild_statistics())
     except Exception as e:
         return jsonify({
             "success": False,
@@ -617,30 +1051,23 @@ def api_generate_teams():
         if err_resp:
             return err_resp, code
 
-        resolved_players = []
-        unresolved = []
-
-        for name in selected_players:
-            best, conf = resolve_player_name(name, all_players, cutoff=0.78)
-            resolved_players.append(best)
-            if conf < 0.78:
-                unresolved.append({
-                    "input": name,
-                    "best_guess": best,
-                    "confidence": round(conf, 3),
-                })
-
-        selected_players = resolved_players
+        selected_players, unresolved = resolve_player_names(selected_players, all_players, cutoff=0.78)
 
         # Load player data
-        players_file, err_resp, code = ensure_players_csv()
+        players_df, err_resp, code = _load_team_frame()
         if err_resp:
             return err_resp, code
 
-        players_df = _read_csv_cached(players_file)
+        # Optional: Paar-Synergien in die Balance einbeziehen (Swap-Local-Search)
+        synergy = None
+        if data.get("use_synergy"):
+            synergy = get_synergy_index(players_df, _dataset_version()).synergy_weights(selected_players)
 
-        from vrfrag_teams import generate_fair_teams
-        result = generate_fair_teams(selected_players, players_df, selected_map)
+        result = generate_fair_teams(
+            selected_players, players_df, selected_map,
+            synergy=synergy, solver=data.get("solver") or "random",
+            rating_source=team_rating_source(),
+        )
 
         if isinstance(result, dict) and "error" in result:
             return jsonify({"success": False, "error": result["error"]}), 400
@@ -656,38 +1083,336 @@ def api_generate_teams():
         return jsonify({"success": False, "error": f"Team-Generator Fehler: {str(e)}"}), 500
 
 
+MAX_BATCH_LOBBIES = 64
+
+
+def generate_teams_batch(lobbies, processes=None):
+    """
+    Team-Generierung für viele Lobbys: alle Namen werden gegen einen einzigen
+    Snapshot des Spieler-Universums aufgelöst, gelöst wird parallel
+    (vrfrag_teams.generate_fair_teams_batch).
+
+    Gibt (results, err_resp, code) zurück; results in Lobby-Reihenfolge.
+    """
+    all_players, err_resp, code = get_player_universe()
+    if err_resp:
+        return None, err_resp, code
+
+    players_df, err_resp, code = _load_team_frame()
+    if err_resp:
+        return None, err_resp, code
+
+    lower_map = {p.lower(): p for p in all_players}
+    synergy_index = None
+    prepared = []
+    unresolved_by_lobby = []
+    for lobby in lobbies:
+        resolved = []
+        unresolved = []
+        for name in lobby.get("players") or []:
+            best, conf = resolve_player_name(name, all_players, cutoff=0.78, lower_map=lower_map)
+            resolved.append(best)
+            if conf < 0.78:
+                unresolved.append({"input": name, "best_guess": best, "confidence": round(conf, 3)})
+
+        item = {"players": resolved, "map": lobby.get("map") or None, "solver": lobby.get("solver") or "random"}
+        if lobby.get("use_synergy"):
+            if synergy_index is None:
+                synergy_index = get_synergy_index(players_df, _dataset_version())
+            item["synergy"] = synergy_index.synergy_weights(resolved)
+        prepared.append(item)
+        unresolved_by_lobby.append(unresolved)
+
+    teams = generate_fair_teams_batch(prepared, players_df, processes=processes, rating_source=team_rating_source())
+
+    results = []
+    for lobby, item, result, unresolved in zip(lobbies, prepared, teams, unresolved_by_lobby):
+        out = {
+            "name": lobby.get("name"),
+            "resolved_players": item["players"],
+            "unresolved": unresolved,
+        }
+        if isinstance(result, dict) and "error" in result:
+            out.update({"success": False, "error": result["error"]})
+        else:
+            out.update({"success": True, "teams": result})
+        results.append(out)
+    return results, None, None
+
+
+@app.route("/api/generate-teams/batch", methods=["POST"])
+def api_generate_teams_batch():
+    """
+    Erwartet {"lobbies": [{"name": optional, "players": [...], "map": optional, "use_synergy": optional}, ...]}
+    """
+    try:
+        data = request.get_json()
+        lobbies = (data or {}).get("lobbies")
+        if not isinstance(lobbies, list) or not lobbies:
+            return jsonify({"success": False, "error": "Keine Lobbys"}), 400
+        if len(lobbies) > MAX_BATCH_LOBBIES:
+            return jsonify({"success": False, "error": f"Maximal {MAX_BATCH_LOBBIES} Lobbys pro Anfrage"}), 400
+
+        try:
+            processes = _int_value(data.get("processes"), BATCH_POOL_WORKERS, BATCH_POOL_WORKERS)
+        except ValueError:
+            return jsonify({"success": False, "error": "processes muss eine Zahl sein"}), 400
+        results, err_resp, code = generate_teams_batch(lobbies, processes=processes)
+        if err_resp:
+            return err_resp, code
+
+        return jsonify({"success": True, "count": len(results), "results": results})
+
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Team-Generator Fehler: {str(e)}"}), 500
+
+
+MAX_SIMULATIONS = 200000
+
+
+@app.route("/api/simulate-teams", methods=["POST"])
+def api_simulate_teams():
+    """
+    Monte-Carlo-Simulation für zwei vorgegebene Teams:
+    Sieg-/Unentschieden-Wahrscheinlichkeiten und Quantile der Score-Differenz.
+    """
+    try:
+        data = request.get_json()
+        if not data or "team_a" not in data or "team_b" not in data:
+            return jsonify({"success": False, "error": "team_a und team_b erforderlich"}), 400
+        try:
+            n_simulations = _int_value(data.get("n_simulations"), 20000, MAX_SIMULATIONS)
+        except ValueError:
+            return jsonify({"success": False, "error": "n_simulations muss eine Zahl sein"}), 400
+
+        all_players, err_resp, code = get_player_universe()
+        if err_resp:
+            return err_resp, code
+
+        team_a, unresolved_a = resolve_player_names(data["team_a"], all_players, cutoff=0.78)
+        team_b, unresolved_b = resolve_player_names(data["team_b"], all_players, cutoff=0.78)
+
+        players_df, err_resp, code = _load_team_frame()
+        if err_resp:
+            return err_resp, code
+
+        map_name = data.get("map") or None
+        result = simulate_match(team_a, team_b, players_df, map_name, n_simulations=n_simulations,
+                                moments=simulation_moments(map_name))
+
+        if isinstance(result, dict) and "error" in result:
+            return jsonify({"success": False, "error": result["error"]}), 400
+
+        return jsonify({
+            "success": True,
+            "simulation": result,
+            "unresolved": unresolved_a + unresolved_b,
+        })
+
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Simulation Fehler: {str(e)}"}), 500
+
+
 # ----------------------------
-# Get all players for datalist
+# Synergy / Head-to-Head API
 # ----------------------------
+def _get_synergy_index():
+    players_df, err_resp, code = _load_team_frame()
+    if err_resp:
+        return None, err_resp, code
+
+    return get_synergy_index(players_df, _dataset_version()), None, None
+
+
+SYNERGY_MAX_LIMIT = 100
+
+
+@app.get("/api/synergy/player")
+def api_synergy_player():
+    player = (request.args.get("player") or "").strip()
+    if not player:
+        return jsonify({"success": False, "error": "player fehlt"}), 400
+    try:
+        limit = _int_arg("limit", 10, SYNERGY_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit muss eine Zahl sein"}), 400
+
+    idx, err_resp, code = _get_synergy_index()
+    if err_resp:
+        return err_resp, code
+
+    out = idx.player(player, limit=limit)
+    if out is None:
+        return jsonify({"success": False, "error": "Spieler unbekannt"}), 404
+    return jsonify({"success": True, **out})
+
+
+@app.get("/api/synergy/pair")
+def api_synergy_pair():
+    a = (request.args.get("a") or "").strip()
+    b = (request.args.get("b") or "").strip()
+    if not a or not b:
+        return jsonify({"success": False, "error": "a und b erforderlich"}), 400
+
+    idx, err_resp, code = _get_synergy_index()
+    if err_resp:
+        return err_resp, code
+
+    return jsonify({"success": True, **idx.pair(a, b)})
+
+
+@app.post("/api/synergy/lobby")
+def api_synergy_lobby():
+    data = request.get_json(force=True) or {}
+    players = [str(p).strip() for p in (data.get("players") or []) if str(p).strip()]
+    if not players:
+        return jsonify({"success": False, "error": "players fehlt"}), 400
+
+    idx, err_resp, code = _get_synergy_index()
+    if err_resp:
+        return err_resp, code
+
+    return jsonify({"success": True, **idx.lobby(players)})
+
+
+# ----------------------------
+# Spieler-Verzeichnis (Datalist + Autocomplete)
+# ----------------------------
+PLAYER_SEARCH_LIMIT = 10
+PLAYER_SEARCH_MAX_LIMIT = 50
+
+_DIRECTORY_CACHE: dict = {}
+_DIRECTORY_LOCK = threading.Lock()
+
+
+def _build_player_directory(players: pd.DataFrame, aliases: pd.DataFrame) -> dict:
+    """
+    entries: [{"value", "label", "games"}] sortiert nach Label
+    names:   sortierte Spielernamen (Universum für das Fuzzy-Mapping)
+    keys:    sortierte Liste (Suchschlüssel, Eintrag-Index) für die Präfixsuche; Schlüssel
+             sind Name und Anzeigename (klein geschrieben) sowie jedes ihrer Wörter
+    """
+    names = players["Player"].dropna().astype(str).str.strip()
+    games = names[names != ""].value_counts()
+
+    real_names = {}
+    for norm, real in zip(aliases["norm_username"], aliases["real_name"]):
+        if norm and real:
+            real_names[norm] = real
+
+    entries = [
+        {"value": name, "label": real_names.get(name.lower()) or name, "games": int(n)}
+        for name, n in games.items()
+    ]
+    entries.sort(key=lambda e: (e["label"].lower(), e["value"].lower()))
+
+    keys = set()
+    for i, e in enumerate(entries):
+        for text in (e["value"], e["label"]):
+            norm = text.lower()
+            keys.add((norm, i))
+            keys.update((word, i) for word in norm.split() if word != norm)
+    return {"entries": entries, "keys": sorted(keys), "names": sorted(e["value"] for e in entries)}
+
+
+def get_player_directory():
+    """
+    Spieler-Verzeichnis des gepinnten Datenstands -> (directory, err_resp, code).
+    Einmal pro Datenstand + Alias-Stand gebaut (Schlüssel = _dataset_version()).
+    """
+    players_file, err_resp, code = dataset_csv_path(PLAYERS_CSV_NAME)
+    if err_resp:
+        return None, err_resp, code
+
+    key = _dataset_version()
+    hit = _DIRECTORY_CACHE.get("directory")
+    metrics.cache_access("player_directory", bool(hit) and hit["key"] == key)
+    if hit and hit["key"] == key:
+        return hit["directory"], None, None
+
+    with _DIRECTORY_LOCK:
+        hit = _DIRECTORY_CACHE.get("directory")
+        if hit and hit["key"] == key:
+            return hit["directory"], None, None
+
+        df = _read_csv_cached(players_file)
+        if "Player" not in df.columns:
+            return None, jsonify({"success": False, "error": "Spalte 'Player' fehlt in der CSV."}), 500
+
+        directory = _build_player_directory(df, load_aliases())
+        _DIRECTORY_CACHE["directory"] = {"key": key, "directory": directory}
+    return directory, None, None
+
+
+def search_player_directory(directory: dict, query: str, limit: int) -> list[dict]:
+    """
+    Präfixsuche (Groß-/Kleinschreibung egal) über Name, Anzeigename und deren Wörter.
+    Reihenfolge: exakter Treffer, Präfix des ganzen Namens, Präfix eines Wortes;
+    innerhalb gleicher Güte die meisten Spiele zuerst. Leere Suche -> meistgespielte Spieler.
+    """
+    entries = directory["entries"]
+    q = (query or "").strip().lower()
+    if not q:
+        ranked = sorted(range(len(entries)), key=lambda i: (-entries[i]["games"], entries[i]["label"].lower()))
+        return [entries[i] for i in ranked[:limit]]
+
+    keys = directory["keys"]
+    best = {}
+    pos = bisect.bisect_left(keys, (q, -1))
+    while pos < len(keys) and keys[pos][0].startswith(q):
+        i = keys[pos][1]
+        e = entries[i]
+        if q in (e["value"].lower(), e["label"].lower()):
+            rank = 0
+        elif e["value"].lower().startswith(q) or e["label"].lower().startswith(q):
+            rank = 1
+        else:
+            rank = 2
+        best[i] = min(rank, best.get(i, rank))
+        pos += 1
+
+    ranked = sorted(best, key=lambda i: (best[i], -entries[i]["games"], entries[i]["label"].lower()))
+    return [entries[i] for i in ranked[:limit]]
+
+
 @app.get("/api/get-all-players")
+@cached_response
 def get_all_players():
-    path, err_resp, code = ensure_players_csv()
+    directory, err_resp, code = get_player_directory()
     if err_resp:
         return err_resp, code
 
-    df = _read_csv_cached(path).copy()
-    if "Player" not in df.columns:
-        return jsonify({"success": False, "error": "Spalte 'Player' fehlt in der CSV."}), 500
+    players = [{"value": e["value"], "label": e["label"]} for e in directory["entries"]]
+    return jsonify({"players": players})
 
-    aliases = load_aliases()[["norm_username", "real_name"]]
-    df["norm_username"] = df["Player"].astype(str).str.strip().str.lower()
-    out = df.merge(aliases, how="left", on="norm_username")
-    out["display_name"] = out["real_name"].where(out["real_name"].astype(bool), out["Player"])
 
-    rows = out[["Player", "display_name"]].dropna().drop_duplicates()
-    players = [{"value": r["Player"], "label": r["display_name"]} for _, r in rows.iterrows()]
-    players = sorted(players, key=lambda x: (x["label"] or x["value"]).lower())
+@app.get("/api/players/search")
+def api_players_search():
+    """
+    Autocomplete: ?q=<Präfix>&limit=<N> -> die besten N Spieler (value, label, games).
+    """
+    directory, err_resp, code = get_player_directory()
+    if err_resp:
+        return err_resp, code
 
-    return jsonify({"players": players})
+    try:
+        limit = int(request.args.get("limit", PLAYER_SEARCH_LIMIT))
+    except ValueError:
+        limit = PLAYER_SEARCH_LIMIT
+    limit = max(1, min(limit, PLAYER_SEARCH_MAX_LIMIT))
+
+    query = request.args.get("q", "")
+    return jsonify({"success": True, "query": query, "players": search_player_directory(directory, query, limit)})
 
 
 # ----------------------------
 # Maps
 # ----------------------------
 @app.route("/api/get-available-maps", methods=["GET"])
+@cached_response
 def api_get_available_maps():
     try:
-        matches_file, err_resp, code = ensure_matches_csv()
+        matches_file, err_resp, code = dataset_csv_path(MATCHES_CSV_NAME)
         if err_resp:
             return err_resp, code
 
@@ -704,148 +1429,350 @@ def api_get_available_maps():
 # ----------------------------
 # Dashboard helpers (PBIX-like)
 # ----------------------------
-GERMAN_MONTHS = {
-    "januar": "01", "februar": "02", "märz": "03", "maerz": "03",
-    "april": "04", "mai": "05", "juni": "06", "juli": "07",
-    "august": "08", "september": "09", "oktober": "10",
-    "november": "11", "dezember": "12",
-}
+_MERGED_CACHE: dict = {}
+_MERGED_LOCK = threading.Lock()
+
 
-def _parse_event_date(s: str):
+def _record_dataset_gauges(merged: pd.DataFrame, matches: pd.DataFrame):
+    help_text = "Größe des geladenen Datenstands"
+    metrics.set_gauge("vrfrag_dataset_rows", len(merged), help_text, table="facts")
+    metrics.set_gauge("vrfrag_dataset_rows", len(matches), help_text, table="matches")
+    help_text = "Speicherbedarf des geladenen Datenstands in Bytes"
+    metrics.set_gauge("vrfrag_dataset_bytes", schema.memory_usage(merged), help_text, table="facts")
+    metrics.set_gauge("vrfrag_dataset_bytes", schema.memory_usage(matches), help_text, table="matches")
+    metrics.set_gauge("vrfrag_dataset_players", merged["Player"].nunique(), "Anzahl unterschiedlicher Spieler")
+    metrics.set_gauge("vrfrag_dataset_matches", merged["matchId"].nunique(), "Anzahl Matches in der Faktentabelle")
+    if "EventId" in merged.columns:
+        metrics.set_gauge("vrfrag_dataset_events", merged["EventId"].nunique(), "Anzahl Events")
+
+
+@metrics.timed("load_players_matches_merged")
+def _load_dataset():
     """
-    Erwartet Strings wie: 'Freitag, 18. Juli 2025'
-    Gibt datetime.date oder None zurück.
+    Geladener Datenstand der gepinnten Version (current_dataset_version) ->
+    ({"merged", "matches", "partials"}, err_resp, code). Einmal pro Version geladen und
+    von allen Requests geteilt.
     """
-    if not s:
-        return None
-    try:
-        txt = str(s).strip()
-        if "," in txt:
-            txt = txt.split(",", 1)[1].strip()  # '18. Juli 2025'
-        parts = txt.replace("  ", " ").split(" ")
-        # ['18.', 'Juli', '2025']
-        if len(parts) < 3:
-            return None
-        day = parts[0].replace(".", "").zfill(2)
-        month_name = parts[1].strip().lower()
-        month = GERMAN_MONTHS.get(month_name)
-        year = parts[2].strip()
-        if not month:
-            return None
-        return pd.to_datetime(f"{year}-{month}-{day}", errors="coerce").date()
-    except Exception:
-        return None
+    version, err, code = current_dataset_version()
+    if err:
+        return None, err, code
+
+    hit = _MERGED_CACHE.get(version)
+    if hit:
+        metrics.cache_access("facts", True)
+        return hit, None, None
+
+    metrics.cache_access("facts", False)
+    # Dashboard feuert mehrere Requests parallel -> nur einer lädt
+    with _MERGED_LOCK:
+        hit = _MERGED_CACHE.get(version)
+        if hit:
+            return hit, None, None
+
+        merged, _meta = snapshot.load_facts(version)
+        if merged is None:
+            return None, jsonify({"success": False, "error": f"Datenstand {version} nicht verfügbar."}), 503
+        m = _read_csv_cached(snapshot.version_file(version, MATCHES_CSV_NAME))
+
+        # beim Veröffentlichen berechnet; ältere Versionen ohne Partials einmalig hier
+        part = snapshot.load_partials(version)
+        if part is None:
+            with metrics.function_timer("build_partials"):
+                part, _stats = partials.build_partials(merged)
+
+        # aktuelle + (für Requests, die noch auf der alten Version stehen) vorherige Version
+        hit = {"merged": merged, "matches": m, "partials": part}
+        _MERGED_CACHE[version] = hit
+        while len(_MERGED_CACHE) > snapshot.MAX_LOADED:
+            _MERGED_CACHE.pop(next(iter(_MERGED_CACHE)))
+        _record_dataset_gauges(merged, m)
+        metrics.set_gauge("vrfrag_dataset_rows", len(part), "Größe des geladenen Datenstands", table="partials")
+
+    return hit, None, None
+
 
 def _load_players_matches_merged():
-    players_path, err, code = ensure_players_csv()
+    """
+    Liefert die denormalisierte Faktentabelle (player_stats.build_fact_table) für Dashboard
+    und Team-Generator aus dem gepinnten Datenstand (current_dataset_version). Ihre Spalten
+    sind read-only memory-mapped und liegen damit nur einmal im Page-Cache, egal wie viele
+    gunicorn-Worker laufen; Text-Spalten kommen als Categorical. Der Frame wird einmal
+    pro Version geladen und von allen Requests geteilt:
+    Aufrufer dürfen ihn NICHT verändern (vorher .copy() bzw. nur filtern).
+    """
+    hit, err, code = _load_dataset()
     if err:
         return None, None, err, code
-    matches_path, err, code = ensure_matches_csv()
+    return hit["merged"], hit["matches"], None, None
+
+
+def _load_partials():
+    """
+    Aggregat-Partials pro (Event, Spieler, Map, Team) des gepinnten Datenstands
+    (partials.py) -> (partials, err_resp, code). Leaderboards, Spieler-Ansicht, Ratings
+    und /api/query führen nur diese kleinen Summen zusammen statt alle Zeilen zu aggregieren.
+    """
+    hit, err, code = _load_dataset()
     if err:
-        return None, None, err, code
+        return None, err, code
+    return hit["partials"], None, None
 
-    p = _read_csv_cached(players_path).copy()
-    m = _read_csv_cached(matches_path).copy()
-
-    # merge: matchNr + EventDate + EventTimeRange
-    # (in deinen CSVs sind EventDate und EventTimeRange in beiden Files vorhanden)
-    for col in ["EventDate", "EventTimeRange"]:
-        if col not in p.columns:
-            p[col] = None
-        if col not in m.columns:
-            m[col] = None
-
-    merged = p.merge(
-        m[["matchNr", "EventDate", "EventTimeRange", "maptitle"]],
-        how="left",
-        on=["matchNr", "EventDate", "EventTimeRange"],
-    )
 
-    merged["EventDateParsed"] = merged["EventDate"].apply(_parse_event_date)
+def _load_team_frame():
+    """
+    Spielerzeilen für Team-Generator/Simulation/Synergien (= Faktentabelle, inkl. maptitle).
+    """
+    merged, _m, err, code = _load_players_matches_merged()
+    return merged, err, code
 
-    # robust types
-    for c in ["kills", "assists", "deaths", "score"]:
-        if c in merged.columns:
-            merged[c] = pd.to_numeric(merged[c], errors="coerce").fillna(0)
 
-    # KD pro Match (wie PowerBI Durchschnitt KD)
-    merged["kd_match"] = merged.apply(
-        lambda r: (r["kills"] / r["deaths"]) if r.get("deaths", 0) not in (0, None) else float(r.get("kills", 0)),
-        axis=1
-    )
+# Leaderboard-Metriken (= Spalten der Spieler-Aggregation)
+LEADERBOARD_METRICS = (
+    "avg_kills", "avg_score", "avg_deaths", "avg_assists", "avg_kd",
+    "total_kills", "total_score", "mvp_count", "games", "winrate",
+)
+LEADERBOARD_MAX_LIMIT = 1000
 
-    # MVP count
-    if "isMVP" in merged.columns:
-        merged["isMVP"] = merged["isMVP"].astype(str).str.lower().isin(["true", "1", "yes"])
-    else:
-        merged["isMVP"] = False
+_AGG_CACHE: dict = {}
 
-    # Winrate
-    if "playerWon" in merged.columns:
-        merged["playerWon"] = merged["playerWon"].astype(str).str.lower().isin(["true", "1", "yes"])
-    else:
-        merged["playerWon"] = False
 
-    # Player column must exist
-    if "Player" not in merged.columns:
-        return None, None, jsonify({"success": False, "error": "Spalte 'Player' fehlt in Players-CSV."}), 500
+def _partials_lookup(name: str, part: pd.DataFrame, build):
+    """
+    Pro Partials-Objekt und Map gecachte Ableitung: lookup(map_name) -> build(part, map_name).
+    """
+    hit = _AGG_CACHE.get(name)
+    if hit is None or hit["source"] is not part:
+        hit = {"source": part, "by_map": {}}
+        _AGG_CACHE[name] = hit
+
+    def lookup(map_name=None):
+        key = str(map_name or "")
+        metrics.cache_access(name, key in hit["by_map"])
+        if key not in hit["by_map"]:
+            hit["by_map"][key] = build(part, map_name)
+        return hit["by_map"][key]
 
-    return merged, m, None, None
+    return lookup
+
+
+def team_rating_source():
+    """
+    rating_source für vrfrag_teams: Spieler-Ratings pro Map aus den Partials des
+    gepinnten Datenstands (None, wenn keine Daten geladen werden können).
+    """
+    part, err, _code = _load_partials()
+    return None if err else _partials_lookup("team_ratings", part, rating_table_from_partials)
+
+
+def simulation_moments(map_name=None):
+    """
+    Spieler-Momente für simulate_match aus den Partials (Mittelwert + Varianz aus
+    Summe und Quadratsumme).
+    """
+    part, err, _code = _load_partials()
+    return None if err else _partials_lookup("sim_moments", part, moments_from_partials)(map_name)
+
+
+def _player_aggregates(part: pd.DataFrame) -> pd.DataFrame:
+    """
+    Alle Leaderboard-Metriken aus den zusammengeführten Event-Partials (ein Spieler spielt
+    ein Match höchstens einmal -> Anzahl Zeilen = Spiele).
+    Gecacht pro Partials-Objekt (das pro Datenstand genau einmal geladen wird).
+    """
+    hit = _AGG_CACHE.get("players")
+    metrics.cache_access("player_aggregates", hit is not None and hit["source"] is part)
+    if hit is not None and hit["source"] is part:
+        return hit["table"]
+
+    t = partials.totals(part, ["player"])
+    table = pd.DataFrame({
+        "avg_kills": partials.mean(t, "kills"),
+        "avg_score": partials.mean(t, "score"),
+        "avg_deaths": partials.mean(t, "deaths"),
+        "avg_assists": partials.mean(t, "assists"),
+        "avg_kd": partials.mean(t, "kd"),
+        "total_kills": t["kills"],
+        "total_score": t["score"],
+        "mvp_count": t["mvp"],
+        "games": t["n"],
+        "wins": t["wins"],
+        "winrate": partials.mean(t, "wins") * 100.0,
+    })
+
+    _AGG_CACHE["players"] = {"source": part, "table": table}
+    return table
+
+
+def _leaderboard_rows(table: pd.DataFrame, metric: str, limit: int):
+    s = table[metric].sort_values(ascending=False).head(limit)
+    return [{"player": idx, "value": float(val) if pd.notna(val) else 0.0} for idx, val in s.items()]
+
+
+def _filter_lists(part: pd.DataFrame):
+    players = sorted(set(x for x in part["player"].dropna().astype(str).str.strip().tolist() if x))
+    maps = sorted(set(x for x in part["map"].dropna().astype(str).str.strip().tolist() if x))
+    return players, maps
+
+
+# Spieler-Kennzahlen der Spieler-Ansicht -> Spalte der Faktentabelle
+SERIES_METRICS = {
+    "avg_kills": "kills",
+    "avg_deaths": "deaths",
+    "avg_assists": "assists",
+    "avg_kd": "kd_match",
+    "avg_score": "score",
+}
+
+EMPTY_PLAYER_SUMMARY = {
+    "avg_kills": 0, "avg_deaths": 0, "avg_assists": 0, "avg_kd": 0, "avg_score": 0,
+    "total_games": 0, "winrate": 0, "mvp_count": 0,
+    "sum_kills": 0, "sum_deaths": 0, "sum_assists": 0
+}
+
+
+def _summary_records(totals: pd.DataFrame) -> dict:
+    """
+    KPI-Zeilen der Spieler-Ansicht für alle Gruppen aus zusammengeführten Partials
+    (partials.totals).
+    """
+    t = pd.DataFrame({
+        "avg_kills": partials.mean(totals, "kills"),
+        "avg_deaths": partials.mean(totals, "deaths"),
+        "avg_assists": partials.mean(totals, "assists"),
+        "avg_kd": partials.mean(totals, "kd"),
+        "avg_score": partials.mean(totals, "score"),
+        "total_games": totals["n"],
+        "winrate": partials.mean(totals, "wins") * 100.0,
+        "mvp_count": totals["mvp"],
+        "sum_kills": totals["kills"],
+        "sum_deaths": totals["deaths"],
+        "sum_assists": totals["assists"],
+    })
+    out = {}
+    for key, row in zip(t.index.tolist(), t.itertuples(index=False)):
+        r = row._asdict()
+        out[key] = {
+            k: int(v) if k in ("total_games", "mvp_count", "sum_kills", "sum_deaths", "sum_assists") else float(v)
+            for k, v in r.items()
+        }
+    return out
+
+
+def _player_index(part: pd.DataFrame) -> dict:
+    """
+    Lookup-Strukturen für die Spieler-Ansicht, einmal pro Partials-Objekt gebaut:
+
+      summary[player] / summary[(player, map)]  fertige KPI-Dicts
+      series_all / series_map                   Mittelwerte pro Event-Datum, sortierter
+                                                MultiIndex (Player[, maptitle], Datum)
+
+    Damit beantworten player-summary/-series Requests per Dict- bzw. Index-Lookup
+    statt mit einem String-Vergleich über alle Zeilen. Alle Werte entstehen durch
+    Zusammenführen der Event-Partials (Datum ist pro Event konstant).
+    """
+    hit = _AGG_CACHE.get("player_index")
+    metrics.cache_access("player_index", hit is not None and hit["source"] is part)
+    if hit is not None and hit["source"] is part:
+        return hit["index"]
+
+    df = pd.DataFrame({
+        "Player": part["player"].astype(str).str.strip().where(part["player"].notna()),
+        "maptitle": part["map"].astype(str).str.strip().where(part["map"].notna()),
+        "date": part["date"].astype(object).where(part["date"].notna()),
+    })
+    df[partials.SUM_COLUMNS] = part[partials.SUM_COLUMNS]
+
+    summary = _summary_records(partials.totals(df, ["Player"]))
+    summary.update(_summary_records(partials.totals(df, ["Player", "maptitle"])))
+
+    # SERIES_METRICS verweisen auf Faktenspalten -> Partial-Spalte
+    series_cols = {name: col for name, col in partials.VALUE_COLUMNS.items() if col in SERIES_METRICS.values()}
+
+    def _series(by):
+        t = partials.totals(df, by)
+        return pd.DataFrame({col: partials.mean(t, name) for name, col in sorted(series_cols.items(), key=lambda x: x[1])})
+
+    index = {
+        "summary": summary,
+        "series_all": _series(["Player", "date"]),
+        "series_map": _series(["Player", "maptitle", "date"]),
+    }
+    _AGG_CACHE["player_index"] = {"source": part, "index": index}
+    return index
 
 
 # ----------------------------
 # Dashboard API
 # ----------------------------
 @app.get("/api/dashboard/filters")
+@cached_response
 def api_dashboard_filters():
-    merged, _m, err, code = _load_players_matches_merged()
+    part, err, code = _load_partials()
     if err:
         return err, code
 
-    players = sorted([x for x in merged["Player"].dropna().astype(str).str.strip().unique().tolist() if x])
-    maps = sorted([x for x in merged["maptitle"].dropna().astype(str).str.strip().unique().tolist() if x])
-
+    players, maps = _filter_lists(part)
     return jsonify({"success": True, "players": players, "maps": maps})
 
 
 @app.get("/api/dashboard/leaderboard")
+@cached_response
 def api_dashboard_leaderboard():
     """
-    metric:
-      - avg_kills
-      - avg_score
-      - total_kills
-      - mvp_count
+    metric: siehe LEADERBOARD_METRICS (avg_kills, avg_score, total_kills, mvp_count, ...)
     """
-    merged, _m, err, code = _load_players_matches_merged()
+    part, err, code = _load_partials()
     if err:
         return err, code
 
     metric = (request.args.get("metric") or "").strip()
-    limit = int(request.args.get("limit") or 20)
-
-    g = merged.groupby("Player", dropna=True)
-
-    if metric == "avg_kills":
-        s = g["kills"].mean()
-    elif metric == "avg_score":
-        s = g["score"].mean()
-    elif metric == "total_kills":
-        s = g["kills"].sum()
-    elif metric == "mvp_count":
-        s = g["isMVP"].sum()
-    else:
+    try:
+        limit = _int_arg("limit", 20, LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit muss eine Zahl sein"}), 400
+    if metric not in LEADERBOARD_METRICS:
         return jsonify({"success": False, "error": "Unbekannte metric"}), 400
 
-    s = s.sort_values(ascending=False).head(limit)
-
-    rows = [{"player": idx, "value": float(val) if pd.notna(val) else 0.0} for idx, val in s.items()]
+    rows = _leaderboard_rows(_player_aggregates(part), metric, limit)
     return jsonify({"success": True, "metric": metric, "rows": rows})
 
 
+@app.get("/api/dashboard/bundle")
+@cached_response
+def api_dashboard_bundle():
+    """
+    Alles für den Seitenaufbau in einem Request: Filterlisten + alle Leaderboards
+    aus demselben Datenstand und derselben Aggregation.
+
+    Query: limit (Default 20), metrics (optional, kommagetrennt; Default alle)
+    """
+    part, err, code = _load_partials()
+    if err:
+        return err, code
+
+    try:
+        limit = _int_arg("limit", 20, LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit muss eine Zahl sein"}), 400
+    metric_names = _csv_arg("metrics") or list(LEADERBOARD_METRICS)
+    unknown = [x for x in metric_names if x not in LEADERBOARD_METRICS]
+    if unknown:
+        return jsonify({"success": False, "error": f"Unbekannte metric: {', '.join(unknown)}"}), 400
+
+    table = _player_aggregates(part)
+    players, maps = _filter_lists(part)
+    return jsonify({
+        "success": True,
+        "players": players,
+        "maps": maps,
+        "leaderboards": {metric: _leaderboard_rows(table, metric, limit) for metric in metric_names},
+    })
+
+
 @app.get("/api/dashboard/player-summary")
+@cached_response
 def api_dashboard_player_summary():
-    merged, _m, err, code = _load_players_matches_merged()
+    part, err, code = _load_partials()
     if err:
         return err, code
 
@@ -854,40 +1781,14 @@ def api_dashboard_player_summary():
         return jsonify({"success": False, "error": "player fehlt"}), 400
 
     mapname = (request.args.get("map") or "").strip()
-    df = merged[merged["Player"].astype(str).str.strip() == player].copy()
-    if mapname:
-        df = df[df["maptitle"].astype(str).str.strip() == mapname]
-
-    if df.empty:
-        return jsonify({
-            "avg_kills": 0, "avg_deaths": 0, "avg_assists": 0, "avg_kd": 0, "avg_score": 0,
-            "total_games": 0, "winrate": 0, "mvp_count": 0,
-            "sum_kills": 0, "sum_deaths": 0, "sum_assists": 0
-        })
-
-    # TotalGames = Anzahl unique Matches (matchNr + EventDate + EventTimeRange)
-    df["matchKey"] = df["matchNr"].astype(str) + "|" + df["EventDate"].astype(str) + "|" + df["EventTimeRange"].astype(str)
-    total_games = int(df["matchKey"].nunique())
-
-    out = {
-        "avg_kills": float(df["kills"].mean()),
-        "avg_deaths": float(df["deaths"].mean()),
-        "avg_assists": float(df["assists"].mean()),
-        "avg_kd": float(df["kd_match"].mean()),
-        "avg_score": float(df["score"].mean()),
-        "total_games": total_games,
-        "winrate": float(df["playerWon"].mean() * 100.0),
-        "mvp_count": int(df["isMVP"].sum()),
-        "sum_kills": int(df["kills"].sum()),
-        "sum_deaths": int(df["deaths"].sum()),
-        "sum_assists": int(df["assists"].sum()),
-    }
-    return jsonify(out)
+    summary = _player_index(part)["summary"].get((player, mapname) if mapname else player)
+    return jsonify(summary or EMPTY_PLAYER_SUMMARY)
 
 
 @app.get("/api/dashboard/player-series")
+@cached_response
 def api_dashboard_player_series():
-    merged, _m, err, code = _load_players_matches_merged()
+    part, err, code = _load_partials()
     if err:
         return err, code
 
@@ -897,31 +1798,249 @@ def api_dashboard_player_series():
 
     if not player:
         return jsonify({"success": False, "error": "player fehlt"}), 400
-    if metric not in {"avg_kills", "avg_deaths", "avg_assists", "avg_kd", "avg_score"}:
+    if metric not in SERIES_METRICS:
         return jsonify({"success": False, "error": "metric ungültig"}), 400
 
-    df = merged[merged["Player"].astype(str).str.strip() == player].copy()
-    if mapname:
-        df = df[df["maptitle"].astype(str).str.strip() == mapname]
-
-    df = df[df["EventDateParsed"].notna()]
-    if df.empty:
+    index = _player_index(part)
+    key = (player, mapname) if mapname else (player,)
+    series = index["series_map"] if mapname else index["series_all"]
+    try:
+        s = series.loc[key, SERIES_METRICS[metric]]
+    except KeyError:
         return jsonify({"labels": [], "values": []})
 
-    metric_col = {
-        "avg_kills": "kills",
-        "avg_deaths": "deaths",
-        "avg_assists": "assists",
-        "avg_kd": "kd_match",
-        "avg_score": "score",
-    }[metric]
-
-    s = df.groupby("EventDateParsed")[metric_col].mean().sort_index()
-    labels = [d.isoformat() for d in s.index.tolist()]
+    labels = [str(d) for d in s.index.tolist()]
     values = [float(v) for v in s.values.tolist()]
     return jsonify({"labels": labels, "values": values})
 
 
 
+# ----------------------------
+# Query API (Gruppierung + Filter + Kennzahlen über Event-Partials)
+# ----------------------------
+def _query_engine(part: pd.DataFrame) -> query.AggregateEngine:
+    """
+    Engine pro Partials-Objekt (= pro Datenstand; die Partials selbst entstehen beim
+    Veröffentlichen, siehe partials.py).
+    """
+    hit = _AGG_CACHE.get("query_engine")
+    metrics.cache_access("query_engine", hit is not None and hit["source"] is part)
+    if hit is not None and hit["source"] is part:
+        return hit["engine"]
+
+    with metrics.function_timer("build_query_engine"):
+        engine = query.AggregateEngine(part)
+    _AGG_CACHE["query_engine"] = {"source": part, "engine": engine}
+    return engine
+
+
+def _dimension_filters() -> dict:
+    """
+    Filter aus der Query: player, map, event, date, team (mehrfach angebbar) + date_from/date_to.
+    """
+    filters = {dim: request.args.getlist(dim) for dim in query.DIMENSIONS if request.args.getlist(dim)}
+    for bound in ("date_from", "date_to"):
+        if request.args.get(bound):
+            filters[bound] = request.args.get(bound).strip()
+    return filters
+
+
+@app.get("/api/query")
+def api_query():
+    """
+    Generische Aggregation, z.B.
+      /api/query?group_by=player,map&metrics=avg_kills,games&map=Cargo&date_from=2025-05-01&limit=20
+
+    group_by:  Dimensionen (player, map, event, date, team), kommagetrennt; leer = Gesamtsumme
+    metrics:   Kennzahlen aus query.METRICS, kommagetrennt
+    Filter:    player, map, event, date, team (mehrfach angebbar), date_from/date_to (ISO)
+    order_by:  Kennzahl oder Dimension (Default: erste Kennzahl), order=asc|desc, limit
+    """
+    try:
+        limit = _int_arg("limit", 100, query.MAX_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit muss eine Zahl sein"}), 400
+
+    part, err, code = _load_partials()
+    if err:
+        return err, code
+
+    filters = _dimension_filters()
+
+    started = time.perf_counter()
+    try:
+        result = _query_engine(part).query(
+            group_by=_csv_arg("group_by"),
+            metrics=_csv_arg("metrics") or ["games"],
+            filters=filters,
+            order_by=(request.args.get("order_by") or "").strip() or None,
+            descending=(request.args.get("order") or "desc").lower() != "asc",
+            limit=limit,
+        )
+    except query.QueryError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({"success": True, **result, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 2)})
+
+
+# ----------------------------
+# Export (gefilterte Spielerzeilen, gestreamt)
+# ----------------------------
+@app.get("/api/export")
+def api_export():
+    """
+    Gefilterte Zeilen der Faktentabelle als CSV oder NDJSON, chunkweise direkt aus den
+    gemappten Spalten gestreamt (Speicher unabhängig von der Treffermenge), z.B.
+      /api/export?player=Ralph%20Langbauer&map=Cargo&columns=EventId,maptitle,kills,score&format=ndjson
+
+    Filter wie /api/query (player, map, event, date, team, date_from/date_to),
+    columns: Spalten kommagetrennt (Default: alle), format: csv (Default) | ndjson
+    """
+    merged, _m, err, code = _load_players_matches_merged()
+    if err:
+        return err, code
+
+    fmt = (request.args.get("format") or "csv").strip().lower()
+    try:
+        chunks = export.stream(
+            merged, _dimension_filters(), _csv_arg("columns") or None, fmt,
+            on_done=lambda rows: metrics.inc("vrfrag_export_rows_total", "Exportierte Zeilen", rows, format=fmt),
+        )
+    except export.ExportError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    # der Generator hält die Faktentabelle der gepinnten Version, auch wenn parallel umgeschaltet wird
+    version = current_dataset_version()[0]
+    mimetype, ext = export.FORMATS[fmt]
+    resp = Response(chunks, content_type=f"{mimetype}; charset=utf-8")
+    resp.headers["Content-Disposition"] = f"attachment; filename=vrfrag_export_{version}.{ext}"
+    resp.headers["X-Dataset-Version"] = version
+    return resp
+
+
+# ----------------------------
+# Warm-up / Health
+# ----------------------------
+# abschaltbar mit VRFRAG_WARMUP=0 (der Server gilt dann sofort als ready)
+WARMUP_ENABLED = os.environ.get("VRFRAG_WARMUP", "1") != "0"
+
+_WARMUP = {"state": "pending" if WARMUP_ENABLED else "skipped",
+           "started": None, "finished": None, "steps": {}, "errors": {}}
+_WARMUP_LOCK = threading.Lock()
+
+# Requests, deren Antworten beim Warm-up vorberechnet werden (wie vom Dashboard abgefragt)
+WARMUP_REQUESTS = (
+    "/api/dashboard/bundle?limit=20&metrics=avg_kills,avg_score,total_kills,mvp_count",
+    "/api/dashboard/filters",
+    "/api/get-all-players",
+    "/api/get-available-maps",
+)
+
+
+def _warm_step(name: str, fn):
+    started = time.perf_counter()
+    try:
+        out = fn()
+        _WARMUP["steps"][name] = round((time.perf_counter() - started) * 1000.0, 1)
+        return out
+    except Exception as e:
+        _WARMUP["errors"][name] = str(e)
+        print(f"Warm-up: {name} fehlgeschlagen: {e}")
+        return None
+
+
+def warm_up():
+    """
+    Lädt vor dem ersten Request alles, was sonst der erste Nutzer bezahlen würde:
+    CSVs + Faktentabelle, Dashboard-Aggregationen und Spieler-Index, Spieler-Universum,
+    Synergy-Index, Win-Probability-Modelle und Simulations-Momente (gesamt und pro Map)
+    sowie die serialisierten Antworten der Dashboard-Requests.
+
+    Fehlende Daten (z.B. frische Installation ohne CSVs) machen den Server trotzdem ready;
+    die Fehler stehen in /readyz.
+    """
+    with _WARMUP_LOCK:
+        if _WARMUP["state"] in ("running", "ready", "skipped"):
+            return
+        _WARMUP.update(state="running", started=time.time(), steps={}, errors={})
+
+    print("Warm-up gestartet...")
+    with app.app_context():
+        merged = _warm_step("dataset", lambda: _load_players_matches_merged()[0])
+        if merged is not None:
+            part = _load_partials()[0]
+            _warm_step("dashboard_aggregates", lambda: _player_aggregates(part))
+            _warm_step("player_index", lambda: _player_index(part))
+            _warm_step("query_engine", lambda: _query_engine(part))
+            _warm_step("player_universe", get_player_universe)
+            _warm_step("synergy_index", lambda: get_synergy_index(merged, _dataset_version()))
+
+            maps = [None] + sorted(merged["maptitle"].dropna().astype(str).unique().tolist())
+            # pro Map einzeln: kleine Maps mit nur einer Klasse fallen im Request auf das einfache Modell zurück
+            for m in maps:
+                _warm_step(f"win_model:{m or 'Alle Maps'}", lambda m=m: _get_cached_model(_filter_by_map(merged, m), None))
+            _warm_step("team_ratings", lambda: [team_rating_source()(m) for m in maps])
+            _warm_step("sim_moments", lambda: [simulation_moments(m) for m in maps])
+
+            client = app.test_client()
+            _warm_step("responses", lambda: [
+                client.get(url, environ_base={WARMUP_ENVIRON_KEY: True}).status_code for url in WARMUP_REQUESTS
+            ])
+        else:
+            _WARMUP["errors"].setdefault("dataset", "Keine Daten geladen")
+
+    with _WARMUP_LOCK:
+        _WARMUP.update(state="ready", finished=time.time())
+    print(f"Warm-up fertig in {_WARMUP['finished'] - _WARMUP['started']:.1f}s: {_WARMUP['steps']}")
+
+
+def start_warm_up(heartbeat=None):
+    """
+    Startet das Warm-up einmal pro Prozess im Hintergrund. Aufgerufen beim Worker-Start
+    (gunicorn.conf.py: post_worker_init), aus __main__ und als Rückfall beim ersten Request;
+    nicht beim Import, damit Skripte und Tests, die server importieren, nichts vorladen.
+
+    Mit heartbeat (z.B. worker.notify) wird bis zum Ende gewartet und heartbeat dabei
+    regelmäßig aufgerufen: der Worker nimmt erst danach Verbindungen an, ohne vom
+    gunicorn-Arbiter wegen Timeout beendet zu werden.
+    """
+    with _WARMUP_LOCK:
+        if _WARMUP["state"] != "pending":
+            return
+        _WARMUP["state"] = "starting"
+    thread = threading.Thread(target=warm_up, name="vrfrag-warmup", daemon=True)
+    thread.start()
+    if heartbeat is not None:
+        while thread.is_alive():
+            heartbeat()
+            thread.join(1.0)
+
+
+@app.before_request
+def _warm_up_on_first_request():
+    if _WARMUP["state"] == "pending":
+        start_warm_up()
+
+
+@app.get("/healthz")
+def api_healthz():
+    # Liveness: Prozess antwortet
+    return jsonify({"status": "ok"})
+
+
+@app.get("/readyz")
+def api_readyz():
+    # Readiness: erst nach abgeschlossenem (oder abgeschaltetem) Warm-up
+    ready = _WARMUP["state"] in ("ready", "skipped")
+    body = {
+        "ready": ready,
+        "state": _WARMUP["state"],
+        "steps_ms": _WARMUP["steps"],
+        "errors": _WARMUP["errors"],
+    }
+    return jsonify(body), 200 if ready else 503
+
+
 if __name__ == "__main__":
+    start_warm_up()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
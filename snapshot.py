@@ -0,0 +1,261 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Ein Unterordner pro Datenstand (unveränderlich), dazu die Zeigerdatei CURRENT
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "files", "snapshot")
+POINTER_FILE = "CURRENT"
+# Prozessübergreifende Sperren: Zeiger-Umschaltung bzw. erster Import (Bootstrap)
+LOCK_FILE = ".lock"
+BOOTSTRAP_LOCK_FILE = ".bootstrap.lock"
+# So viele Versionen bleiben liegen (Leser mit offenen Maps sind unter Linux davon nicht betroffen)
+KEEP_VERSIONS = 3
+# Abgelöste Versionen bleiben mindestens so lange liegen (Sekunden), damit Requests anderer
+# Worker, die sie noch gepinnt haben, zu Ende laufen können
+MIN_AGE_SECONDS = 600
+# So viele gemappte Faktentabellen hält ein Prozess (aktuelle + gerade abgelöste)
+MAX_LOADED = 2
+
+_LOADED: OrderedDict = OrderedDict()
+_LOAD_LOCK = threading.Lock()
+
+
+def _column_kind(s: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(s):
+        return "bool"
+    if pd.api.types.is_integer_dtype(s):
+        return "int"
+    if pd.api.types.is_float_dtype(s):
+        return "float"
+    return "dict"
+
+
+def _codes_dtype(n_categories: int):
+    """
+    Kleinster Integer-Typ für Categorical-Codes (inkl. -1 für fehlende Werte), wie pandas.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_columns(df: pd.DataFrame, folder: str, prefix: str = "c") -> list[dict]:
+    """
+    Eine .npy pro Spalte; Strings als Dictionary-Codes (Wörterbuch kommt in meta.json).
+    """
+    columns = []
+    for i, name in enumerate(df.columns):
+        s = df[name]
+        kind = _column_kind(s)
+        col = {"name": str(name), "kind": kind, "file": f"{prefix}{i}.npy"}
+        if kind == "bool":
+            arr = s.to_numpy(dtype=bool)
+        elif kind == "int":
+            # kleine Integer-Typen aus schema.py bleiben erhalten
+            arr = s.to_numpy(dtype=s.dtype if isinstance(s.dtype, np.dtype) else np.int64)
+        elif kind == "float":
+            arr = s.to_numpy(dtype=np.float64)
+        else:
+            values = s.astype(object).where(s.notna(), None)
+            cat = pd.Categorical(values.map(lambda v: v if v is None else str(v)))
+            col["dictionary"] = [str(c) for c in cat.categories]
+            # Codes im Dtype, den pandas selbst wählen würde -> beim Laden keine Kopie
+            arr = cat.codes.astype(_codes_dtype(len(cat.categories)), copy=False)
+        np.save(os.path.join(folder, col["file"]), np.ascontiguousarray(arr))
+        columns.append(col)
+    return columns
+
+
+def _read_columns(folder: str, columns: list[dict]) -> pd.DataFrame:
+    data = {}
+    for col in columns:
+        arr = np.load(os.path.join(folder, col["file"]), mmap_mode="r")
+        if col["kind"] == "dict":
+            dtype = pd.CategoricalDtype(pd.Index(col["dictionary"], dtype=object))
+            data[col["name"]] = pd.Categorical.from_codes(arr, dtype=dtype, validate=False)
+        else:
+            data[col["name"]] = arr
+    return pd.DataFrame(data, copy=False)
+
+
+def publish_version(tables: dict, build_facts, build_partials=None, root: str = SNAPSHOT_DIR) -> str:
+    """
+    Veröffentlicht einen Datenstand als unveränderliche Versions-Directory und schaltet
+    danach die Zeigerdatei in EINEM os.replace um. Leser sehen also entweder den alten
+    oder den neuen Stand, nie eine Mischung oder halb geschriebene Dateien. Der Zeiger
+    ist die einzige Quelle für den aktuellen Stand (die flachen CSVs in files/ nicht).
+
+    tables:      {Dateiname: DataFrame oder Pfad einer vorhandenen CSV} (Players, Matches)
+    build_facts: build_facts(folder) -> Faktentabelle; wird nur für neue Versionen aufgerufen
+    build_partials: optional build_partials(facts, previous) -> Aggregat-Partials (partials.py);
+                 previous sind die Partials der aktuellen Version (oder None), damit nur neue
+                 bzw. geänderte Events aggregiert werden müssen
+
+    Die Version heißt nach dem Inhalt der CSVs; gleicher Inhalt -> gleiche Version.
+    """
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f"tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+    try:
+        h = hashlib.sha1()
+        for filename in sorted(tables):
+            target = os.path.join(tmp, filename)
+            table = tables[filename]
+            if isinstance(table, pd.DataFrame):
+                table.to_csv(target, index=False, encoding="utf-8")
+            else:
+                shutil.copyfile(table, target)
+            h.update(filename.encode("utf-8") + b"\0")
+            with open(target, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    h.update(chunk)
+        version = f"v-{h.hexdigest()[:16]}"
+        final = os.path.join(root, version)
+
+        if not os.path.isdir(final):
+            facts = build_facts(tmp)
+            meta = {"version": version, "rows": int(len(facts)), "columns": _write_columns(facts, tmp),
+                    "files": sorted(tables)}
+            if build_partials is not None:
+                pointer = current(root)
+                previous = load_partials(pointer["version"], root) if pointer else None
+                part = build_partials(facts, previous)
+                meta["partials"] = {"rows": int(len(part)), "columns": _write_columns(part, tmp, prefix="p")}
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            try:
+                os.rename(tmp, final)
+            except OSError:
+                # anderer Prozess hat dieselbe Version schon veröffentlicht
+                pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    with exclusive(root):
+        previous = current(root)
+        pointer_tmp = os.path.join(root, f"{POINTER_FILE}.{uuid.uuid4().hex}")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version}, f)
+        os.replace(pointer_tmp, os.path.join(root, POINTER_FILE))
+
+        # mtime = Zeitpunkt der Ablösung (für MIN_AGE_SECONDS in _cleanup)
+        if previous and previous["version"] != version:
+            try:
+                os.utime(os.path.join(root, previous["version"]))
+            except OSError:
+                pass
+        _cleanup(root, keep=version)
+    return version
+
+
+@contextmanager
+def exclusive(root: str = SNAPSHOT_DIR, name: str = LOCK_FILE):
+    """
+    Prozessübergreifende Sperre (flock) über alle Worker und den Generator-Prozess.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, name), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _cleanup(root: str, keep: str):
+    """
+    Alte Versionen löschen: nur über KEEP_VERSIONS hinaus und frühestens MIN_AGE_SECONDS
+    nach ihrer Ablösung; in diesem Prozess geladene bleiben liegen.
+    """
+    loaded = {v for r, v in list(_LOADED) if r == root}
+    versions = sorted(
+        (d for d in os.listdir(root) if d.startswith("v-") and d != keep and d not in loaded),
+        key=lambda d: os.path.getmtime(os.path.join(root, d)),
+    )
+    cutoff = time.time() - MIN_AGE_SECONDS
+    for d in versions[: max(len(versions) - (KEEP_VERSIONS - 1), 0)]:
+        path = os.path.join(root, d)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def current(root: str = SNAPSHOT_DIR) -> dict | None:
+    """
+    Inhalt der Zeigerdatei ({"version"}) oder None, wenn es noch keinen Datenstand gibt.
+    """
+    try:
+        with open(os.path.join(root, POINTER_FILE), encoding="utf-8") as f:
+            pointer = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return pointer if pointer.get("version") else None
+
+
+def version_file(version: str, filename: str, root: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(root, version, filename)
+
+
+def load_facts(version: str, root: str = SNAPSHOT_DIR):
+    """
+    Faktentabelle einer Version read-only memory-mapped laden: Zahlen-/Bool-Spalten zeigen
+    direkt auf die Datei (Page-Cache, von allen Workern geteilt), String-Spalten werden zu
+    Categoricals aus gemappten Codes + Wörterbuch. Pro Version nur einmal pro Prozess.
+
+    Gibt (df, meta) oder (None, None) zurück (z.B. wenn die Version schon aufgeräumt wurde).
+    """
+    key = (root, version)
+    hit = _LOADED.get(key)
+    if hit is not None:
+        return hit
+
+    with _LOAD_LOCK:
+        hit = _LOADED.get(key)
+        if hit is not None:
+            return hit
+
+        folder = os.path.join(root, version)
+        try:
+            with open(os.path.join(folder, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            df = _read_columns(folder, meta["columns"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Datenstand {version} konnte nicht geladen werden: {e}")
+            return None, None
+
+        _LOADED[key] = (df, meta)
+        while len(_LOADED) > MAX_LOADED:
+            _LOADED.popitem(last=False)
+        return df, meta
+
+
+def load_partials(version: str, root: str = SNAPSHOT_DIR) -> pd.DataFrame | None:
+    """
+    Beim Veröffentlichen berechnete Aggregat-Partials einer Version (memory-mapped), None
+    wenn die Version keine hat (z.B. vor Einführung der Partials veröffentlicht).
+    """
+    folder = os.path.join(root, version)
+    try:
+        with open(os.path.join(folder, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if "partials" not in meta:
+            return None
+        return _read_columns(folder, meta["partials"]["columns"])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Partials von {version} konnten nicht geladen werden: {e}")
+        return None
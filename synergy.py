@@ -0,0 +1,333 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILES_FOLDER = os.path.join(BASE_DIR, "files")
+SYNERGY_FILE = os.path.join(FILES_FOLDER, "vrfrag_synergy.npz")
+
+MATRIX_NAMES = ("games_together", "wins_together", "games_against", "wins_against")
+
+_INDEX = None
+_INDEX_SOURCE = None
+_INDEX_LOCK = threading.Lock()
+
+
+def _to_bool(s: pd.Series) -> np.ndarray:
+    if s.dtype == bool:
+        return s.to_numpy()
+    return s.astype(str).str.strip().str.lower().isin(["true", "1", "yes"]).to_numpy()
+
+
+_REQUIRED = ["Player", "matchNr", "team", "playerWon"]
+
+
+def _event_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Event-Schlüssel pro Zeile: EventId, oder (ältere CSVs) EventDate|EventTimeRange.
+    """
+    if "EventId" in df.columns:
+        return df["EventId"].astype(str)
+    return df["EventDate"].astype(str) + "|" + df["EventTimeRange"].astype(str)
+
+
+def _event_fingerprints(df: pd.DataFrame, keys: pd.Series) -> dict:
+    """
+    Reihenfolgeunabhängige Prüfsumme der relevanten Spalten pro Event (wie in partials.py);
+    Werte normalisiert, damit CSV-Strings und typisierte Spalten gleich hashen.
+    """
+    norm = pd.DataFrame({
+        "Player": df["Player"].astype(str).str.strip().to_numpy(),
+        "matchNr": df["matchNr"].astype(str).to_numpy(),
+        "team": df["team"].astype(str).to_numpy(),
+        "playerWon": _to_bool(df["playerWon"]),
+    })
+    hashes = pd.util.hash_pandas_object(norm, index=False).to_numpy()
+    codes, uniques = pd.factorize(keys.to_numpy())
+    sums = np.zeros(len(uniques), dtype=np.uint64)
+    np.add.at(sums, codes, hashes)
+    return {str(k): int(v) for k, v in zip(uniques, sums)}
+
+
+class SynergyIndex:
+    """
+    Dünnbesetzte Spieler×Spieler-Matrizen über alle Matches:
+
+      games_together[i, j]  Matches, in denen i und j im selben Team waren
+      wins_together[i, j]   davon gewonnen
+      games_against[i, j]   Matches, in denen i gegen j gespielt hat
+      wins_against[i, j]    davon hat i gewonnen
+
+    Events werden inkrementell hinzugefügt; bereits bekannte Events mit unverändertem
+    Fingerprint werden übersprungen. events: EventId -> Fingerprint (None = unbekannt).
+    """
+
+    def __init__(self):
+        self.players: list[str] = []
+        self.events: dict[str, int | None] = {}
+        self._index: dict[str, int] = {}
+        self._lower: dict[str, int] = {}
+        for name in MATRIX_NAMES:
+            setattr(self, name, sparse.csr_matrix((0, 0), dtype=np.int32))
+
+    # ---------- Aufbau ----------
+    def _ensure_players(self, names) -> np.ndarray:
+        new = [n for n in pd.unique(np.asarray(names, dtype=object)) if n not in self._index]
+        for n in new:
+            self._index[n] = len(self.players)
+            self._lower.setdefault(n.lower(), self._index[n])
+            self.players.append(n)
+        if new:
+            shape = (len(self.players), len(self.players))
+            for name in MATRIX_NAMES:
+                m = getattr(self, name).tocoo()
+                setattr(self, name, sparse.csr_matrix((m.data, (m.row, m.col)), shape=shape, dtype=np.int32))
+        return np.fromiter((self._index[n] for n in names), dtype=np.int64, count=len(names))
+
+    def add_event(self, event_id: str, event_df: pd.DataFrame, fingerprint: int | None = None) -> bool:
+        """
+        Fügt die Spielerzeilen eines Events hinzu. Gibt False zurück, wenn das Event
+        schon enthalten ist oder die nötigen Spalten fehlen.
+        """
+        event_id = str(event_id)
+        if event_id in self.events:
+            return False
+        if not set(_REQUIRED).issubset(event_df.columns):
+            return False
+
+        df = event_df[_REQUIRED].dropna(subset=["Player"]).copy()
+        df["Player"] = df["Player"].astype(str).str.strip()
+        df = df[df["Player"] != ""].drop_duplicates(subset=["matchNr", "Player"])
+        if df.empty:
+            self.events[event_id] = fingerprint
+            return True
+
+        rows = pd.DataFrame({
+            "m": pd.factorize(df["matchNr"].astype(str))[0],
+            "p": self._ensure_players(df["Player"].tolist()),
+            "t": df["team"].astype(str).to_numpy(),
+            "w": _to_bool(df["playerWon"]).astype(np.int32),
+        })
+
+        # Self-Join nur innerhalb dieses Events (ca. 10 Spieler pro Match)
+        pairs = rows.merge(rows, on="m", suffixes=("_i", "_j"))
+        pairs = pairs[pairs["p_i"] != pairs["p_j"]]
+        same = (pairs["t_i"] == pairs["t_j"]).to_numpy()
+
+        pi = pairs["p_i"].to_numpy()
+        pj = pairs["p_j"].to_numpy()
+        wi = pairs["w_i"].to_numpy()
+        shape = (len(self.players), len(self.players))
+
+        def _add(name, data, mask):
+            delta = sparse.csr_matrix((data[mask], (pi[mask], pj[mask])), shape=shape, dtype=np.int32)
+            setattr(self, name, getattr(self, name) + delta)
+
+        ones = np.ones(len(pairs), dtype=np.int32)
+        _add("games_together", ones, same)
+        _add("wins_together", wi, same)
+        _add("games_against", ones, ~same)
+        _add("wins_against", wi, ~same)
+
+        self.events[event_id] = fingerprint
+        return True
+
+    def _reset(self):
+        self.__init__()
+
+    def update(self, players_df: pd.DataFrame) -> int:
+        """
+        Gleicht den Index mit players_df ab: neue Events werden hinzugefügt. Ist ein bekanntes
+        Event verschwunden oder hat sich sein Inhalt geändert (Fingerprint, z.B. neu
+        gescrapt), wird neu aufgebaut, weil sich alte Beiträge nicht einzeln abziehen lassen.
+        Gibt die Anzahl (neu) aufgenommener Events zurück.
+        """
+        if players_df is None or players_df.empty or not set(_REQUIRED).issubset(players_df.columns):
+            return 0
+        keys = _event_keys(players_df)
+        fingerprints = _event_fingerprints(players_df, keys)
+
+        stale = [e for e, fp in self.events.items() if fingerprints.get(e) != fp]
+        if stale:
+            self._reset()
+        missing = [k for k in fingerprints if k not in self.events]
+        if not missing:
+            return 0
+        added = 0
+        sub_keys = keys[keys.isin(missing)]
+        for event_id, event_df in players_df[keys.isin(missing)].groupby(sub_keys, sort=True):
+            if self.add_event(event_id, event_df, fingerprints[str(event_id)]):
+                added += 1
+        return added
+
+    @classmethod
+    def from_players_df(cls, players_df: pd.DataFrame) -> "SynergyIndex":
+        idx = cls()
+        idx.update(players_df)
+        return idx
+
+    # ---------- Persistenz ----------
+    def save(self, path: str = SYNERGY_FILE):
+        events = sorted(self.events)
+        arrays = {
+            "players": np.asarray(self.players, dtype=str),
+            "events": np.asarray(events, dtype=str),
+            # None (unbekannt) als 0 -> wird beim nächsten update() neu bestimmt
+            "fingerprints": np.asarray([self.events[e] or 0 for e in events], dtype=np.uint64),
+        }
+        for name in MATRIX_NAMES:
+            m = getattr(self, name).tocoo()
+            arrays[f"{name}_row"] = m.row
+            arrays[f"{name}_col"] = m.col
+            arrays[f"{name}_data"] = m.data
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = SYNERGY_FILE) -> "SynergyIndex":
+        idx = cls()
+        with np.load(path, allow_pickle=False) as z:
+            idx.players = z["players"].tolist()
+            events = z["events"].tolist()
+            # ältere Dateien ohne Fingerprints -> gelten als geändert, einmaliger Neuaufbau
+            fps = z["fingerprints"].tolist() if "fingerprints" in z.files else [None] * len(events)
+            idx.events = {e: (int(fp) if fp else None) for e, fp in zip(events, fps)}
+            idx._index = {p: i for i, p in enumerate(idx.players)}
+            for p, i in idx._index.items():
+                idx._lower.setdefault(p.lower(), i)
+            shape = (len(idx.players), len(idx.players))
+            for name in MATRIX_NAMES:
+                m = sparse.csr_matrix(
+                    (z[f"{name}_data"], (z[f"{name}_row"], z[f"{name}_col"])), shape=shape, dtype=np.int32
+                )
+                setattr(idx, name, m)
+        return idx
+
+    # ---------- Lookups ----------
+    def code(self, name: str):
+        key = (name or "").strip()
+        if key in self._index:
+            return self._index[key]
+        return self._lower.get(key.lower())
+
+    def pair(self, player_a: str, player_b: str) -> dict:
+        """
+        Zusammen- und Gegeneinander-Statistik für ein Spielerpaar.
+        """
+        i, j = self.code(player_a), self.code(player_b)
+        out = {
+            "player_a": player_a, "player_b": player_b,
+            "games_together": 0, "wins_together": 0, "winrate_together": None,
+            "games_against": 0, "wins_a_vs_b": 0, "wins_b_vs_a": 0,
+        }
+        if i is None or j is None or i == j:
+            return out
+        gt = int(self.games_together[i, j])
+        ga = int(self.games_against[i, j])
+        out.update({
+            "player_a": self.players[i], "player_b": self.players[j],
+            "games_together": gt,
+            "wins_together": int(self.wins_together[i, j]),
+            "winrate_together": round(int(self.wins_together[i, j]) / gt, 3) if gt else None,
+            "games_against": ga,
+            "wins_a_vs_b": int(self.wins_against[i, j]),
+            "wins_b_vs_a": int(self.wins_against[j, i]),
+        })
+        return out
+
+    def player(self, name: str, limit: int = 10) -> dict | None:
+        """
+        Häufigste Mitspieler und Gegner eines Spielers (je Top-N nach Anzahl Spiele).
+        """
+        i = self.code(name)
+        if i is None:
+            return None
+
+        def _top(games_m, wins_m, key):
+            row = games_m.getrow(i)
+            wins = wins_m.getrow(i).toarray().ravel()
+            order = np.argsort(-row.data, kind="stable")[:limit]
+            return [
+                {
+                    "player": self.players[row.indices[k]],
+                    "games": int(row.data[k]),
+                    key: int(wins[row.indices[k]]),
+                    "winrate": round(int(wins[row.indices[k]]) / int(row.data[k]), 3),
+                }
+                for k in order
+            ]
+
+        return {
+            "player": self.players[i],
+            "teammates": _top(self.games_together, self.wins_together, "wins_together"),
+            "opponents": _top(self.games_against, self.wins_against, "wins_against"),
+        }
+
+    def lobby(self, names) -> dict:
+        """
+        Dichte Teilmatrizen für eine Lobby (Reihenfolge wie names; unbekannte Spieler = 0).
+        """
+        out = {"players": list(names), "unknown": [n for n in names if self.code(n) is None]}
+        for name in MATRIX_NAMES:
+            out[name] = self.lobby_matrix(name, names).tolist()
+        return out
+
+    def synergy_weights(self, names, prior_games: float = 3.0) -> np.ndarray:
+        """
+        Paarweise Synergie für eine Lobby als dichte, symmetrische Matrix:
+        geschrumpfte Siegquote zusammen minus 0.5 (Prior: prior_games Spiele mit 50%).
+        Unbekannte Paare und die Diagonale sind 0.
+        """
+        games = np.asarray(self.lobby_matrix("games_together", names), dtype=float)
+        wins = np.asarray(self.lobby_matrix("wins_together", names), dtype=float)
+        w = (wins + 0.5 * prior_games) / (games + prior_games) - 0.5
+        np.fill_diagonal(w, 0.0)
+        return w
+
+    def lobby_matrix(self, name: str, names) -> np.ndarray:
+        codes = [self.code(n) for n in names]
+        known = [k for k, c in enumerate(codes) if c is not None]
+        src = np.asarray([codes[k] for k in known], dtype=np.int64)
+        dense = np.zeros((len(codes), len(codes)), dtype=np.int64)
+        if len(src):
+            dense[np.ix_(known, known)] = getattr(self, name)[src][:, src].toarray()
+        return dense
+
+
+def update_synergy_file(players_df: pd.DataFrame, path: str = SYNERGY_FILE):
+    """
+    Ingest-Schritt: lädt den gespeicherten Index, fügt nur neue Events hinzu und speichert ihn wieder.
+    """
+    idx = SynergyIndex.load(path) if os.path.exists(path) else SynergyIndex()
+    added = idx.update(players_df)
+    if added or not os.path.exists(path):
+        idx.save(path)
+    return idx, added
+
+
+def get_synergy_index(players_df: pd.DataFrame, version: str | None = None) -> SynergyIndex:
+    """
+    Prozessweiter Index für die API: beim ersten Zugriff aus der Datei geladen (falls vorhanden),
+    danach inkrementell mit players_df abgeglichen (neue bzw. geänderte Events).
+
+    version: Kennung des Datenstands (z.B. server._dataset_version()); bei gleicher Version
+    wie beim letzten Aufruf wird nichts geprüft. Ohne version wird immer abgeglichen.
+    """
+    global _INDEX, _INDEX_SOURCE
+    with _INDEX_LOCK:
+        if _INDEX is not None and version is not None and version == _INDEX_SOURCE:
+            return _INDEX
+
+        if _INDEX is None:
+            try:
+                _INDEX = SynergyIndex.load() if os.path.exists(SYNERGY_FILE) else SynergyIndex()
+            except Exception as e:
+                print(f"Synergy-Index konnte nicht geladen werden, baue neu: {e}")
+                _INDEX = SynergyIndex()
+
+        _INDEX.update(players_df)
+        _INDEX_SOURCE = version
+        return _INDEX
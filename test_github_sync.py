@@ -0,0 +1,141 @@
+import base64
+import json
+
+import pytest
+
+from github_sync import GitHubAPIError, GitHubSync, git_blob_sha
+
+OLD = b"alt\n"
+NEW = b"neu\n"
+SAME = b"gleich\n"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, raw=b""):
+        self.status_code = status_code
+        self._payload = payload
+        self.content = json.dumps(payload).encode() if payload is not None else raw
+        self.text = self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        yield self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """
+    Minimaler Ersatz für die Git Data API: ein Branch, Trees als {sha: [Einträge]}.
+    Mit truncated=True kürzt das rekursive Listing wie GitHub bei großen Repos.
+    """
+
+    def __init__(self, blobs: dict, truncated: bool = False):
+        self.blobs = {git_blob_sha(data): data for data in blobs.values()}
+        self.trees = {"root": [], "t-events": [], "t-files": []}
+        for path, data in blobs.items():
+            folder, name = path.split("/", 1)
+            self.trees[f"t-{folder}"].append({"path": name, "type": "blob", "sha": git_blob_sha(data)})
+        self.trees["root"] = [
+            {"path": "events", "type": "tree", "sha": "t-events"},
+            {"path": "files", "type": "tree", "sha": "t-files"},
+        ]
+        self.truncated = truncated
+        self.calls = []
+
+    def _recursive(self):
+        out = []
+        for entry in self.trees["root"]:
+            out.append(entry)
+            out += [dict(e, path=f"{entry['path']}/{e['path']}") for e in self.trees[entry["sha"]]]
+        return out
+
+    def request(self, method, url, params=None, json=None, **kwargs):
+        path = url.split("/repos/o/r/", 1)[1]
+        self.calls.append((method, path, (params or {}).get("recursive")))
+        if method == "GET" and path == "git/ref/heads/main":
+            return FakeResponse(payload={"object": {"sha": "c1"}})
+        if method == "GET" and path == "git/commits/c1":
+            return FakeResponse(payload={"tree": {"sha": "root"}})
+        if method == "GET" and path.startswith("git/trees/"):
+            sha = path.rsplit("/", 1)[1]
+            if params and params.get("recursive"):
+                if self.truncated:
+                    return FakeResponse(payload={"tree": self.trees[sha][:1], "truncated": True})
+                return FakeResponse(payload={"tree": self._recursive(), "truncated": False})
+            return FakeResponse(payload={"tree": self.trees[sha], "truncated": False})
+        if method == "POST" and path == "git/blobs":
+            data = base64.b64decode(json["content"])
+            self.blobs[git_blob_sha(data)] = data
+            return FakeResponse(201, {"sha": git_blob_sha(data)})
+        if method == "POST" and path == "git/trees":
+            return FakeResponse(201, {"sha": "t-new"})
+        if method == "POST" and path == "git/commits":
+            return FakeResponse(201, {"sha": "c2", "html_url": ""})
+        if method == "PATCH" and path == "git/refs/heads/main":
+            return FakeResponse(200, {"object": {"sha": json["sha"]}})
+        return FakeResponse(404, {"message": f"unbekannt: {method} {path}"})
+
+    def get(self, url, **kwargs):
+        sha = url.rsplit("/", 1)[1]
+        self.calls.append(("GET", f"raw/{sha}", None))
+        return FakeResponse(raw=self.blobs[sha])
+
+
+def _sync(session):
+    return GitHubSync("o", "r", "main", "token", api_url="https://api.test", session=session)
+
+
+@pytest.mark.parametrize("truncated", [False, True])
+def test_tree_blobs_walks_subtrees_when_truncated(truncated):
+    session = FakeSession({"events/a.txt": OLD, "files/b.csv": SAME}, truncated=truncated)
+    blobs = _sync(session).tree_blobs("root")
+    assert blobs == {"events/a.txt": git_blob_sha(OLD), "files/b.csv": git_blob_sha(SAME)}
+    walked = [c for c in session.calls if c[0] == "GET" and c[2] is None]
+    assert bool(walked) == truncated
+
+
+def test_walk_tree_raises_when_a_level_is_truncated():
+    session = FakeSession({"events/a.txt": OLD}, truncated=True)
+    session.request = lambda method, url, params=None, **kw: FakeResponse(payload={"tree": [], "truncated": True})
+    with pytest.raises(GitHubAPIError):
+        _sync(session).tree_blobs("root")
+
+
+def test_commit_files_skips_unchanged_and_uploads_changed():
+    session = FakeSession({"events/a.txt": OLD, "files/b.csv": SAME}, truncated=True)
+    result = _sync(session).commit_files({"events/a.txt": NEW, "files/b.csv": SAME}, "update")
+    assert result["success"]
+    assert result["changed"] == ["events/a.txt"]
+    assert result["unchanged"] == ["files/b.csv"]
+    assert result["uploaded_blobs"] == 1
+
+
+def test_commit_files_without_changes_makes_no_commit():
+    session = FakeSession({"events/a.txt": OLD})
+    result = _sync(session).commit_files({"events/a.txt": OLD}, "update")
+    assert result == {"success": True, "commit_sha": None, "changed": [], "unchanged": ["events/a.txt"]}
+    assert not [c for c in session.calls if c[0] != "GET"]
+
+
+def test_pull_files_downloads_only_changed_blobs(tmp_path):
+    session = FakeSession({"events/a.txt": NEW, "events/c.txt": SAME, "files/b.csv": SAME}, truncated=True)
+    events, files = tmp_path / "events", tmp_path / "files"
+    events.mkdir()
+    files.mkdir()
+    (events / "a.txt").write_bytes(OLD)
+    (events / "c.txt").write_bytes(SAME)
+    (files / "b.csv").write_bytes(b"lokal bearbeitet\n")
+
+    result = _sync(session).pull_files({"events/": str(events), "files/": str(files)}, missing_only=("files/",))
+    assert result["success"]
+    assert result["downloaded"] == ["events/a.txt"]
+    assert result["unchanged"] == ["events/c.txt", "files/b.csv"]
+    assert (events / "a.txt").read_bytes() == NEW
+    assert (files / "b.csv").read_bytes() == b"lokal bearbeitet\n"
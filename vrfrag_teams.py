@@ -1,11 +1,20 @@
+import os
 import pandas as pd
 import numpy as np
 import random
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
 import warnings
 warnings.filterwarnings('ignore')
 
+import metrics
+import partials
+from schema import PLAYERS_SCHEMA, read_table
+
 _MODEL_CACHE = {}
 
 def _filter_by_map(df: pd.DataFrame, map_name: str | None) -> pd.DataFrame:
@@ -60,7 +69,9 @@ def _train_team_diff_model(player_stats_df: pd.DataFrame, map_name=None):
     if not required.issubset(set(df.columns)):
         return None, None
 
-    tmp = df[list(required)].copy()
+    # Faktentabelle bringt eine ganzzahlige matchId mit, sonst Schlüssel aus den Einzelspalten
+    has_match_id = "matchId" in df.columns
+    tmp = df[list(required) + (["matchId"] if has_match_id else [])].copy()
     tmp["score"] = _to_num(tmp["score"], 0.0)
     tmp["kills"] = _to_num(tmp["kills"], 0.0)
     tmp["deaths"] = _to_num(tmp["deaths"], 0.0)
@@ -69,18 +80,21 @@ def _train_team_diff_model(player_stats_df: pd.DataFrame, map_name=None):
     if tmp.empty:
         return None, None
 
-    tmp["matchKey"] = (
-        tmp["matchNr"].astype(str)
-        + "|"
-        + tmp["EventDate"].astype(str)
-        + "|"
-        + tmp["EventTimeRange"].astype(str)
-    )
+    if has_match_id:
+        tmp["matchKey"] = tmp["matchId"]
+    else:
+        tmp["matchKey"] = (
+            tmp["matchNr"].astype(str)
+            + "|"
+            + tmp["EventDate"].astype(str)
+            + "|"
+            + tmp["EventTimeRange"].astype(str)
+        )
 
-    winners = tmp.groupby("matchKey", dropna=True)["matchWinner"].first()
+    winners = tmp.groupby("matchKey", dropna=True, observed=True)["matchWinner"].first()
 
     agg = (
-        tmp.groupby(["matchKey", "team"], dropna=True)
+        tmp.groupby(["matchKey", "team"], dropna=True, observed=True)
         .agg(score_mean=("score", "mean"), kills_sum=("kills", "sum"), deaths_sum=("deaths", "sum"))
         .reset_index()
     )
@@ -108,26 +122,40 @@ def _train_team_diff_model(player_stats_df: pd.DataFrame, map_name=None):
         (common["kd_A"] - common["kd_B"]).to_numpy(),
     ])
 
+    return _fit_team_diff_model(X, y.to_numpy())
+
+def _fit_team_diff_model(X: np.ndarray, y: np.ndarray):
+    """
+    Skaliert die Differenz-Features und fittet die logistische Regression.
+    """
     scaler = StandardScaler()
     Xs = scaler.fit_transform(X)
 
     model = LogisticRegression(random_state=42, max_iter=200)
-    model.fit(Xs, y.to_numpy())
+    model.fit(Xs, y)
 
     return model, scaler
 
-def _get_cached_model(player_stats_df: pd.DataFrame, map_name=None):
-    df = _filter_by_map(player_stats_df, map_name)
-
-    # very cheap "signature" to avoid re-training every request
+def _df_signature(df: pd.DataFrame, map_name=None) -> tuple:
+    """
+    Sehr günstige "Signatur" eines (bereits map-gefilterten) DataFrames,
+    damit abgeleitete Caches nicht bei jedem Request neu gebaut werden.
+    """
     try:
         max_match = int(_to_num(df.get("matchNr", pd.Series([], dtype=object)), 0).max() or 0)
     except Exception:
         max_match = 0
     event_n = int(df["EventId"].nunique()) if "EventId" in df.columns else 0
-    sig = (str(map_name or ""), int(df.shape[0]), max_match, event_n)
+    return (str(map_name or ""), int(df.shape[0]), max_match, event_n)
+
+def _get_cached_model(player_stats_df: pd.DataFrame, map_name=None):
+    df = _filter_by_map(player_stats_df, map_name)
+
+    # very cheap "signature" to avoid re-training every request
+    sig = _df_signature(df, map_name)
 
     hit = _MODEL_CACHE.get(sig)
+    metrics.cache_access("win_model", bool(hit))
     if hit:
         return hit
 
@@ -171,42 +199,46 @@ def calculate_team_win_probability_advanced(team_a_players, team_b_players, play
         # Fallback zur einfachen Berechnung
         return calculate_team_win_probability_simple(team_a_players, team_b_players, player_stats_df, map_name)
 
-def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterations=1000, target_fairness=0.05, use_advanced_probability=True):
+def _prepare_rating_frame(player_stats_df: pd.DataFrame, map_name=None, rating_source=None) -> dict:
     """
-    Generiert faire Teams basierend auf historischer Performance
-    
-    Args:
-        player_names: Liste der Spieler-Namen
-        player_stats_df: DataFrame mit Spieler-Statistiken
-        map_name: Optionaler Map-Name für map-spezifische Statistiken
-        max_iterations: Maximale Anzahl an Versuchen
-        target_fairness: Ziel-Fairness (0.05 = 5% Unterschied max)
-        use_advanced_probability: Verwende ML-basierte Wahrscheinlichkeit
-    
-    Returns:
-        Dictionary mit Team-Zusammenstellung und Wahrscheinlichkeiten
+    Map-Filter + numerische Spalten + Aggregation pro Spieler (einmal pro Map).
+    Mit rating_source(map_name) -> (grouped, overall) kommt die Aggregation von dort
+    (z.B. rating_table_from_partials) statt aus den Zeilen; die Zeilen sind dann die
+    typisierte Faktentabelle und werden weder kopiert noch konvertiert.
+    Gibt {"df", "grouped", "overall"} oder {"error": ...} zurück.
     """
-    
-    if len(player_names) < 4:
-        return {"error": "Mindestens 4 Spieler benötigt"}
-    
-    if len(player_names) % 2 != 0:
-        return {"error": "Gerade Anzahl an Spielern benötigt"}
-    
-    team_size = len(player_names) // 2
-    
-    # Historische Daten der Spieler sammeln
     df_use = _filter_by_map(player_stats_df, map_name)
     if "Player" not in df_use.columns or "score" not in df_use.columns:
         return {"error": "Players-CSV hat nicht die erwarteten Spalten (mind. Player, score)."}
 
+    if rating_source is not None:
+        grouped, overall = rating_source(map_name)
+        return {"df": df_use, "grouped": grouped, "overall": overall}
+
     df_use = df_use.copy()
     for c in ["score", "kills", "deaths"]:
         if c in df_use.columns:
             df_use[c] = _to_num(df_use[c], 0.0)
 
+    grouped, overall = _player_rating_table(df_use)
+    return {"df": df_use, "grouped": grouped, "overall": overall}
+
+def _scale_synergy(synergy, n_players: int, overall: dict, synergy_scale=None):
+    weights = np.asarray(synergy, dtype=float)
+    if weights.shape != (n_players, n_players):
+        return None
+    scale = overall["avg_score"] if synergy_scale is None else float(synergy_scale)
+    weights = (weights + weights.T) / 2.0 * scale
+    np.fill_diagonal(weights, 0.0)
+    return weights
+
+def _player_rating_table(df_use: pd.DataFrame):
+    """
+    Aggregiert die (bereits map-gefilterten) Spielerzeilen zu Durchschnittswerten pro Spieler.
+    Gibt (grouped, overall) zurück; overall enthält die Fallback-Werte für unbekannte Spieler.
+    """
     grouped = (
-        df_use.groupby("Player", dropna=True)
+        df_use.groupby("Player", dropna=True, observed=True)
         .agg(
             avg_score=("score", "mean"),
             avg_kills=("kills", "mean"),
@@ -214,10 +246,38 @@ def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterat
             total_games=("score", "size"),
         )
     )
-    overall_avg_score = float(df_use["score"].mean() or 0.0)
-    overall_avg_kills = float(df_use["kills"].mean() if "kills" in df_use.columns else 0.0)
-    overall_avg_deaths = float(df_use["deaths"].mean() if "deaths" in df_use.columns else 0.0)
+    overall = {
+        "avg_score": float(df_use["score"].mean() or 0.0),
+        "avg_kills": float(df_use["kills"].mean() if "kills" in df_use.columns else 0.0),
+        "avg_deaths": float(df_use["deaths"].mean() if "deaths" in df_use.columns else 0.0),
+    }
+    return grouped, overall
 
+def rating_table_from_partials(part: pd.DataFrame, map_name=None):
+    """
+    Wie _player_rating_table, aber aus den Event-Partials (partials.py) statt aus den
+    Spielerzeilen: Summen pro Spieler zusammenführen, Mittelwerte = Summe / Anzahl.
+    """
+    mask = partials.map_mask(part, map_name)
+    t = partials.totals(part, ["player"], mask)
+    grouped = pd.DataFrame({
+        "avg_score": partials.mean(t, "score"),
+        "avg_kills": partials.mean(t, "kills"),
+        "avg_deaths": partials.mean(t, "deaths"),
+        "total_games": t["n"].astype(int),
+    })
+    grouped.index.name = "Player"
+
+    total = partials.totals(part, None, mask).iloc[0]
+    n = float(total["n"])
+    overall = {
+        "avg_score": float(total["score"] / n) if n else 0.0,
+        "avg_kills": float(total["kills"] / n) if n else 0.0,
+        "avg_deaths": float(total["deaths"] / n) if n else 0.0,
+    }
+    return grouped, overall
+
+def _collect_player_scores(player_names, grouped: pd.DataFrame, overall: dict):
     player_scores = {}
     player_stats = {}
     used_fallback_for = []
@@ -228,29 +288,39 @@ def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterat
             player_scores[player] = float(row["avg_score"])
             player_stats[player] = {
                 "avg_score": float(row["avg_score"]),
-                "avg_kills": float(row["avg_kills"]) if "avg_kills" in row else overall_avg_kills,
-                "avg_deaths": float(row["avg_deaths"]) if "avg_deaths" in row else overall_avg_deaths,
+                "avg_kills": float(row["avg_kills"]) if "avg_kills" in row else overall["avg_kills"],
+                "avg_deaths": float(row["avg_deaths"]) if "avg_deaths" in row else overall["avg_deaths"],
                 "total_games": int(row["total_games"]),
             }
         else:
             used_fallback_for.append(player)
-            player_scores[player] = overall_avg_score
+            player_scores[player] = overall["avg_score"]
             player_stats[player] = {
-                "avg_score": overall_avg_score,
-                "avg_kills": overall_avg_kills,
-                "avg_deaths": overall_avg_deaths,
+                "avg_score": overall["avg_score"],
+                "avg_kills": overall["avg_kills"],
+                "avg_deaths": overall["avg_deaths"],
                 "total_games": 0,
             }
-    
 
-    top_candidates = []  # Liste von (fairness, team_a, team_b, team_a_score, team_b_score)
+    return player_scores, player_stats, used_fallback_for
+
+# wie viele gute Kandidaten wir sammeln
+TOP_K = 10
+# wie nah an best_fairness noch akzeptiert
+EPS = 0.05
+# Anzahl zufälliger Startaufteilungen für die Swap-Suche
+SWAP_RESTARTS = 24
+
+def _random_split_search(player_names, player_scores, team_size, max_iterations, target_fairness):
+    """
+    Zufällige Aufteilungen testen, die besten Kandidaten sammeln.
+    Gibt (top_candidates, iterations_used) zurück;
+    Kandidat = (fairness, team_a, team_b, team_a_score, team_b_score).
+    """
+    top_candidates = []
     best_fairness = float('inf')
     iterations_used = 0
 
-    TOP_K = 10          # wie viele gute Kandidaten wir sammeln
-    EPS = 0.05          # wie nah an best_fairness noch akzeptiert (1.5% vom Gesamtscore)
-
-    
     # Mehrere zufällige Kombinationen testen
     for iteration in range(max_iterations):
         iterations_used = iteration + 1
@@ -273,13 +343,164 @@ def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterat
             top_candidates.sort(key=lambda x: x[0])
             top_candidates = top_candidates[:TOP_K]
 
+    return top_candidates, iterations_used
+
+def _swap_local_search(scores: np.ndarray, weights: np.ndarray, team_size: int, rng):
+    """
+    Swap-Local-Search auf einer Aufteilung: Teamstärke = Summe Einzelwerte + Summe der
+    Paargewichte innerhalb des Teams. Das Delta eines Tauschs a<->b wird aus den
+    gecachten Zeilensummen R_A[x] = sum_{y in A} W[x, y] (bzw. R_B) in O(1) berechnet,
+    alle k² Kandidaten auf einmal per Broadcasting.
+
+    Gibt (in_a, strength_a, strength_b, swaps) zurück.
+    """
+    n = len(scores)
+    in_a = np.zeros(n, dtype=bool)
+    in_a[rng.permutation(n)[:team_size]] = True
+
+    row_a = weights[:, in_a].sum(axis=1)
+    row_b = weights[:, ~in_a].sum(axis=1)
+    strength_a = scores[in_a].sum() + row_a[in_a].sum() / 2.0
+    strength_b = scores[~in_a].sum() + row_b[~in_a].sum() / 2.0
+    diff = strength_a - strength_b
+
+    swaps = 0
+    for _ in range(n * n):
+        a = np.flatnonzero(in_a)
+        b = np.flatnonzero(~in_a)
+        w_ab = weights[np.ix_(a, b)]
+
+        # A' = A - a + b ; B' = B - b + a
+        delta_a = scores[b][None, :] - scores[a][:, None] - row_a[a][:, None] + row_a[b][None, :] - w_ab
+        delta_b = scores[a][:, None] - scores[b][None, :] - row_b[b][None, :] + row_b[a][:, None] - w_ab
+        new_diff = diff + delta_a - delta_b
+
+        k = int(np.argmin(np.abs(new_diff)))
+        if abs(new_diff.flat[k]) >= abs(diff) - 1e-9:
+            break
+
+        i, j = a[k // len(b)], b[k % len(b)]
+        strength_a += delta_a.flat[k]
+        strength_b += delta_b.flat[k]
+        diff = new_diff.flat[k]
+        in_a[i], in_a[j] = False, True
+        row_a += weights[:, j] - weights[:, i]
+        row_b += weights[:, i] - weights[:, j]
+        swaps += 1
+
+    return in_a, float(strength_a), float(strength_b), swaps
+
+def _swap_split_search(player_names, scores: np.ndarray, weights: np.ndarray, team_size: int,
+                       restarts=SWAP_RESTARTS, seed=None):
+    """
+    Mehrere Swap-Local-Searches von zufälligen Startaufteilungen; sammelt die besten
+    lokalen Optima als Kandidaten (gleiches Format wie _random_split_search).
+    Gibt (top_candidates, swaps_used) zurück.
+    """
+    rng = np.random.default_rng(seed)
+    seen = set()
+    candidates = []
+    swaps_used = 0
+
+    for _ in range(max(int(restarts), 1)):
+        in_a, strength_a, strength_b, swaps = _swap_local_search(scores, weights, team_size, rng)
+        swaps_used += swaps
+
+        key = frozenset(np.flatnonzero(in_a).tolist())
+        if key in seen or frozenset(np.flatnonzero(~in_a).tolist()) in seen:
+            continue
+        seen.add(key)
+
+        total = strength_a + strength_b
+        fairness = abs(strength_a - strength_b) / total if total > 0 else 1.0
+        team_a = [player_names[i] for i in np.flatnonzero(in_a)]
+        team_b = [player_names[i] for i in np.flatnonzero(~in_a)]
+        candidates.append((fairness, team_a, team_b, strength_a, strength_b))
+
+    candidates.sort(key=lambda x: x[0])
+    best_fairness = candidates[0][0] if candidates else 1.0
+    candidates = [c for c in candidates if c[0] <= best_fairness + EPS]
+    return candidates[:TOP_K], swaps_used
+
+def _team_pair_sum(team, player_names, weights: np.ndarray) -> float:
+    pos = [player_names.index(p) for p in team]
+    return float(weights[np.ix_(pos, pos)].sum() / 2.0)
+
+@metrics.timed("generate_fair_teams")
+def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterations=1000, target_fairness=0.05,
+                        use_advanced_probability=True, synergy=None, synergy_scale=None, solver="random",
+                        rating_source=None):
+    """
+    Generiert faire Teams basierend auf historischer Performance
+    
+    Args:
+        player_names: Liste der Spieler-Namen
+        player_stats_df: DataFrame mit Spieler-Statistiken
+        map_name: Optionaler Map-Name für map-spezifische Statistiken
+        max_iterations: Maximale Anzahl an Versuchen
+        target_fairness: Ziel-Fairness (0.05 = 5% Unterschied max)
+        use_advanced_probability: Verwende ML-basierte Wahrscheinlichkeit
+        synergy: Optionale symmetrische Paarmatrix (Reihenfolge wie player_names), z.B.
+                 SynergyIndex.synergy_weights(); Werte = Sieg-Mehrquote des Paars
+        synergy_scale: Umrechnung Synergie -> Score-Punkte (Default: Ø Score aller Spieler)
+        solver: "random" (zufällige Aufteilungen) oder "swap" (Swap-Local-Search,
+                berücksichtigt die Paar-Synergien; wird bei gesetzter synergy automatisch genutzt)
+        rating_source: Optional rating_source(map_name) -> (grouped, overall) mit vorab
+                aggregierten Spieler-Ratings (siehe rating_table_from_partials)
     
+    Returns:
+        Dictionary mit Team-Zusammenstellung und Wahrscheinlichkeiten
+    """
+    
+    if len(player_names) < 4:
+        return {"error": "Mindestens 4 Spieler benötigt"}
+    
+    if len(player_names) % 2 != 0:
+        return {"error": "Gerade Anzahl an Spielern benötigt"}
+    
+    team_size = len(player_names) // 2
+    
+    # Historische Daten der Spieler sammeln
+    prepared = _prepare_rating_frame(player_stats_df, map_name, rating_source)
+    if "error" in prepared:
+        return prepared
+    df_use, grouped, overall = prepared["df"], prepared["grouped"], prepared["overall"]
+
+    player_scores, player_stats, used_fallback_for = _collect_player_scores(player_names, grouped, overall)
+
+    weights = None
+    if synergy is not None:
+        weights = _scale_synergy(synergy, len(player_names), overall, synergy_scale)
+        if weights is None:
+            return {"error": "Synergie-Matrix passt nicht zur Spielerliste"}
+        solver = "swap"
+
+    if solver == "swap":
+        if weights is None:
+            weights = np.zeros((len(player_names), len(player_names)))
+        scores = np.array([player_scores[p] for p in player_names], dtype=float)
+        top_candidates, iterations_used = _swap_split_search(player_names, scores, weights, team_size)
+    else:
+        top_candidates, iterations_used = _random_split_search(
+            player_names, player_scores, team_size, max_iterations, target_fairness
+        )
+
+    return _build_team_result(
+        top_candidates, iterations_used, player_scores, player_stats, used_fallback_for,
+        df_use, map_name, use_advanced_probability, player_names=player_names, weights=weights, solver=solver,
+    )
+
+def _build_team_result(top_candidates, iterations_used, player_scores, player_stats, used_fallback_for,
+                       df_use, map_name, use_advanced_probability, player_names=None, weights=None, solver="random"):
     if not top_candidates:
         return {"error": "Keine gültige Team-Kombination gefunden"}
 
     # Randomisiert auswählen – aber nur aus sehr guten Kandidaten
     choice = random.choice(top_candidates)
-    best_fairness, team_a, team_b, team_a_score, team_b_score = choice
+    best_fairness, team_a, team_b, _strength_a, _strength_b = choice
+
+    team_a_score = sum(player_scores.get(player, 0) for player in team_a)
+    team_b_score = sum(player_scores.get(player, 0) for player in team_b)
         
     # Detaillierte Team-Statistiken berechnen
     team_a_stats = calculate_team_stats(team_a, player_stats)
@@ -291,7 +512,7 @@ def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterat
     else:
         win_probability = calculate_team_win_probability_simple(team_a, team_b, df_use, map_name=None)
     
-    return {
+    result = {
         "team_a": {
             "players": team_a,
             "average_score": round(team_a_score / len(team_a), 2),
@@ -312,9 +533,174 @@ def generate_fair_teams(player_names, player_stats_df, map_name=None, max_iterat
         "iterations_used": iterations_used,
         "map_used": map_name if map_name else "Alle Maps",
         "calculation_method": "ML-basiert" if use_advanced_probability else "Einfache Berechnung",
+        "solver": solver,
         "used_fallback_for": used_fallback_for,
         "player_avg_scores": {k: round(float(v), 3) for k, v in player_scores.items()}
     }
+    if weights is not None and player_names is not None:
+        result["team_a"]["synergy_score"] = round(_team_pair_sum(team_a, player_names, weights), 2)
+        result["team_b"]["synergy_score"] = round(_team_pair_sum(team_b, player_names, weights), 2)
+    return result
+
+# ----------------------------
+# Batch-Generierung (Turnier / Liga-Abend)
+# ----------------------------
+# Ein Pool pro Prozess, beim ersten großen Batch angelegt und danach wiederverwendet.
+# Worker kommen aus einem forkserver (bzw. spawn), nicht per fork aus dem Server-Prozess
+# mit seinen laufenden Threads.
+BATCH_POOL_WORKERS = os.cpu_count() or 1
+# Weniger Lobbys werden direkt im aufrufenden Prozess gelöst
+BATCH_POOL_MIN_TASKS = 4
+
+_BATCH_POOL = None
+_BATCH_POOL_LOCK = threading.Lock()
+
+def _init_batch_worker():
+    # Worker erben sonst alle denselben Zufallszustand
+    random.seed()
+
+def _batch_pool():
+    global _BATCH_POOL
+    with _BATCH_POOL_LOCK:
+        if _BATCH_POOL is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context("forkserver")
+                # Imports einmal im forkserver statt in jedem Worker
+                ctx.set_forkserver_preload([__name__])
+            else:
+                ctx = multiprocessing.get_context("spawn")
+            _BATCH_POOL = ProcessPoolExecutor(
+                max_workers=BATCH_POOL_WORKERS, mp_context=ctx, initializer=_init_batch_worker
+            )
+        return _BATCH_POOL
+
+def _reset_batch_pool():
+    global _BATCH_POOL
+    with _BATCH_POOL_LOCK:
+        if _BATCH_POOL is not None:
+            _BATCH_POOL.shutdown(wait=False, cancel_futures=True)
+        _BATCH_POOL = None
+
+def _solve_lobbies(tasks):
+    return [_solve_lobby(t) for t in tasks]
+
+def _solve_lobby(task):
+    """
+    Löst die Team-Aufteilung einer Lobby nur anhand der Rating-Arrays ihrer Map
+    ({player: position}, avg_score-Array, overall_avg_score).
+    Gibt (lobby_index, top_candidates, iterations_used) zurück.
+    """
+    lobby_idx, player_names, rating, weights, solver, max_iterations, target_fairness = task
+    positions, avg_scores, overall_avg = rating
+    scores = np.array(
+        [avg_scores[positions[p]] if p in positions else overall_avg for p in player_names], dtype=float
+    )
+    team_size = len(player_names) // 2
+
+    if solver == "swap":
+        if weights is None:
+            weights = np.zeros((len(player_names), len(player_names)))
+        top_candidates, iterations_used = _swap_split_search(player_names, scores, weights, team_size)
+    else:
+        player_scores = dict(zip(player_names, scores.tolist()))
+        top_candidates, iterations_used = _random_split_search(
+            player_names, player_scores, team_size, max_iterations, target_fairness
+        )
+    return lobby_idx, top_candidates, iterations_used
+
+def generate_fair_teams_batch(lobbies, player_stats_df, processes=None, max_iterations=1000, target_fairness=0.05,
+                              use_advanced_probability=True, rating_source=None):
+    """
+    Generiert Teams für viele Lobbys auf einmal.
+
+    Die Spielerdaten werden pro Map nur einmal aggregiert; die Aufteilungen werden parallel
+    im geteilten Prozess-Pool (_batch_pool) über die Rating-Arrays gesucht. Gewinnwahrscheinlichkeiten
+    (gecachte Modelle) werden danach im aufrufenden Prozess berechnet.
+
+    Args:
+        lobbies: Liste von Dicts mit "players" (bereits aufgelöste Namen), optional "map",
+                 "synergy" (Paarmatrix wie bei generate_fair_teams) und "solver"
+        player_stats_df: DataFrame mit Spieler-Statistiken
+        processes: Anzahl paralleler Worker (Default und Maximum: BATCH_POOL_WORKERS; <= 1 oder
+                   weniger als BATCH_POOL_MIN_TASKS Lobbys = ohne Pool)
+        rating_source: wie bei generate_fair_teams
+
+    Returns:
+        Liste von Ergebnissen in Lobby-Reihenfolge (Format wie generate_fair_teams)
+    """
+    results = [None] * len(lobbies)
+    prepared_by_map = {}
+    tasks = []
+
+    for i, lobby in enumerate(lobbies):
+        player_names = list(lobby.get("players") or [])
+        map_name = lobby.get("map") or None
+
+        if len(player_names) < 4:
+            results[i] = {"error": "Mindestens 4 Spieler benötigt"}
+            continue
+        if len(player_names) % 2 != 0:
+            results[i] = {"error": "Gerade Anzahl an Spielern benötigt"}
+            continue
+
+        map_key = str(map_name or "")
+        if map_key not in prepared_by_map:
+            prepared_by_map[map_key] = _prepare_rating_frame(player_stats_df, map_name, rating_source)
+        prepared = prepared_by_map[map_key]
+        if "error" in prepared:
+            results[i] = {"error": prepared["error"]}
+            continue
+
+        solver = lobby.get("solver") or "random"
+        weights = None
+        if lobby.get("synergy") is not None:
+            weights = _scale_synergy(lobby["synergy"], len(player_names), prepared["overall"])
+            if weights is None:
+                results[i] = {"error": "Synergie-Matrix passt nicht zur Spielerliste"}
+                continue
+            solver = "swap"
+
+        tasks.append((i, player_names, map_key, weights, solver, max_iterations, target_fairness))
+
+    ratings = {
+        key: (
+            {p: k for k, p in enumerate(prep["grouped"].index.tolist())},
+            prep["grouped"]["avg_score"].to_numpy(dtype=float),
+            prep["overall"]["avg_score"],
+        )
+        for key, prep in prepared_by_map.items() if "error" not in prep
+    }
+    work = [(i, names, ratings[key], w, solver, mi, tf) for i, names, key, w, solver, mi, tf in tasks]
+
+    processes = BATCH_POOL_WORKERS if processes is None else int(processes)
+    processes = max(1, min(processes, BATCH_POOL_WORKERS, len(work)))
+    solved = None
+    if processes > 1 and len(work) >= BATCH_POOL_MIN_TASKS:
+        # processes Teilaufträge -> höchstens so viele Worker gleichzeitig für diesen Request
+        chunks = [work[k::processes] for k in range(processes)]
+        try:
+            solved = [r for part in _batch_pool().map(_solve_lobbies, chunks) for r in part]
+        except BrokenProcessPool as e:
+            print(f"Batch-Pool defekt, löse im Prozess: {e}")
+            _reset_batch_pool()
+    if solved is None:
+        solved = _solve_lobbies(work)
+    # Teilaufträge sind verschränkt -> wieder in Lobby-Reihenfolge (wie tasks)
+    solved.sort(key=lambda r: r[0])
+
+    for (lobby_idx, top_candidates, iterations_used), task in zip(solved, tasks):
+        _i, player_names, map_key, weights, solver, _mi, _tf = task
+        prepared = prepared_by_map[map_key]
+        player_scores, player_stats, used_fallback_for = _collect_player_scores(
+            player_names, prepared["grouped"], prepared["overall"]
+        )
+        results[lobby_idx] = _build_team_result(
+            top_candidates, iterations_used, player_scores, player_stats, used_fallback_for,
+            prepared["df"], lobbies[lobby_idx].get("map") or None, use_advanced_probability,
+            player_names=player_names, weights=weights, solver=solver,
+        )
+
+    return results
 
 def calculate_team_stats(team_players, player_stats):
     """
@@ -348,7 +734,7 @@ def get_player_recommendations(player_stats_df, num_players=10):
     """
     try:
         # Spieler nach durchschnittlicher Performance sortieren
-        player_stats = player_stats_df.groupby('Player').agg({
+        player_stats = player_stats_df.groupby('Player', observed=True).agg({
             'score': ['mean', 'count'],
             'kills': 'mean',
             'deaths': 'mean'
@@ -408,7 +794,7 @@ if __name__ == '__main__':
         players_file = os.path.join(FILES_FOLDER, 'vrfrag_players.csv')
         
         if os.path.exists(players_file):
-            players_df = pd.read_csv(players_file)
+            players_df = read_table(players_file, PLAYERS_SCHEMA)
             print(f"✅ Spieler-Daten geladen: {len(players_df)} Einträge, {players_df['Player'].nunique()} Spieler")
             
             # Verfügbare Spieler anzeigen